@@ -0,0 +1,194 @@
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from sample_size.power import SampleSizeSolver
+from sample_size.sample_size_calculator import DEFAULT_ALPHA
+from sample_size.sample_size_calculator import DEFAULT_POWER
+from sample_size.sample_size_calculator import DEFAULT_VARIANTS
+from sample_size.sample_size_calculator import SampleSizeCalculator
+
+EXECUTORS: Dict[str, Callable[[Optional[int]], Executor]] = {
+    "process": ProcessPoolExecutor,
+    "thread": ThreadPoolExecutor,
+}
+
+
+class SpecResult(NamedTuple):
+    """
+    Result of an experiment spec calculated by run_many
+
+    Attributes:
+    position: position of the spec in the specs given to run_many
+    spec: the spec with its default parameters filled in, or as given if it could not be parsed
+    sample_size: sample size per group, None if it could not be calculated
+    error: the error that prevented the calculation
+    seconds: time spent calculating the spec. Single-metric specs share the time of their vectorized calculation
+    """
+
+    position: int
+    spec: Dict[str, Any]
+    sample_size: Optional[int]
+    error: Optional[str]
+    seconds: float
+
+
+def _get_parameter(spec: Dict[str, Any], name: str, default: Any, parse: Callable[[Any], Any]) -> Any:
+    value = spec.get(name)
+    return default if value is None or value == "" else parse(value)
+
+
+def parse_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    This function fills in the default alpha, power and variants of an experiment spec and decodes the parameters
+    that CSV files hold as strings
+
+    Parameters:
+        spec: dictionary with optional alpha, power and variants and the metrics to register in the format of
+        metrics_schema.json, or their JSON encoding
+
+    Returns:
+        spec with alpha, power, variants and metrics
+    """
+    if not spec.get("metrics"):
+        raise ValueError("Error: Please provide the metrics of the experiment.")
+    metrics = spec["metrics"]
+    return {
+        "alpha": _get_parameter(spec, "alpha", DEFAULT_ALPHA, float),
+        "power": _get_parameter(spec, "power", DEFAULT_POWER, float),
+        "variants": _get_parameter(spec, "variants", DEFAULT_VARIANTS, int),
+        "metrics": json.loads(metrics) if isinstance(metrics, str) else metrics,
+    }
+
+
+def get_calculator(spec: Dict[str, Any]) -> SampleSizeCalculator:
+    """
+    This function builds the calculator of a parsed experiment spec and registers its metrics
+    """
+    calculator = SampleSizeCalculator(spec["alpha"], spec["variants"], spec["power"])
+    calculator.register_metrics(spec["metrics"])
+    return calculator
+
+
+def _run_spec(index: int, spec: Dict[str, Any]) -> SpecResult:
+    start = time.perf_counter()
+    try:
+        sample_size = int(get_calculator(spec).get_sample_size())
+    except Exception as e:
+        return SpecResult(index, spec, None, str(e), time.perf_counter() - start)
+    return SpecResult(index, spec, sample_size, None, time.perf_counter() - start)
+
+
+def _run_single_metric_specs(specs: List[Tuple[int, Dict[str, Any], SampleSizeCalculator]]) -> List[SpecResult]:
+    """
+    Solve the sample sizes of single-metric specs with one call of each sample size solver, the same way
+    sample_size.bulk does. Specs that the vectorized solution cannot handle are calculated one by one, so that they
+    get the error of SampleSizeCalculator
+    """
+    start = time.perf_counter()
+    groups: Dict[SampleSizeSolver, List[Tuple[int, Dict[str, Any], SampleSizeCalculator]]] = defaultdict(list)
+    for item in specs:
+        groups[item[2].metrics[0].sample_size_solver].append(item)
+
+    solved: List[Tuple[int, Dict[str, Any], int]] = []
+    unsolved: List[Tuple[int, Dict[str, Any]]] = []
+    for solver, group in groups.items():
+        metrics = [calculator.metrics[0] for _, _, calculator in group]
+        try:
+            # the specs the solver cannot solve come out as inf or nan and are calculated one by one below
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sample_sizes = np.floor(
+                    solver(
+                        np.array([metric.effect_size for metric in metrics]),
+                        np.array([calculator.alpha for _, _, calculator in group]),
+                        np.array([calculator.power for _, _, calculator in group]),
+                        np.array([metric.alternative for metric in metrics]),
+                    )
+                )
+        except Exception:
+            sample_sizes = np.full(len(group), np.nan)
+        for (index, spec, _), sample_size in zip(group, sample_sizes):
+            if np.isfinite(sample_size):
+                solved.append((index, spec, int(sample_size)))
+            else:
+                unsolved.append((index, spec))
+
+    seconds = (time.perf_counter() - start) / len(specs)
+    return [SpecResult(index, spec, sample_size, None, seconds) for index, spec, sample_size in solved] + [
+        _run_spec(index, spec) for index, spec in unsolved
+    ]
+
+
+def run_many(
+    specs: Iterable[Dict[str, Any]], max_workers: Optional[int] = None, executor: str = "process"
+) -> Generator[SpecResult, None, None]:
+    """
+    This function calculates the sample sizes of many independent experiment specs and yields every result as soon
+    as it is available, in no particular order.
+
+    Multi-metric specs are simulated on a pool of workers, the most expensive first: their cost is estimated from
+    the number of metrics times the number of variants, and starting the longest ones first keeps a few large specs
+    from finishing last on an otherwise idle pool. Single-metric specs do not need simulations and are solved in a
+    single vectorized calculation while the pool runs
+
+    Parameters:
+        specs: dictionaries with optional alpha, power and variants and the metrics to register in the format of
+            metrics_schema.json
+        max_workers: size of the pool, None for the default of the executor
+        executor: 'process' to simulate in worker processes or 'thread' to simulate in threads
+
+    Returns:
+        a SpecResult per spec. Closing the generator early cancels the specs that have not started yet
+    """
+    if executor not in EXECUTORS:
+        raise ValueError("Error: Please choose a 'process' or 'thread' executor.")
+
+    failed: List[SpecResult] = []
+    single_metric_specs: List[Tuple[int, Dict[str, Any], SampleSizeCalculator]] = []
+    multiple_metric_specs: List[Tuple[int, Dict[str, Any]]] = []
+    for index, spec in enumerate(specs):
+        start = time.perf_counter()
+        try:
+            parsed_spec = parse_spec(spec)
+            if len(parsed_spec["metrics"]) * (parsed_spec["variants"] - 1) < 2:
+                single_metric_specs.append((index, parsed_spec, get_calculator(parsed_spec)))
+            else:
+                multiple_metric_specs.append((index, parsed_spec))
+        except Exception as e:
+            failed.append(SpecResult(index, spec, None, str(e), time.perf_counter() - start))
+
+    # longest processing time first
+    multiple_metric_specs.sort(key=lambda item: len(item[1]["metrics"]) * item[1]["variants"], reverse=True)
+
+    futures: List["Future[SpecResult]"] = []
+    pool = EXECUTORS[executor](max_workers) if multiple_metric_specs else None
+    try:
+        if pool is not None:
+            futures = [pool.submit(_run_spec, index, spec) for index, spec in multiple_metric_specs]
+        yield from failed
+        if single_metric_specs:
+            yield from _run_single_metric_specs(single_metric_specs)
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # do not keep simulating specs nobody waits for when the caller stops early
+        for future in futures:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown()
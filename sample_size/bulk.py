@@ -0,0 +1,119 @@
+import numpy as np
+import numpy.typing as npt
+
+from sample_size.metrics import BaseMetric
+from sample_size.metrics import BooleanMetric
+from sample_size.metrics import RatioMetric
+from sample_size.power import Alternative
+from sample_size.power import SampleSizeSolver
+from sample_size.power import check_effect_size
+from sample_size.power import normal_sample_size
+from sample_size.power import ttest_sample_size
+from sample_size.sample_size_calculator import DEFAULT_ALPHA
+from sample_size.sample_size_calculator import DEFAULT_POWER
+
+DEFAULT_ALTERNATIVE = "two-sided"
+
+
+def _sample_sizes(
+    solver: SampleSizeSolver,
+    variance: npt.ArrayLike,
+    mde: npt.ArrayLike,
+    alpha: npt.ArrayLike,
+    power: npt.ArrayLike,
+    alternative: Alternative,
+) -> npt.NDArray[np.int_]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effect_size = np.divide(mde, np.sqrt(variance))
+    check_effect_size(effect_size)
+    sample_sizes: npt.NDArray[np.int_] = np.floor(solver(effect_size, alpha, power, alternative)).astype(np.int_)
+    return sample_sizes
+
+
+def boolean_sample_sizes(
+    probability: npt.ArrayLike,
+    mde: npt.ArrayLike,
+    alpha: npt.ArrayLike = DEFAULT_ALPHA,
+    power: npt.ArrayLike = DEFAULT_POWER,
+    alternative: Alternative = DEFAULT_ALTERNATIVE,
+) -> npt.NDArray[np.int_]:
+    """
+    This function calculates the sample size per cohort of many single Boolean metric experiments at once. Every
+    parameter can be a scalar or an array; they broadcast against each other like NumPy arrays
+
+    Parameters:
+        probability: baseline probability (between 0 and 1)
+        mde: absolute minimum detectable effect
+        alpha: statistical significance
+        power: statistical power
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        sample sizes per cohort, same as SampleSizeCalculator.get_sample_size for each combination
+    """
+    variance = BooleanMetric.get_variance(BooleanMetric._check_probability(probability))
+    return _sample_sizes(normal_sample_size, variance, mde, alpha, power, alternative)
+
+
+def numeric_sample_sizes(
+    variance: npt.ArrayLike,
+    mde: npt.ArrayLike,
+    alpha: npt.ArrayLike = DEFAULT_ALPHA,
+    power: npt.ArrayLike = DEFAULT_POWER,
+    alternative: Alternative = DEFAULT_ALTERNATIVE,
+) -> npt.NDArray[np.int_]:
+    """
+    This function calculates the sample size per cohort of many single Numeric metric experiments at once. Every
+    parameter can be a scalar or an array; they broadcast against each other like NumPy arrays
+
+    Parameters:
+        variance: variance of the baseline metric
+        mde: absolute minimum detectable effect
+        alpha: statistical significance
+        power: statistical power
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        sample sizes per cohort, same as SampleSizeCalculator.get_sample_size for each combination
+    """
+    variance = BaseMetric.check_positive(variance, "variance")
+    return _sample_sizes(ttest_sample_size, variance, mde, alpha, power, alternative)
+
+
+def ratio_sample_sizes(
+    numerator_mean: npt.ArrayLike,
+    numerator_variance: npt.ArrayLike,
+    denominator_mean: npt.ArrayLike,
+    denominator_variance: npt.ArrayLike,
+    covariance: npt.ArrayLike,
+    mde: npt.ArrayLike,
+    alpha: npt.ArrayLike = DEFAULT_ALPHA,
+    power: npt.ArrayLike = DEFAULT_POWER,
+    alternative: Alternative = DEFAULT_ALTERNATIVE,
+) -> npt.NDArray[np.int_]:
+    """
+    This function calculates the sample size per cohort of many single Ratio metric experiments at once. Every
+    parameter can be a scalar or an array; they broadcast against each other like NumPy arrays
+
+    Parameters:
+        numerator_mean: mean of the baseline metric's numerator
+        numerator_variance: variance of the baseline metric's numerator
+        denominator_mean: mean of the baseline metric's denominator
+        denominator_variance: variance of the baseline metric's denominator
+        covariance: covariance between the baseline metric's numerator and denominator
+        mde: absolute minimum detectable effect
+        alpha: statistical significance
+        power: statistical power
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        sample sizes per cohort, same as SampleSizeCalculator.get_sample_size for each combination
+    """
+    variance = RatioMetric.get_variance(
+        numerator_mean,
+        BaseMetric.check_positive(numerator_variance, "numerator variance"),
+        denominator_mean,
+        BaseMetric.check_positive(denominator_variance, "denominator variance"),
+        covariance,
+    )
+    return _sample_sizes(normal_sample_size, variance, mde, alpha, power, alternative)
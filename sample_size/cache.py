@@ -0,0 +1,167 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABCMeta
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+DEFAULT_CACHE_SIZE: int = 1024
+# part of every key, to be bumped whenever a change to the simulation changes the sample sizes of a configuration,
+# so that persistent caches do not serve results of an older version
+CACHE_KEY_VERSION: int = 4
+
+
+def canonical_key(configuration: Dict[str, Any]) -> str:
+    """
+    This function hashes a JSON-serializable configuration into a cache key that does not depend on the order of
+    its keys
+
+    Parameters:
+        configuration: every setting that determines the cached result
+
+    Returns:
+        hexadecimal SHA-256 digest
+    """
+    payload = json.dumps([CACHE_KEY_VERSION, configuration], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    This class is the interface of the sample size caches. Lookups count hits and misses, and every backend
+    evicts its least recently used results once it holds more than maxsize of them
+
+    Attributes:
+    maxsize: maximum number of cached results
+    hits: number of lookups that found a result
+    misses: number of lookups that did not
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("Error: Please provide a positive cache size.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: str, value: int) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self.hits = 0
+            self.misses = 0
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _set(self, key: str, value: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+
+class LRUCache(ResultCache):
+    """
+    This class keeps sample sizes in memory, for the lifetime of the process
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        super(LRUCache, self).__init__(maxsize)
+        self._results: "OrderedDict[str, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _get(self, key: str) -> Optional[int]:
+        if key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        return self._results[key]
+
+    def _set(self, key: str, value: int) -> None:
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _clear(self) -> None:
+        self._results.clear()
+
+
+class SQLiteCache(ResultCache):
+    """
+    This class keeps sample sizes in a SQLite database file, so that they survive restarts and can be shared by
+    the processes of a host
+
+    Attributes:
+    path: database file, created if it does not exist
+    """
+
+    def __init__(self, path: str, maxsize: int = DEFAULT_CACHE_SIZE):
+        super(SQLiteCache, self).__init__(maxsize)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sample_sizes (key TEXT PRIMARY KEY, value INTEGER NOT NULL, used INTEGER)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS sample_sizes_used ON sample_sizes (used)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM sample_sizes").fetchone()
+        return int(count)
+
+    def _get(self, key: str) -> Optional[int]:
+        row = self._connection.execute("SELECT value FROM sample_sizes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._connection:
+            self._connection.execute("UPDATE sample_sizes SET used = ? WHERE key = ?", (time.time_ns(), key))
+        return int(row[0])
+
+    def _set(self, key: str, value: int) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sample_sizes (key, value, used) VALUES (?, ?, ?)", (key, value, time.time_ns())
+            )
+            self._connection.execute(
+                "DELETE FROM sample_sizes WHERE key IN "
+                "(SELECT key FROM sample_sizes ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def _clear(self) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM sample_sizes")
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,75 @@
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from types import TracebackType
+from typing import Optional
+from typing import Type
+
+
+def _initialize_worker() -> None:
+    # the simulations import scipy on first use; do it while the worker starts rather than in its first task
+    from scipy import special  # noqa: F401
+
+
+def _ready() -> bool:
+    return True
+
+
+class SimulationEngine:
+    """
+    This class keeps a pool of worker processes for the multi-metric simulations alive across get_sample_size
+    calls, so that requests do not pay for starting processes and importing SciPy in them. An engine can be shared
+    by any number of calculators, including from several threads, and the result of a calculation is the same as
+    without it
+
+        with SimulationEngine(workers=8) as engine:
+            calculator.get_sample_size(engine=engine)
+
+    Attributes:
+    workers: number of worker processes, None for one per CPU
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is not None and workers < 1:
+            raise ValueError("Error: Please provide a positive number of workers.")
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> "SimulationEngine":
+        """
+        This method starts the worker processes, which import SciPy as they start. Starting a running engine does
+        nothing
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_initialize_worker)
+            self._executor.submit(_ready).result()
+        return self
+
+    def shutdown(self) -> None:
+        """
+        This method waits for the running simulations and stops the worker processes. The engine can be started
+        again afterwards
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            raise RuntimeError("Error: Please start the simulation engine, e.g. in a with statement.")
+        return self._executor
+
+    def __enter__(self) -> "SimulationEngine":
+        return self.start()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.shutdown()
@@ -1,25 +1,96 @@
+import json
 from abc import ABCMeta
 from abc import abstractmethod
+from functools import cached_property
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import TypeVar
 from typing import Union
 
 import numpy as np
 import numpy.typing as npt
-from scipy import stats
-from statsmodels.stats.power import NormalIndPower
-from statsmodels.stats.power import TTestIndPower
+
+from sample_size.kernels import NORMAL_APPROXIMATION_DF
+from sample_size.kernels import chisquare_scale
+from sample_size.kernels import normal_sf
+from sample_size.kernels import t_sf
+from sample_size.power import SampleSizeSolver
+from sample_size.power import normal_sample_size
+from sample_size.power import ttest_sample_size
+
+if TYPE_CHECKING:
+    from statsmodels.stats.power import NormalIndPower
+    from statsmodels.stats.power import TTestIndPower
+
+Number = TypeVar("Number", bound=npt.ArrayLike)
+
+
+def _statsmodels_power() -> Any:
+    try:
+        from statsmodels.stats import power
+    except ImportError:
+        raise ImportError("Error: power_analysis_instance needs statsmodels, please install sample-size[statsmodels].")
+    return power
 
 
 class BaseMetric:
+    """
+    This class is the base of the metric value objects. The constructors of its subclasses check the parameters,
+    derive the variance once and then freeze the metric: metrics cannot be changed afterwards, and metrics of the
+    same type and parameters are equal and hash alike. The effect size is derived once on first use
+
+    Attributes:
+    mde: absolute minimum detectable effect
+    alternative: 'two-sided', 'larger' or 'smaller'
+    """
+
     __metaclass__ = ABCMeta
     mde: float
+    # test statistic of the simulated test: "z" for a normal z-test, "t" for a Student t-test
+    statistic: str = "z"
 
     def __init__(self, mde: float, alternative: str):
         self.mde = mde
         self.alternative = alternative
 
+    def _freeze(self) -> None:
+        self._frozen = True
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Error: {type(self).__name__} is immutable, please create a new metric.")
+        super(BaseMetric, self).__setattr__(name, value)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BaseMetric) or type(self) is not type(other):
+            return NotImplemented
+        return self.parameters == other.parameters
+
+    def __hash__(self) -> int:
+        return hash((type(self), tuple(sorted(self.parameters.items()))))
+
+    @cached_property
+    def effect_size(self) -> float:
+        """
+        The minimum detectable effect in standard deviations of a single observation, derived on first use so that
+        metrics without variance, e.g. a Boolean metric of probability 0, can still be built
+        """
+        # numpy division turns a zero variance into an infinite or undefined effect size, which the calculators reject
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(np.float64(self.mde) / np.sqrt(self.variance))
+
+    @property
+    @abstractmethod
+    def power_analysis_instance(self) -> Union["NormalIndPower", "TTestIndPower"]:
+        raise NotImplementedError
+
     @property
     @abstractmethod
-    def power_analysis_instance(self) -> Union[NormalIndPower, TTestIndPower]:
+    def sample_size_solver(self) -> SampleSizeSolver:
         raise NotImplementedError
 
     @property
@@ -27,16 +98,40 @@ class BaseMetric:
     def variance(self) -> float:
         raise NotImplementedError
 
+    @property
+    @abstractmethod
+    def parameters(self) -> Dict[str, Any]:
+        """
+        The constructor arguments of the metric
+        """
+        raise NotImplementedError
+
+    @property
+    def canonical_parameters(self) -> List[Any]:
+        """
+        The type and constructor arguments of the metric with every number as a float, so that equal metrics are
+        described alike however their numbers are spelled
+        """
+        return [
+            type(self).__name__,
+            {name: value if isinstance(value, str) else float(value) for name, value in self.parameters.items()},
+        ]
+
     @staticmethod
-    def check_positive(number: float, name: str) -> float:
-        if number < 0:
+    def check_positive(number: Number, name: str) -> Number:
+        if np.any(np.less(number, 0)):
             raise ValueError(f"Error: Please provide a positive number for {name}.")
         else:
             return number
 
     def generate_p_values(
-        self, true_alt: npt.NDArray[np.bool_], sample_size: int, random_state: np.random.RandomState
-    ) -> npt.NDArray[np.float_]:
+        self,
+        true_alt: npt.NDArray[np.bool_],
+        sample_size: int,
+        random_state: np.random.Generator,
+        common_random_numbers: bool = False,
+        out: Optional[npt.NDArray[np.floating[Any]]] = None,
+    ) -> npt.NDArray[np.floating[Any]]:
         """
         This method simulates any registered metric's p-value. The output will
         later be applied to BH procedure
@@ -47,24 +142,27 @@ class BaseMetric:
             for an individual hypothesis sample_size: sample size used for simulations
             sample_size: an integer used to generate
             random_state: random state to generate fixed output for any given input
+            common_random_numbers: draw a fixed number of base variates per p-value, so that the same random state
+            gives smoothly varying p-values across sample sizes
+            out: float array of the shape of true_alt to write the p-values into
 
 
         Returns:
             p-value: A float array of shape (m hypotheses x replications) of
-            simulated p-values
+            simulated p-values, out if given
         """
         total_alt = true_alt.sum()
         total_null = true_alt.size - total_alt
 
-        p_values = np.empty(true_alt.shape)
-        p_values[true_alt] = self._generate_alt_p_values(total_alt, sample_size, random_state)
-        p_values[~true_alt] = stats.uniform.rvs(0, 1, total_null, random_state=random_state)
+        p_values = np.empty(true_alt.shape) if out is None else out
+        p_values[true_alt] = self._generate_alt_p_values(total_alt, sample_size, random_state, common_random_numbers)
+        p_values[~true_alt] = random_state.random(total_null)
 
         return p_values
 
     @abstractmethod
     def _generate_alt_p_values(
-        self, size: int, sample_size: int, random_state: np.random.RandomState
+        self, size: int, sample_size: int, random_state: np.random.Generator, common_random_numbers: bool = False
     ) -> npt.NDArray[np.float_]:
         raise NotImplementedError
 
@@ -81,35 +179,51 @@ class BooleanMetric(BaseMetric):
     ):
         super(BooleanMetric, self).__init__(mde, alternative)
         self.probability = self._check_probability(probability)
+        self._variance = float(self.get_variance(self.probability))
+        self._freeze()
 
     @property
     def variance(self) -> float:
-        return self.probability * (1 - self.probability)
+        return self._variance
 
     @property
-    def power_analysis_instance(self) -> NormalIndPower:
-        return NormalIndPower()
+    def parameters(self) -> Dict[str, Any]:
+        return {"probability": self.probability, "mde": self.mde, "alternative": self.alternative}
 
     @staticmethod
-    def _check_probability(probability: float) -> float:
-        if 0 <= probability <= 1:
+    def get_variance(probability: npt.ArrayLike) -> npt.NDArray[np.float_]:
+        variance: npt.NDArray[np.float_] = np.multiply(probability, np.subtract(1, probability))
+        return variance
+
+    @cached_property
+    def power_analysis_instance(self) -> "NormalIndPower":
+        return _statsmodels_power().NormalIndPower()
+
+    @property
+    def sample_size_solver(self) -> SampleSizeSolver:
+        return normal_sample_size
+
+    @staticmethod
+    def _check_probability(probability: Number) -> Number:
+        if np.all(np.greater_equal(probability, 0) & np.less_equal(probability, 1)):
             return probability
         else:
             raise ValueError("Error: Please provide a float between 0 and 1 for probability.")
 
     def _generate_alt_p_values(
-        self, size: int, sample_size: int, random_state: np.random.RandomState
+        self, size: int, sample_size: int, random_state: np.random.Generator, common_random_numbers: bool = False
     ) -> npt.NDArray[np.float_]:
         effect_size = self.mde / np.sqrt(2 * self.variance / sample_size)
-        z_alt = stats.norm.rvs(loc=effect_size, size=size, random_state=random_state)
-        p_values: npt.NDArray[np.float_] = stats.norm.sf(np.abs(z_alt))
+        z_alt = random_state.normal(loc=effect_size, size=size)
+        p_values = normal_sf(np.abs(z_alt, out=z_alt), out=z_alt)
         if self.alternative == "two-sided":
-            return 2 * p_values
+            p_values *= 2
         return p_values
 
 
 class NumericMetric(BaseMetric):
     mde: float
+    statistic = "t"
 
     def __init__(
         self,
@@ -119,24 +233,37 @@ class NumericMetric(BaseMetric):
     ):
         super(NumericMetric, self).__init__(mde, alternative)
         self._variance = self.check_positive(variance, "variance")
+        self._freeze()
 
     @property
     def variance(self) -> float:
         return self._variance
 
     @property
-    def power_analysis_instance(self) -> TTestIndPower:
-        return TTestIndPower()
+    def parameters(self) -> Dict[str, Any]:
+        return {"variance": self.variance, "mde": self.mde, "alternative": self.alternative}
+
+    @cached_property
+    def power_analysis_instance(self) -> "TTestIndPower":
+        return _statsmodels_power().TTestIndPower()
+
+    @property
+    def sample_size_solver(self) -> SampleSizeSolver:
+        return ttest_sample_size
 
     def _generate_alt_p_values(
-        self, size: int, sample_size: int, random_state: np.random.RandomState
+        self, size: int, sample_size: int, random_state: np.random.Generator, common_random_numbers: bool = False
     ) -> npt.NDArray[np.float_]:
         nc = np.sqrt(sample_size / 2 / self.variance) * self.mde
-        t_alt = stats.nct.rvs(nc=nc, df=2 * (sample_size - 1), size=size, random_state=random_state)
-        p_values: npt.NDArray[np.float_] = stats.t.sf(np.abs(t_alt), 2 * (sample_size - 1))
+        df = 2 * (sample_size - 1)
+        # noncentral t: shifted standard normal over the root of an independent chi-square divided by its df
+        t_alt = random_state.standard_normal(size)
+        t_alt += nc
+        t_alt /= chisquare_scale(df, size, random_state, common_random_numbers)
+        p_values = t_sf(np.abs(t_alt, out=t_alt), df, out=t_alt)
         # Todo: use accurate p-value calculation due to nct's asymmetric distribution
         if self.alternative == "two-sided":
-            return 2 * p_values
+            p_values *= 2
         return p_values
 
 
@@ -164,27 +291,194 @@ class RatioMetric(BaseMetric):
         self.denominator_mean = denominator_mean
         self.denominator_variance = self.check_positive(denominator_variance, "denominator variance")
         self.covariance = covariance
+        self._variance = float(
+            self.get_variance(
+                self.numerator_mean,
+                self.numerator_variance,
+                self.denominator_mean,
+                self.denominator_variance,
+                self.covariance,
+            )
+        )
+        self._freeze()
 
     @property
     def variance(self) -> float:
-        variance = (
-            self.numerator_variance / self.denominator_mean**2
-            + self.denominator_variance * self.numerator_mean**2 / self.denominator_mean**4
-            - 2 * self.covariance * self.numerator_mean / self.denominator_mean**3
+        return self._variance
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {
+            "numerator_mean": self.numerator_mean,
+            "numerator_variance": self.numerator_variance,
+            "denominator_mean": self.denominator_mean,
+            "denominator_variance": self.denominator_variance,
+            "covariance": self.covariance,
+            "mde": self.mde,
+            "alternative": self.alternative,
+        }
+
+    @staticmethod
+    def get_variance(
+        numerator_mean: npt.ArrayLike,
+        numerator_variance: npt.ArrayLike,
+        denominator_mean: npt.ArrayLike,
+        denominator_variance: npt.ArrayLike,
+        covariance: npt.ArrayLike,
+    ) -> npt.NDArray[np.float_]:
+        """
+        Delta method variance of the ratio of the numerator and denominator means
+        """
+        mu_x, var_x, mu_y, var_y, cov_xy = (
+            np.asarray(parameter, dtype=np.float_)
+            for parameter in (numerator_mean, numerator_variance, denominator_mean, denominator_variance, covariance)
+        )
+        variance: npt.NDArray[np.float_] = (
+            var_x / mu_y**2 + var_y * mu_x**2 / mu_y**4 - 2 * cov_xy * mu_x / mu_y**3
         )
 
         return variance
 
+    @cached_property
+    def power_analysis_instance(self) -> "NormalIndPower":
+        return _statsmodels_power().NormalIndPower()
+
     @property
-    def power_analysis_instance(self) -> NormalIndPower:
-        return NormalIndPower()
+    def sample_size_solver(self) -> SampleSizeSolver:
+        return normal_sample_size
 
     def _generate_alt_p_values(
-        self, size: int, sample_size: int, random_state: np.random.RandomState
+        self, size: int, sample_size: int, random_state: np.random.Generator, common_random_numbers: bool = False
     ) -> npt.NDArray[np.float_]:
         effect_size = self.mde / np.sqrt(2 * self.variance / sample_size)
-        z_alt = stats.norm.rvs(loc=effect_size, size=size, random_state=random_state)
-        p_values: npt.NDArray[np.float_] = stats.norm.sf(np.abs(z_alt))
+        z_alt = random_state.normal(loc=effect_size, size=size)
+        p_values = normal_sf(np.abs(z_alt, out=z_alt), out=z_alt)
         if self.alternative == "two-sided":
-            return 2 * p_values
+            p_values *= 2
+        return p_values
+
+
+def canonical_order(metrics: Sequence[BaseMetric]) -> List[BaseMetric]:
+    """
+    This function sorts metrics by their type and parameters, so that a multiple test simulates the same p-values
+    and finds the same sample size however its metrics were ordered when they were registered
+    """
+    return sorted(metrics, key=lambda metric: json.dumps(metric.canonical_parameters, sort_keys=True))
+
+
+class MetricSet:
+    """
+    This class holds a sequence of metrics, e.g. one for each hypothesis of a multiple test, as NumPy arrays, so that
+    the p-values of all of them are simulated with a few array operations rather than one Python call per metric.
+    The alternative test statistics of every hypothesis are drawn in one standard normal draw, and those of the
+    t-tests are scaled by one chi-square draw shared by all Numeric metrics, since their degrees of freedom only
+    depend on the sample size
+
+    Attributes:
+    effect_sizes: minimum detectable effect of each metric in standard deviations of a single observation
+    t_tests: whether each metric is tested with a t-test rather than a z-test
+    two_sided: whether each metric is tested two-sided
+    """
+
+    def __init__(self, metrics: Sequence[BaseMetric]):
+        if any(metric.statistic not in ("z", "t") for metric in metrics):
+            raise ValueError("Error: Please provide metrics with a z or t test statistic.")
+        self.effect_sizes = np.array([metric.effect_size for metric in metrics], dtype=np.float_)
+        self.t_tests = np.array([metric.statistic == "t" for metric in metrics], dtype=np.bool_)
+        self.two_sided = np.array([metric.alternative == "two-sided" for metric in metrics], dtype=np.bool_)
+
+    def __len__(self) -> int:
+        return len(self.effect_sizes)
+
+    def generate_p_values(
+        self,
+        true_alt: npt.NDArray[np.bool_],
+        sample_size: int,
+        random_state: np.random.Generator,
+        common_random_numbers: bool = False,
+        out: Optional[npt.NDArray[np.floating[Any]]] = None,
+    ) -> npt.NDArray[np.floating[Any]]:
+        """
+        This method simulates the p-values of the metrics, following the same distributions as their
+        generate_p_values
+
+        Parameters:
+            true_alt: A boolean array of shape (scenarios x m metrics x replications). Each element represents
+            whether the alternative hypothesis is true for an individual hypothesis
+            sample_size: sample size used for simulations
+            random_state: random state to generate fixed output for any given input
+            common_random_numbers: draw a fixed number of base variates per p-value, so that the same random state
+            gives smoothly varying p-values across sample sizes
+            out: float array of the shape of true_alt to write the p-values into, e.g. of a SimulationWorkspace
+
+        Returns:
+            p-value: A float array of the shape of true_alt of simulated p-values, out if given
+        """
+        # the metric of every true alternative, in the order of the boolean mask: the replications are the last
+        # axis, so each hypothesis of each scenario repeats once per replication in which it is a true alternative
+        num_scenarios, num_tests, _ = true_alt.shape
+        hypotheses = np.repeat(np.tile(np.arange(num_tests), num_scenarios), np.count_nonzero(true_alt, axis=2).ravel())
+        alt_p_values = self._generate_alt_p_values(hypotheses, sample_size, random_state, common_random_numbers)
+
+        p_values = np.empty(true_alt.shape) if out is None else out
+        p_values[true_alt] = alt_p_values
+        p_values[~true_alt] = random_state.random(true_alt.size - alt_p_values.size)
+
         return p_values
+
+    def generate_alt_p_values(
+        self, replication: int, sample_size: int, random_state: np.random.Generator, common_random_numbers: bool = False
+    ) -> npt.NDArray[np.float_]:
+        """
+        This method simulates the p-value of every metric under its alternative hypothesis for a number of
+        replications
+
+        Returns:
+            p-value: A float array of shape (m metrics x replications)
+        """
+        hypotheses = np.repeat(np.arange(len(self)), replication)
+        alt_p_values = self._generate_alt_p_values(hypotheses, sample_size, random_state, common_random_numbers)
+        return alt_p_values.reshape(len(self), replication)
+
+    def _generate_alt_p_values(
+        self,
+        hypotheses: npt.NDArray[np.int_],
+        sample_size: int,
+        random_state: np.random.Generator,
+        common_random_numbers: bool = False,
+    ) -> npt.NDArray[np.float_]:
+        """
+        Simulate an alternative p-value of the metric at each index of hypotheses
+        """
+        t_tests = self.t_tests[hypotheses]
+        df = 2 * (sample_size - 1)
+
+        # the temporaries of the simulation are arrays of the size of hypotheses, so the shifts are gathered in one
+        # array and the selections by test are skipped when they would select every hypothesis
+        statistics = random_state.standard_normal(hypotheses.size)
+        statistics += np.take(self.effect_sizes * np.sqrt(sample_size / 2), hypotheses)
+        num_t_tests = int(np.count_nonzero(t_tests))
+        if num_t_tests:
+            # noncentral t: shifted standard normal over the root of an independent chi-square divided by its df
+            scale = chisquare_scale(df, num_t_tests, random_state, common_random_numbers)
+            if num_t_tests == hypotheses.size:
+                statistics /= scale
+            else:
+                statistics[t_tests] /= scale
+        statistics = np.abs(statistics, out=statistics)
+
+        # the p-values overwrite the statistics, in one kernel call unless z- and t-tests are mixed
+        if num_t_tests == hypotheses.size:
+            alt_p_values = t_sf(statistics, df, out=statistics)
+        elif num_t_tests == 0 or df > NORMAL_APPROXIMATION_DF:
+            alt_p_values = normal_sf(statistics, out=statistics)
+        else:
+            alt_p_values = statistics
+            alt_p_values[t_tests] = t_sf(statistics[t_tests], df)
+            alt_p_values[~t_tests] = normal_sf(statistics[~t_tests])
+        if self.two_sided.all():
+            alt_p_values *= 2
+        elif self.two_sided.any():
+            alt_p_values[self.two_sided[hypotheses]] *= 2
+
+        return alt_p_values
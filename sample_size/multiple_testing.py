@@ -1,14 +1,430 @@
+from concurrent.futures import Executor
+from itertools import product
+from itertools import repeat
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
 import numpy as np
 import numpy.typing as npt
-from statsmodels.stats.multitest import multipletests
 
 from sample_size.metrics import BaseMetric
+from sample_size.metrics import MetricSet
+from sample_size.metrics import canonical_order
+from sample_size.power import average_power_sample_size
+from sample_size.power import check_effect_size
+from sample_size.power import normal_power
+from sample_size.workspace import SimulationWorkspace
+from sample_size.workspace import get_workspace
 
 DEFAULT_REPLICATION: int = 400
 DEFAULT_EPSILON: float = 0.01
 DEFAULT_MAX_RECURSION: int = 20
+DEFAULT_MAX_BATCH_BYTES: int = 2**28
+DEFAULT_REPLICATION_BLOCK: int = 100
+# adaptive replication looks at the power estimate after every block; the wide interval keeps the chance that any of
+# the repeated looks stops on the wrong side of the target small
+ADAPTIVE_STOPPING_Z: float = 3.0
+# the band around a simulated sample size is a 95% confidence band of the Monte Carlo error of its power
+CONFIDENCE_BAND_Z: float = 1.96
+# simulated powers of 0 or 1 are clipped to this distance from the bounds before they are put on the probit scale
+POWER_CURVE_CLIP: float = 1e-3
+MEAN_FIELD_TOLERANCE: float = 1e-10
+MEAN_FIELD_MAX_ITERATIONS: int = 200
+# approximate peak memory per simulated p-value: the buffers of a SimulationWorkspace hold the p-values, their sorted
+# copy, the uniform draws of the true alternatives and three boolean masks, and on top of them the temporaries of a
+# block take up to four more arrays of 8 bytes per p-value. Those are the hypotheses, statistics and shifts of the
+# true alternatives, and the selections of their t-tests. Single precision keeps the same budget, so that both
+# precisions split the scenarios alike and simulate the same random numbers
+BATCH_BYTES_PER_P_VALUE: int = 7 * np.dtype(np.float_).itemsize + 3
+
+
+def _with_workspace(
+    p_values: npt.ArrayLike, workspace: Optional[SimulationWorkspace]
+) -> Tuple[npt.NDArray[np.floating[Any]], SimulationWorkspace]:
+    """
+    This function returns p_values as an array with the workspace to correct them in, a new one unless given.
+    Workspaces hold float64 or float32 p-values, so any other input of a direct caller, e.g. a list or an array of
+    float16 or integers, is converted to float64 first
+    """
+    p_values = np.asarray(p_values)
+    if workspace is not None:
+        return p_values, workspace
+    if p_values.dtype not in (np.dtype(np.float64), np.dtype(np.float32)):
+        p_values = p_values.astype(np.float_)
+    return p_values, SimulationWorkspace(p_values.dtype)
+
+
+def benjamini_hochberg(
+    p_values: npt.ArrayLike,
+    alpha: float,
+    axis: int = 0,
+    workspace: Optional[SimulationWorkspace] = None,
+) -> npt.NDArray[np.bool_]:
+    """
+    This function applies the Benjamini-Hochberg step-up procedure to every 1-D slice of p_values along axis
+    at once. It returns the same rejections as statsmodels' multipletests(method="fdr_bh") applied slice by slice
+
+    Parameters:
+        p_values: An array of p-values, e.g. of shape (m hypotheses x replications)
+        alpha: false discovery rate to control
+        axis: axis along which the hypotheses of a single family are laid out
+        workspace: workspace holding the sorted p-values, the mask and the rejections, or None to allocate them
+
+    Returns:
+        rejected: A boolean array of the same shape as p_values, backed by the workspace if given
+    """
+    p_values, workspace = _with_workspace(p_values, workspace)
+    num_hypotheses = p_values.shape[axis]
+    p_sorted = workspace.sorted_p_values(p_values.shape, p_values.dtype)
+    np.copyto(p_sorted, p_values)
+    p_sorted.sort(axis=axis)
+
+    threshold_shape = [1] * p_values.ndim
+    threshold_shape[axis] = num_hypotheses
+    thresholds = (np.arange(1, num_hypotheses + 1) / float(num_hypotheses) * alpha).reshape(threshold_shape)
+
+    # The largest sorted p-value under its threshold is the cutoff of the step-up procedure: every p-value at or
+    # below it is rejected, including ties and smaller p-values that missed their own threshold
+    above_threshold = np.greater(p_sorted, thresholds.astype(p_values.dtype), out=workspace.mask(p_values.shape))
+    np.copyto(p_sorted, -np.inf, where=above_threshold)
+    cutoff = p_sorted.max(axis=axis, keepdims=True)
+    rejected: npt.NDArray[np.bool_] = np.less_equal(p_values, cutoff, out=workspace.rejected(p_values.shape))
+
+    return rejected
+
+
+def holm(
+    p_values: npt.ArrayLike,
+    alpha: float,
+    axis: int = 0,
+    workspace: Optional[SimulationWorkspace] = None,
+) -> npt.NDArray[np.bool_]:
+    """
+    This function applies the Holm step-down procedure to every 1-D slice of p_values along axis at once. It
+    returns the same rejections as statsmodels' multipletests(method="holm") applied slice by slice
+
+    Parameters:
+        p_values: An array of p-values, e.g. of shape (m hypotheses x replications)
+        alpha: family-wise error rate to control
+        axis: axis along which the hypotheses of a single family are laid out
+        workspace: workspace holding the sorted p-values, the mask and the rejections, or None to allocate them
+
+    Returns:
+        rejected: A boolean array of the same shape as p_values, backed by the workspace if given
+    """
+    p_values, workspace = _with_workspace(p_values, workspace)
+    num_hypotheses = p_values.shape[axis]
+    p_sorted = workspace.sorted_p_values(p_values.shape, p_values.dtype)
+    np.copyto(p_sorted, p_values)
+    p_sorted.sort(axis=axis)
+
+    threshold_shape = [1] * p_values.ndim
+    threshold_shape[axis] = num_hypotheses
+    thresholds = (alpha / np.arange(num_hypotheses, 0, -1)).reshape(threshold_shape)
+
+    # The smallest sorted p-value over its threshold stops the step-down procedure: every p-value below it is
+    # rejected. Thresholds increase, so a tie of it cannot have been under its own threshold earlier
+    within_threshold = np.less_equal(p_sorted, thresholds.astype(p_values.dtype), out=workspace.mask(p_values.shape))
+    np.copyto(p_sorted, np.inf, where=within_threshold)
+    cutoff = p_sorted.min(axis=axis, keepdims=True)
+    rejected: npt.NDArray[np.bool_] = np.less(p_values, cutoff, out=workspace.rejected(p_values.shape))
+
+    return rejected
+
+
+def bonferroni_alpha(alpha: float, num_tests: int) -> float:
+    return alpha / num_tests
+
+
+def sidak_alpha(alpha: float, num_tests: int) -> float:
+    return float(-np.expm1(np.log1p(-alpha) / num_tests))
+
+
+# corrections that test every hypothesis at the same adjusted significance, whose average power is the mean power
+# of the tests at it, by the function adjusting the significance
+ANALYTIC_CORRECTIONS: Dict[str, Callable[[float, int], float]] = {"bonferroni": bonferroni_alpha, "sidak": sidak_alpha}
+# corrections whose average power is simulated
+SIMULATED_CORRECTIONS: Tuple[str, ...] = ("bh", "holm")
+CORRECTIONS: Tuple[str, ...] = SIMULATED_CORRECTIONS + tuple(ANALYTIC_CORRECTIONS)
+
+
+def _reject(
+    p_values: npt.NDArray[np.floating[Any]], alpha: float, correction: str, workspace: SimulationWorkspace
+) -> npt.NDArray[np.bool_]:
+    if correction == "holm":
+        return holm(p_values, alpha, axis=1, workspace=workspace)
+    return benjamini_hochberg(p_values, alpha, axis=1, workspace=workspace)
+
+
+def random_true_alt(
+    num_tests: int,
+    num_true_alts: Sequence[int],
+    replication: int,
+    random_state: np.random.Generator,
+    workspace: Optional[SimulationWorkspace] = None,
+) -> npt.NDArray[np.bool_]:
+    """
+    This function draws which hypotheses are true alternatives for every scenario and replication. The num_true_alt
+    smallest of m uniform draws per replication lie at random positions, so they mark exactly num_true_alt true
+    alternatives, as ties of double precision draws practically never occur. A partial sort of each scenario in the
+    workspace finds the largest of them, without the integer ranks of a full argsort
+
+    Parameters:
+        num_tests: number of hypotheses m
+        num_true_alts: number of true alternative hypotheses of each scenario
+        replication: number of replications per scenario
+        random_state: random state to generate fixed output for any given input
+        workspace: workspace holding the uniform draws, their partial sort and the true alternatives, or None to
+            allocate them
+
+    Returns:
+        true_alt: A boolean array of shape (scenarios x m hypotheses x replications), backed by the workspace if
+        given
+    """
+    if workspace is None:
+        workspace = SimulationWorkspace()
+    shape = (len(num_true_alts), num_tests, replication)
+    uniforms = random_state.random(out=workspace.uniforms(shape))
+    true_alt = workspace.true_alt(shape)
+    partitioned = workspace.sorted_p_values(shape[1:], np.float_)
+    for scenario_uniforms, scenario_true_alt, num_true_alt in zip(uniforms, true_alt, num_true_alts):
+        if num_true_alt == 0:
+            scenario_true_alt.fill(False)
+            continue
+        np.copyto(partitioned, scenario_uniforms)
+        partitioned.partition(num_true_alt - 1, axis=0)
+        np.less_equal(scenario_uniforms, partitioned[num_true_alt - 1], out=scenario_true_alt)
+
+    return true_alt
+
+
+def mean_field_average_power(
+    alternative_power: Callable[[npt.NDArray[np.float_]], npt.NDArray[np.float_]], num_tests: int, alpha: float
+) -> float:
+    """
+    This function approximates the average power of the Benjamini-Hochberg procedure without simulation. With k true
+    alternatives among m tests, a p-value threshold t rejects about R(t) = (m - k) * t + k * beta(t) hypotheses,
+    where beta(t) is the average power of a single test at significance t. BH rejects every p-value below the
+    largest t with t = alpha * R(t) / m, which is found by fixed-point iteration down from t = alpha. The average
+    power weighs each number of true alternatives k = 1..m by k, like the simulation does
+
+    The approximation replaces the random number of rejections by its mean, which slightly underestimates the
+    simulated power of small families
+
+    Parameters:
+        alternative_power: average power of a single test at each significance level of an array
+        num_tests: number of hypotheses m
+        alpha: false discovery rate to control
+
+    Returns:
+        approximate average power
+    """
+    num_true_alts = np.arange(1, num_tests + 1)
+    threshold = np.full(num_tests, float(alpha))
+    for _ in range(MEAN_FIELD_MAX_ITERATIONS):
+        rejections = (num_tests - num_true_alts) * threshold + num_true_alts * alternative_power(threshold)
+        previous_threshold, threshold = threshold, alpha * rejections / num_tests
+        if np.all(previous_threshold - threshold <= MEAN_FIELD_TOLERANCE * previous_threshold):
+            break
+
+    return float(np.sum(num_true_alts * alternative_power(threshold)) / np.sum(num_true_alts))
+
+
+def mean_field_holm_average_power(
+    alternative_power: Callable[[npt.NDArray[np.float_]], npt.NDArray[np.float_]], num_tests: int, alpha: float
+) -> float:
+    """
+    This function approximates the average power of the Holm procedure without simulation, like
+    mean_field_average_power does for BH. With k true alternatives among m tests, about
+    R(t) = (m - k) * t + k * beta(t) p-values lie below a threshold t. Holm steps down the thresholds
+    alpha / (m - j) while the p-values under the next threshold outnumber the j already rejected, so it stops at
+    the smallest t with t = alpha / (m - R(t)), which is found by fixed-point iteration up from t = alpha / m
+
+    The approximation replaces the random number of rejections by its mean, which overestimates the simulated power
+    of small families, since a single large p-value stops the step-down early
+
+    Parameters:
+        alternative_power: average power of a single test at each significance level of an array
+        num_tests: number of hypotheses m
+        alpha: family-wise error rate to control
+
+    Returns:
+        approximate average power
+    """
+    num_true_alts = np.arange(1, num_tests + 1)
+    threshold = np.full(num_tests, alpha / num_tests)
+    for _ in range(MEAN_FIELD_MAX_ITERATIONS):
+        rejections = (num_tests - num_true_alts) * threshold + num_true_alts * alternative_power(threshold)
+        previous_threshold, threshold = threshold, alpha / np.maximum(num_tests - rejections, 1)
+        if np.all(threshold - previous_threshold <= MEAN_FIELD_TOLERANCE * previous_threshold):
+            break
+
+    return float(np.sum(num_true_alts * alternative_power(threshold)) / np.sum(num_true_alts))
+
+
+def average_power_standard_error(true_discoveries: npt.NDArray[np.int_], true_alts: npt.NDArray[np.int_]) -> float:
+    """
+    This function estimates the standard error of the average power sum(true_discoveries) / sum(true_alts) with the
+    delta method for a ratio of means
+
+    Parameters:
+        true_discoveries: number of true discoveries of each independent replication
+        true_alts: number of true alternative hypotheses of each independent replication
+
+    Returns:
+        standard error of the average power, or inf for a single replication, which cannot estimate it
+    """
+    num_replications = len(true_discoveries)
+    if num_replications < 2:
+        return float("inf")
+    avg_power = true_discoveries.sum() / true_alts.sum()
+    residuals = true_discoveries - avg_power * true_alts
+    variance = np.sum(residuals**2) / (num_replications * (num_replications - 1))
+    return float(np.sqrt(variance) / np.mean(true_alts))
+
+
+def _simulate_scenarios(
+    metrics: MetricSet,
+    alpha: float,
+    sample_size: int,
+    num_true_alts: Sequence[int],
+    replication: int,
+    random_state: np.random.Generator,
+    common_random_numbers: bool = False,
+    dtype: npt.DTypeLike = np.float_,
+    correction: str = "bh",
+) -> Tuple[npt.NDArray[np.int_], npt.NDArray[np.int_]]:
+    """
+    This function simulates a chunk of true alternative counts for a block of replications in the workspace of the
+    calling thread, whose p-values are of dtype, and adjusts them with the simulated correction, 'bh' or 'holm'. It
+    is a module-level function so that it can be shipped to worker processes
+
+    Returns:
+        number of true discoveries and number of true alternative hypotheses of each replication, summed over the
+        chunk of scenarios
+    """
+    workspace = get_workspace(dtype)
+    true_alt = random_true_alt(len(metrics), num_true_alts, replication, random_state, workspace)
+    p_values = metrics.generate_p_values(
+        true_alt, sample_size, random_state, common_random_numbers, out=workspace.p_values(true_alt.shape)
+    )
+
+    rejected = _reject(p_values, alpha, correction, workspace)
+
+    true_discoveries = np.logical_and(rejected, true_alt, out=rejected)
+
+    return true_discoveries.sum(axis=(0, 1)), true_alt.sum(axis=(0, 1))
+
+
+def _simulate_shared_scenarios(
+    metrics: MetricSet,
+    alpha: float,
+    sample_size: int,
+    scenario_chunks: Sequence[Sequence[int]],
+    replication: int,
+    random_state: np.random.Generator,
+    common_random_numbers: bool = False,
+    dtype: npt.DTypeLike = np.float_,
+    correction: str = "bh",
+) -> Tuple[npt.NDArray[np.int_], npt.NDArray[np.int_]]:
+    """
+    This function simulates every chunk of true alternative counts for a block of replications from one alternative
+    and one null p-value per hypothesis and replication, drawn once and selected by the true alternatives of each
+    scenario. It draws 2 x m p-values per replication instead of m per scenario, i.e. m x (m + 1) in total. Only the
+    p-value draws shrink: random_true_alt still draws m uniforms per scenario and replication to place the true
+    alternatives of every scenario.
+
+    The draws do not depend on which hypotheses are true alternatives, so every scenario still sees correctly
+    distributed p-values and the average power estimate stays unbiased. The scenarios of a replication are no
+    longer independent though: a hypothesis that is a true alternative in two scenarios has the same p-value in
+    both, so their discoveries are positively correlated. The estimate is noisier than one from independent draws
+    with the same number of replications by more than the draws saved: for 20 tests its variance per unit of compute
+    is about 6 times that of _simulate_scenarios, and the two only break even at about 5 tests
+
+    Returns:
+        number of true discoveries and number of true alternative hypotheses of each replication, summed over all
+        scenarios
+    """
+    alt_p_values = metrics.generate_alt_p_values(replication, sample_size, random_state, common_random_numbers)
+    null_p_values = random_state.random((len(metrics), replication))
+
+    workspace = get_workspace(dtype)
+    true_discoveries = np.zeros(replication, dtype=np.int_)
+    true_alts = np.zeros(replication, dtype=np.int_)
+    for num_true_alts in scenario_chunks:
+        true_alt = random_true_alt(len(metrics), num_true_alts, replication, random_state, workspace)
+        p_values = workspace.p_values(true_alt.shape)
+        p_values[...] = null_p_values
+        np.copyto(p_values, alt_p_values, where=true_alt)
+        rejected = _reject(p_values, alpha, correction, workspace)
+        true_discoveries += np.logical_and(rejected, true_alt, out=rejected).sum(axis=(0, 1))
+        true_alts += true_alt.sum(axis=(0, 1))
+
+    return true_discoveries, true_alts
+
+
+def _fit_power_curve(
+    points: Sequence[Tuple[float, ...]], prior_slope: Optional[float] = None
+) -> Optional[Tuple[float, float]]:
+    """
+    Least-squares fit of probit(power) = intercept + slope * sqrt(sample size) through the evaluated candidates, given
+    as (sample size, power, ...) tuples. The model is exact for a single z-test, whose power is
+    Phi(effect_size * sqrt(n / 2) - z_crit), and a smooth monotone local model of the average power of a family of
+    tests. Unless the points determine an increasing fit, only the intercept is fitted to the prior slope, or None is
+    returned without one
+    """
+    from scipy import special
+
+    sample_sizes, powers = np.array(points).T[:2]
+    probits = special.ndtri(np.clip(powers, POWER_CURVE_CLIP, 1 - POWER_CURVE_CLIP))
+    if len(np.unique(sample_sizes)) >= 2:
+        slope, intercept = np.polyfit(np.sqrt(sample_sizes), probits, 1)
+        if slope > 0:
+            return intercept, slope
+    if prior_slope is None:
+        return None
+    return float(np.mean(probits - prior_slope * np.sqrt(sample_sizes))), prior_slope
+
+
+def _power_curve_sample_size(power_curve: Tuple[float, float], power: float) -> float:
+    from scipy import special
+
+    intercept, slope = power_curve
+    return float(max(special.ndtri(power) - intercept, 0) / slope) ** 2
+
+
+class SampleSizeSearchResult(NamedTuple):
+    """
+    Outcome of the multi-metric sample size search. The confidence band carries the Monte Carlo error of the
+    simulated power at sample_size over to the sample size: the true power curve may lie up to CONFIDENCE_BAND_Z
+    standard errors above or below the probit power curve fitted through the simulated candidates, and the band holds
+    the sample sizes where such a curve reaches the target power. It is clipped to the initial search bracket, which
+    contains the required sample size whatever the simulations return
+
+    Attributes:
+    sample_size: minimum required sample size per cohort
+    confidence_lower: lower end of the 95% confidence band of the required sample size, or the lower end of the
+        initial bracket without a fitted power curve
+    confidence_upper: upper end of the 95% confidence band of the required sample size, or the upper end of the
+        initial bracket without a fitted power curve
+    power: simulated average power at sample_size
+    standard_error: standard error of the simulated average power at sample_size
+    evaluations: number of candidate sample sizes simulated
+    """
+
+    sample_size: int
+    confidence_lower: int
+    confidence_upper: int
+    power: float
+    standard_error: float
+    evaluations: int
 
 
 class MultipleTestingMixin:
@@ -20,6 +436,14 @@ class MultipleTestingMixin:
     variants: number of variants, including control
     alpha: statistical significance
     power: average power, calculated as #correct rejections/#true alternative hypotheses
+    batch_scenarios: whether to simulate all numbers of true alternative hypotheses in one tensor
+    max_batch_bytes: memory budget of a batch of scenarios; larger tensors are split into chunks
+    n_jobs: number of worker processes running the simulations, None for one per CPU
+    common_random_numbers: simulate every candidate sample size from the same base random variates
+    adaptive_replication: stop simulating a candidate sample size once its power is clearly off the target
+    shared_draws: simulate all numbers of true alternative hypotheses of a replication from the same p-values
+    single_precision: simulate the p-values in float32 rather than float64
+    correction: multiple testing correction, one of CORRECTIONS
 
     """
 
@@ -27,16 +451,25 @@ class MultipleTestingMixin:
     alpha: float
     power: float
     variants: int
+    batch_scenarios: bool
+    max_batch_bytes: int
+    n_jobs: Optional[int]
+    common_random_numbers: bool
+    adaptive_replication: bool
+    shared_draws: bool
+    single_precision: bool
+    correction: str
 
     def get_multiple_sample_size(
         self,
         lower: float,
         upper: float,
-        random_state: np.random.RandomState,
-        depth: int = 0,
+        random_state: np.random.Generator,
         replication: int = DEFAULT_REPLICATION,
         epsilon: float = DEFAULT_EPSILON,
         max_recursion_depth: int = DEFAULT_MAX_RECURSION,
+        executor: Optional[Executor] = None,
+        power_curve: Optional[Tuple[float, float]] = None,
     ) -> int:
         """
         This method finds minimum required sample size per cohort that generates
@@ -45,72 +478,299 @@ class MultipleTestingMixin:
         Attributes:
             lower: lower bound of sample size search
             upper: upper bound of sample size search
-            depth: number of recursions
             replication: number of Monte Carlo simulations to calculate empirical power
             epsilon: absolute difference between our estimate for power and desired power
                 needed before we will return
-            max_recursion_depth: how many recursive calls can be made before the
+            max_recursion_depth: how many search steps can be made before the
                 search is abandoned
+            executor: pool running the simulations, or None to run them in this process
+            power_curve: intercept and slope of an approximate probit power curve to start the search from
 
         Returns
             minimum required sample size per cohort
         """
+        result = self.find_multiple_sample_size(
+            lower, upper, random_state, replication, epsilon, max_recursion_depth, executor, power_curve
+        )
+        return result.sample_size
+
+    def find_multiple_sample_size(
+        self,
+        lower: float,
+        upper: float,
+        random_state: np.random.Generator,
+        replication: int = DEFAULT_REPLICATION,
+        epsilon: float = DEFAULT_EPSILON,
+        max_recursion_depth: int = DEFAULT_MAX_RECURSION,
+        executor: Optional[Executor] = None,
+        power_curve: Optional[Tuple[float, float]] = None,
+    ) -> SampleSizeSearchResult:
+        """
+        This method searches the minimum required sample size per cohort like get_multiple_sample_size, which
+        returns only the sample_size of its result, and also reports its confidence band. Every simulated candidate
+        is kept with its power and standard error: the next candidate is where a probit
+        power curve fitted through all of them reaches the target power, falling back to the geometric midpoint of
+        the remaining bracket when the fit is not usable or proposes a size outside of it
 
-        if depth > max_recursion_depth:
-            raise RecursionError(f"Couldn't find a sample size that satisfies the power you requested: {self.power}")
+        An approximate power curve, e.g. from _surrogate_power_curve, gives the first candidate and the slope of
+        the fit until the simulated points determine their own
+
+        Attributes:
+            lower: lower bound of sample size search
+            upper: upper bound of sample size search
+            replication: number of Monte Carlo simulations to calculate empirical power
+            epsilon: absolute difference between our estimate for power and desired power
+                needed before we will return
+            max_recursion_depth: how many search steps can be made before the
+                search is abandoned
+            executor: pool running the simulations, or None to run them in this process
+            power_curve: intercept and slope of an approximate probit power curve to start the search from
+
+        Returns
+            the sample size with its confidence band, simulated power and standard error
+        """
+        prior_slope = None if power_curve is None else power_curve[1]
+        bracket = (lower, upper)
+        points: List[Tuple[int, float, float]] = []
+        candidate = self._next_candidate(power_curve, lower, upper)
+        for _ in range(max_recursion_depth + 1):
+            expected_power, standard_error = self._average_power_estimate(
+                candidate, random_state, replication, executor, epsilon if self.adaptive_replication else None
+            )
+            points.append((candidate, expected_power, standard_error))
+            if np.isclose(self.power, expected_power, atol=epsilon):
+                return self._search_result(points, *bracket, prior_slope)
+            elif lower == upper:
+                if expected_power > self.power:
+                    raise RecursionError("Unusually small sample size. Please verify input parameters")
+                else:
+                    raise RecursionError("Unusually large sample size. Please verify input parameters")
 
-        candidate = int(np.sqrt(lower * upper))
-        expected_power = self._expected_average_power(candidate, random_state, replication)
-        if np.isclose(self.power, expected_power, atol=epsilon):
-            return candidate
-        elif lower == upper:
             if expected_power > self.power:
-                raise RecursionError("Unusually small sample size. Please verify input parameters")
+                upper = candidate
             else:
-                raise RecursionError("Unusually large sample size. Please verify input parameters")
+                lower = candidate
 
-        if expected_power > self.power:
-            return self.get_multiple_sample_size(lower, candidate, random_state, depth + 1)
-        else:
-            return self.get_multiple_sample_size(candidate, upper, random_state, depth + 1)
+            candidate = self._next_candidate(_fit_power_curve(points, prior_slope), lower, upper)
+
+        raise RecursionError(f"Couldn't find a sample size that satisfies the power you requested: {self.power}")
+
+    def _next_candidate(self, power_curve: Optional[Tuple[float, float]], lower: float, upper: float) -> int:
+        candidate = int(np.sqrt(lower * upper))
+        if power_curve is not None:
+            proposal = int(_power_curve_sample_size(power_curve, self.power))
+            if lower < proposal < upper:
+                candidate = proposal
+        return candidate
+
+    def _search_result(
+        self,
+        points: List[Tuple[int, float, float]],
+        lower: float,
+        upper: float,
+        prior_slope: Optional[float] = None,
+    ) -> SampleSizeSearchResult:
+        sample_size, power, standard_error = points[-1]
+        confidence_lower, confidence_upper = lower, upper
+        power_curve = _fit_power_curve(points, prior_slope)
+        if power_curve is not None:
+            margin = CONFIDENCE_BAND_Z * standard_error
+            confidence_lower = max(lower, _power_curve_sample_size(power_curve, max(self.power - margin, 0)))
+            confidence_upper = min(upper, _power_curve_sample_size(power_curve, min(self.power + margin, 1)))
+        return SampleSizeSearchResult(
+            sample_size,
+            min(int(confidence_lower), sample_size),
+            max(int(np.ceil(confidence_upper)), sample_size),
+            power,
+            standard_error,
+            len(points),
+        )
+
+    def _analytic_sample_size(self, correction: str) -> float:
+        """
+        This method solves the sample size of a correction of ANALYTIC_CORRECTIONS, whose average power is exactly
+        the mean power of the tests at the adjusted significance, without simulation
+        """
+        check_effect_size([metric.effect_size for metric in self.metrics])
+        test_alpha = ANALYTIC_CORRECTIONS[correction](self.alpha, len(self.metrics) * (self.variants - 1))
+        # every variant repeats the tests of the metrics, which leaves their mean power unchanged
+        return float(
+            average_power_sample_size(
+                [metric.effect_size for metric in self.metrics],
+                test_alpha,
+                self.power,
+                [metric.alternative for metric in self.metrics],
+                [metric.statistic == "t" for metric in self.metrics],
+            )
+        )
+
+    def _surrogate_average_power(self, sample_size: float) -> float:
+        """
+        This method approximates the expected average power of multiple testings at sample_size with
+        mean_field_average_power, or mean_field_holm_average_power for Holm's correction. Every test is approximated
+        by a z-test, which the t-tests of Numeric metrics are close to at the degrees of freedom of any sample size
+        worth simulating
+        """
+        alternatives = np.array([[m.alternative] for m in self.metrics])
+        # the simulations test the magnitude of an effect in the direction of the alternative, whatever its sign
+        magnitudes = np.abs([[m.effect_size] for m in self.metrics])
+        effect_sizes = np.where(alternatives == "smaller", -magnitudes, magnitudes)
+
+        def alternative_power(threshold: npt.NDArray[np.float_]) -> npt.NDArray[np.float_]:
+            average_power: npt.NDArray[np.float_] = normal_power(
+                effect_sizes, sample_size, threshold, alternatives
+            ).mean(axis=0)
+            return average_power
+
+        mean_field = mean_field_holm_average_power if self.correction == "holm" else mean_field_average_power
+        return mean_field(alternative_power, len(self.metrics) * (self.variants - 1), self.alpha)
+
+    def _surrogate_power_curve(self, lower: float, upper: float) -> Optional[Tuple[float, float]]:
+        """
+        This method solves the surrogate average power for the sample size reaching the target power between lower
+        and upper, and returns the probit power curve through the surrogate around it as (intercept, slope), or None
+        if the surrogate does not cross the target power in the bracket
+        """
+        from scipy import optimize
+
+        def power_gap(log_sample_size: float) -> float:
+            return self._surrogate_average_power(np.exp(log_sample_size)) - self.power
+
+        if lower >= upper or power_gap(np.log(lower)) >= 0 or power_gap(np.log(upper)) <= 0:
+            return None
+        sample_size = float(np.exp(optimize.brentq(power_gap, np.log(lower), np.log(upper), xtol=1e-4)))
+
+        points = [(sample_size * scale, self._surrogate_average_power(sample_size * scale)) for scale in (0.9, 1.1)]
+        return _fit_power_curve(points)
 
     def _expected_average_power(
-        self, sample_size: int, random_state: np.random.RandomState, replication: int = DEFAULT_REPLICATION
+        self,
+        sample_size: int,
+        random_state: np.random.Generator,
+        replication: int = DEFAULT_REPLICATION,
+        executor: Optional[Executor] = None,
+        epsilon: Optional[float] = None,
     ) -> float:
+        """
+        This method calculates expected average power of multiple testings like _average_power_estimate, without its
+        standard error
+        """
+        return self._average_power_estimate(sample_size, random_state, replication, executor, epsilon)[0]
+
+    def _average_power_estimate(
+        self,
+        sample_size: int,
+        random_state: np.random.Generator,
+        replication: int = DEFAULT_REPLICATION,
+        executor: Optional[Executor] = None,
+        epsilon: Optional[float] = None,
+    ) -> Tuple[float, float]:
         """
         This method calculates expected average power of multiple testings. For each possible number of true null
         hypothesis, we simulate each metric/treatment variant's test statistics and calculate their p-values,
         then calculate expected average power = number of True rejection/ true alternative hypotheses
 
+        In batch mode, the scenarios are stacked into a tensor of shape
+        (true alternative count x m hypotheses x replications) that is simulated and adjusted in a single pass,
+        split into chunks of scenarios that fit into max_batch_bytes
+
+        The replications are split into blocks of DEFAULT_REPLICATION_BLOCK. Every (scenarios, block) task draws
+        from its own child stream spawned from random_state, so the result does not depend on how many workers
+        run the tasks
+
+        With common random numbers, random_state is not advanced, so every candidate sample size replays the same
+        child streams: the true alternatives and null p-values are identical and the alternative test statistics
+        are the same base variates shifted and scaled for the candidate. The estimated power is then a smooth
+        deterministic function of the sample size rather than one with independent noise at every candidate
+
+        With shared draws, each block is a single task that draws one alternative and one null p-value per
+        hypothesis and replication and builds every scenario from them, see _simulate_shared_scenarios
+
+        Every worker thread or process simulates its tasks in its own SimulationWorkspace, whose p-value, mask and
+        rejection buffers are reused by every block, candidate and search, and hold float32 p-values in single
+        precision
+
+        With epsilon, the blocks are simulated one after another and the simulation stops as soon as the confidence
+        interval of the estimate lies entirely above power + epsilon or below power - epsilon, so replications are
+        only spent in full on candidates close to the target. The blocks run in a fixed order, so the stopping
+        point does not depend on the number of workers either
+
         Attributes:
         sample size: determines the variance/ degrees of freedom of the distribution we sample test statistics from
         replication: number of times we repeat the simulation process
+        executor: pool running the simulation tasks, or None to run them in this process
+        epsilon: tolerance around the target power for adaptive replication, or None to run every replication
 
-        Returns value expected average power
+        Returns expected average power and its standard error over the simulated replications
         """
-        true_alt_count = 0.0
-        true_discovery_count = 0.0
-
-        # a metric for each test we would conduct
-        metrics = self.metrics * (self.variants - 1)
+        # a metric for each test we would conduct, in an order that does not depend on the registration order
+        metrics = MetricSet(canonical_order(self.metrics) * (self.variants - 1))
+        num_tests = len(metrics)
 
-        def fdr_bh(a: npt.NDArray[np.float_]) -> npt.NDArray[np.bool_]:
-            rejected: npt.NDArray[np.bool_] = multipletests(a, alpha=self.alpha, method="fdr_bh")[0]
-            return rejected
+        blocks = [
+            min(DEFAULT_REPLICATION_BLOCK, replication - start)
+            for start in range(0, replication, DEFAULT_REPLICATION_BLOCK)
+        ]
+        chunk_size = self._scenario_chunk_size(num_tests, blocks[0]) if self.batch_scenarios else 1
+        scenarios = [
+            range(start, min(start + chunk_size, num_tests + 1)) for start in range(1, num_tests + 1, chunk_size)
+        ]
+        simulate_task: Callable[..., Tuple[npt.NDArray[np.int_], npt.NDArray[np.int_]]] = _simulate_scenarios
+        scenario_tasks: Sequence[Any] = scenarios
+        if self.shared_draws:
+            # every block of replications draws its p-values once and simulates all chunks of scenarios from them
+            simulate_task = _simulate_shared_scenarios
+            scenario_tasks = [scenarios]
+        tasks = list(product(scenario_tasks, range(len(blocks))))
 
-        for num_true_alt in range(1, len(metrics) + 1):
-            true_alt = np.array([random_state.permutation(len(metrics)) < num_true_alt for _ in range(replication)]).T
-            p_values = []
-            for i, m in enumerate(metrics):
-                p_values.append(m.generate_p_values(true_alt[i], sample_size, random_state))
+        state = random_state.bit_generator.state
+        seed_sequence = np.random.SeedSequence(int(random_state.integers(2**63)))
+        if self.common_random_numbers:
+            random_state.bit_generator.state = state
+        bit_generator = type(random_state.bit_generator)
+        task_random_states = [np.random.Generator(bit_generator(seed)) for seed in seed_sequence.spawn(len(tasks))]
 
-            rejected = np.apply_along_axis(fdr_bh, 0, np.array(p_values))
+        if epsilon is None:
+            rounds = [list(range(len(tasks)))]
+        else:
+            rounds = [[i for i, (_, block) in enumerate(tasks) if block == b] for b in range(len(blocks))]
 
-            true_discoveries = rejected & true_alt
+        simulate: Callable[..., Iterator[Tuple[npt.NDArray[np.int_], npt.NDArray[np.int_]]]]
+        if executor is None:
+            simulate = map
+        else:
+            simulate = executor.map
+        true_discoveries: List[npt.NDArray[np.int_]] = []
+        true_alts: List[npt.NDArray[np.int_]] = []
+        for task_ids in rounds:
+            counts = simulate(
+                simulate_task,
+                repeat(metrics),
+                repeat(self.alpha),
+                repeat(sample_size),
+                [tasks[i][0] for i in task_ids],
+                [blocks[tasks[i][1]] for i in task_ids],
+                [task_random_states[i] for i in task_ids],
+                repeat(self.common_random_numbers),
+                repeat(np.float32 if self.single_precision else np.float_),
+                repeat(self.correction),
+            )
+            for task_discoveries, task_alts in counts:
+                true_discoveries.append(task_discoveries)
+                true_alts.append(task_alts)
 
-            true_discovery_count += true_discoveries.sum()
-            true_alt_count += true_alt.sum()
+            avg_power = float(np.sum(true_discoveries) / np.sum(true_alts))
+            standard_error = average_power_standard_error(np.concatenate(true_discoveries), np.concatenate(true_alts))
+            if epsilon is not None:
+                margin = ADAPTIVE_STOPPING_Z * standard_error
+                if avg_power - margin > self.power + epsilon or avg_power + margin < self.power - epsilon:
+                    break
 
-        avg_power = true_discovery_count / true_alt_count
+        return avg_power, standard_error
 
-        return avg_power
+    def _scenario_chunk_size(self, num_tests: int, replication: int) -> int:
+        """
+        Number of true alternative counts that can be simulated together within max_batch_bytes
+        """
+        scenario_bytes = BATCH_BYTES_PER_P_VALUE * num_tests * replication
+        return max(1, self.max_batch_bytes // scenario_bytes)
@@ -0,0 +1,314 @@
+from typing import Callable
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+
+ALTERNATIVES = ("two-sided", "larger", "smaller")
+SOLVER_TOLERANCE: float = 1e-10
+SOLVER_MAX_ITERATIONS: int = 50
+# a pooled two-sample t-test needs two observations per group to estimate the variance, as in statsmodels' solver
+TTEST_MIN_NOBS1: float = 2.0
+
+Alternative = Union[str, npt.ArrayLike]
+SampleSizeSolver = Callable[[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike, Alternative], npt.NDArray[np.float_]]
+
+
+class _Tails:
+    """
+    Which rejection tails each test of a (possibly array-valued) alternative uses
+    """
+
+    def __init__(self, alternative: Alternative):
+        alternative = np.asarray(alternative)
+        valid = alternative in ALTERNATIVES if alternative.ndim == 0 else np.isin(alternative, ALTERNATIVES).all()
+        if not valid:
+            raise ValueError("Error: alternative has to be 'two-sided', 'larger' or 'smaller'.")
+        self.two_sided = alternative == "two-sided"
+        self.upper = alternative != "smaller"
+        self.lower = alternative != "larger"
+
+    def orient(self, effect_size: npt.ArrayLike) -> npt.NDArray[np.float_]:
+        # a minimum detectable effect is a magnitude in the direction of the alternative, as in the simulations
+        magnitude = np.abs(effect_size)
+        oriented: npt.NDArray[np.float_] = np.where(self.upper, magnitude, -magnitude)
+        return oriented
+
+    def one_tail_alpha(self, alpha: npt.ArrayLike) -> npt.NDArray[np.float_]:
+        one_tail_alpha: npt.NDArray[np.float_] = np.where(self.two_sided, np.divide(alpha, 2), alpha)
+        return one_tail_alpha
+
+    def combine(self, upper_tail: npt.NDArray[np.float_], lower_tail: npt.NDArray[np.float_]) -> npt.NDArray[np.float_]:
+        power: npt.NDArray[np.float_] = upper_tail * self.upper + lower_tail * self.lower
+        return power
+
+
+def _normal_power(
+    effect_size: npt.ArrayLike, nobs1: npt.ArrayLike, crit: npt.NDArray[np.float_], tails: _Tails
+) -> npt.NDArray[np.float_]:
+    from scipy import special
+
+    shift = np.multiply(effect_size, np.sqrt(np.divide(nobs1, 2)))
+    return tails.combine(special.ndtr(shift - crit), special.ndtr(-shift - crit))
+
+
+def _ttest_power(
+    effect_size: npt.ArrayLike, nobs1: npt.ArrayLike, one_tail_alpha: npt.NDArray[np.float_], tails: _Tails
+) -> npt.NDArray[np.float_]:
+    from scipy import special
+
+    df = np.multiply(nobs1, 2) - 2
+    crit = special.stdtrit(df, 1 - one_tail_alpha)
+    nc = np.multiply(effect_size, np.sqrt(np.divide(nobs1, 2)))
+    return tails.combine(1 - special.nctdtr(df, nc, crit), special.nctdtr(df, nc, -crit))
+
+
+def normal_power(
+    effect_size: npt.ArrayLike, nobs1: npt.ArrayLike, alpha: npt.ArrayLike, alternative: Alternative
+) -> npt.NDArray[np.float_]:
+    """
+    This function calculates the power of a two-sample z-test with equal group sizes
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation
+        nobs1: number of observations per group
+        alpha: statistical significance
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        power of the test; all parameters broadcast against each other
+    """
+    from scipy import special
+
+    tails = _Tails(alternative)
+    crit = -special.ndtri(tails.one_tail_alpha(alpha))
+    return _normal_power(effect_size, nobs1, crit, tails)
+
+
+def ttest_power(
+    effect_size: npt.ArrayLike, nobs1: npt.ArrayLike, alpha: npt.ArrayLike, alternative: Alternative
+) -> npt.NDArray[np.float_]:
+    """
+    This function calculates the power of a two-sample t-test with equal group sizes and pooled variance
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation
+        nobs1: number of observations per group
+        alpha: statistical significance
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        power of the test; all parameters broadcast against each other
+    """
+    tails = _Tails(alternative)
+    return _ttest_power(effect_size, nobs1, tails.one_tail_alpha(alpha), tails)
+
+
+def _solve_nobs(
+    power_function: Callable[[npt.NDArray[np.float_]], npt.NDArray[np.float_]],
+    nobs1: npt.NDArray[np.float_],
+    power: npt.ArrayLike,
+    min_nobs1: float = 1 + SOLVER_TOLERANCE,
+) -> npt.NDArray[np.float_]:
+    """
+    Refine a starting number of observations per group with secant iterations until power_function reaches power,
+    or stop at min_nobs1 if the power there already exceeds it
+    """
+    target = np.asarray(power, dtype=np.float_)
+    previous_nobs1 = nobs1 * (1 + 1e-4)
+    previous_error = power_function(previous_nobs1) - target
+    error = power_function(nobs1) - target
+    for _ in range(SOLVER_MAX_ITERATIONS):
+        error_change = error - previous_error
+        step = np.divide(
+            error * (nobs1 - previous_nobs1), error_change, out=np.zeros(np.shape(error)), where=error_change != 0
+        )
+        previous_nobs1, previous_error = nobs1, error
+        nobs1 = np.maximum(nobs1 - step, min_nobs1)
+        # a step of zero because the power did not change between the last two iterates is a stall, not a root
+        stalled = (error_change == 0) & (error != 0)
+        if np.all((np.abs(nobs1 - previous_nobs1) <= SOLVER_TOLERANCE * nobs1) & ~stalled):
+            break
+        error = power_function(nobs1) - target
+    return nobs1
+
+
+def _closed_form_sample_size(
+    effect_size: npt.ArrayLike, crit: npt.NDArray[np.float_], power: npt.ArrayLike
+) -> npt.NDArray[np.float_]:
+    from scipy import special
+
+    nobs1: npt.NDArray[np.float_] = 2 * ((crit + special.ndtri(power)) / effect_size) ** 2
+    return nobs1
+
+
+def check_effect_size(effect_size: npt.ArrayLike) -> None:
+    """
+    This function checks that every effect size has a finite sample size to solve for: a zero mde, or a zero
+    variance of the baseline, gives a zero or undefined effect size
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation
+    """
+    effect_size = np.asarray(effect_size)
+    if not np.all(np.isfinite(effect_size) & (effect_size != 0)):
+        raise ValueError("Error: Please provide a non-zero mde and variance for every experiment.")
+
+
+def normal_sample_size(
+    effect_size: npt.ArrayLike, alpha: npt.ArrayLike, power: npt.ArrayLike, alternative: Alternative
+) -> npt.NDArray[np.float_]:
+    """
+    This function solves the number of observations per group of a two-sample z-test in closed form,
+    n = 2 * (z_{1-alpha/k} + z_{power})^2 / effect_size^2, with k = 2 for two-sided tests. Two-sided tests are
+    refined with a few secant steps to account for the rejections in the opposite tail
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation, whose sign is
+            ignored: the effect is taken in the direction of a one-sided alternative
+        alpha: statistical significance
+        power: statistical power
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        number of observations per group, not rounded; all parameters broadcast against each other
+    """
+    from scipy import special
+
+    tails = _Tails(alternative)
+    effect_size = tails.orient(effect_size)
+    crit = -special.ndtri(tails.one_tail_alpha(alpha))
+    nobs1 = _closed_form_sample_size(effect_size, crit, power)
+    if not tails.two_sided.any():
+        return nobs1
+    return _solve_nobs(lambda n: _normal_power(effect_size, n, crit, tails), nobs1, power)
+
+
+def ttest_sample_size(
+    effect_size: npt.ArrayLike, alpha: npt.ArrayLike, power: npt.ArrayLike, alternative: Alternative
+) -> npt.NDArray[np.float_]:
+    """
+    This function solves the number of observations per group of a two-sample t-test with secant iterations
+    seeded from the closed-form z-test solution
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation, whose sign is
+            ignored: the effect is taken in the direction of a one-sided alternative
+        alpha: statistical significance
+        power: statistical power
+        alternative: 'two-sided', 'larger' or 'smaller'
+
+    Returns:
+        number of observations per group, not rounded and at least TTEST_MIN_NOBS1; all parameters broadcast against
+        each other
+    """
+    from scipy import special
+
+    tails = _Tails(alternative)
+    effect_size = tails.orient(effect_size)
+    one_tail_alpha = tails.one_tail_alpha(alpha)
+    crit = -special.ndtri(one_tail_alpha)
+    # the z-test solution plus Guenther's z^2/4 correction for the heavier tails of the t distribution, which large
+    # effects push below the smallest number of observations the t-test is defined for
+    nobs1 = np.maximum(_closed_form_sample_size(effect_size, crit, power) + crit**2 / 4, TTEST_MIN_NOBS1)
+    return _solve_nobs(lambda n: _ttest_power(effect_size, n, one_tail_alpha, tails), nobs1, power, TTEST_MIN_NOBS1)
+
+
+def _solve_bracketed_nobs(
+    power_function: Callable[[npt.NDArray[np.float_]], npt.NDArray[np.float_]],
+    lower: npt.NDArray[np.float_],
+    upper: npt.NDArray[np.float_],
+    power: npt.ArrayLike,
+) -> npt.NDArray[np.float_]:
+    """
+    Find the number of observations per group between lower and upper at which the increasing power_function reaches
+    power with the Illinois variant of regula falsi, which keeps every root bracketed however flat the function is
+    """
+    target = np.asarray(power, dtype=np.float_)
+    lower_error = power_function(lower) - target
+    upper_error = power_function(upper) - target
+    # which end of the bracket the last step replaced: 1 for upper, -1 for lower
+    replaced = np.zeros(np.shape(lower_error))
+    nobs1 = lower
+    for _ in range(SOLVER_MAX_ITERATIONS):
+        previous_nobs1 = nobs1
+        error_range = upper_error - lower_error
+        nobs1 = np.where(
+            error_range > 0,
+            upper
+            - upper_error
+            * np.divide(upper - lower, error_range, out=np.zeros(np.shape(error_range)), where=error_range > 0),
+            lower,
+        )
+        if np.all(np.abs(nobs1 - previous_nobs1) <= SOLVER_TOLERANCE * nobs1):
+            break
+        error = power_function(nobs1) - target
+        replace_upper = error >= 0
+        # Illinois: an end that survives two steps in a row has its error halved, so that it moves next time
+        lower_error = np.where(replace_upper & (replaced == 1), lower_error / 2, lower_error)
+        upper_error = np.where(~replace_upper & (replaced == -1), upper_error / 2, upper_error)
+        upper, upper_error = np.where(replace_upper, nobs1, upper), np.where(replace_upper, error, upper_error)
+        lower, lower_error = np.where(replace_upper, lower, nobs1), np.where(replace_upper, lower_error, error)
+        replaced = np.where(replace_upper, 1, -1)
+    return nobs1
+
+
+def average_power_sample_size(
+    effect_size: npt.ArrayLike,
+    alpha: npt.ArrayLike,
+    power: npt.ArrayLike,
+    alternative: Alternative,
+    t_test: npt.ArrayLike = False,
+) -> npt.NDArray[np.float_]:
+    """
+    This function solves the number of observations per group at which the average power of a family of two-sample
+    tests, each at significance alpha, reaches power. It is the sample size of multiple testing corrections that
+    test every hypothesis at the same adjusted significance, like Bonferroni's, whose average power is exactly the
+    mean of the powers of the tests
+
+    The root lies between the smallest and the largest sample size of a single test of the family, where the
+    average power is below and above power, and is found by regula falsi for every family at once
+
+    Parameters:
+        effect_size: difference in means divided by the standard deviation of a single observation of each test,
+            with the tests of a family along the last axis. Its sign is ignored: the effect is taken in the direction
+            of a one-sided alternative
+        alpha: statistical significance of each test of a family
+        power: average power
+        alternative: 'two-sided', 'larger' or 'smaller' of each test
+        t_test: whether each test is a t-test rather than a z-test
+
+    Returns:
+        number of observations per group of each family, not rounded
+    """
+    from scipy import special
+
+    effect_size, alternative, t_test = np.broadcast_arrays(effect_size, alternative, np.asarray(t_test, dtype=bool))
+    effect_size = _Tails(alternative).orient(effect_size)
+    test_alpha = np.broadcast_to(np.expand_dims(alpha, -1), effect_size.shape)
+    test_power = np.broadcast_to(np.expand_dims(power, -1), effect_size.shape)
+    z_test = ~t_test
+
+    sample_sizes = np.empty(effect_size.shape)
+    sample_sizes[z_test] = normal_sample_size(
+        effect_size[z_test], test_alpha[z_test], test_power[z_test], alternative[z_test]
+    )
+    sample_sizes[t_test] = ttest_sample_size(
+        effect_size[t_test], test_alpha[t_test], test_power[t_test], alternative[t_test]
+    )
+
+    # the tails and critical values do not depend on the sample size, so they are set up once for all iterations
+    z_tails = _Tails(alternative[z_test])
+    crit = -special.ndtri(z_tails.one_tail_alpha(test_alpha[z_test]))
+    t_tails = _Tails(alternative[t_test])
+    one_tail_alpha = t_tails.one_tail_alpha(test_alpha[t_test])
+
+    def average_power(nobs1: npt.NDArray[np.float_]) -> npt.NDArray[np.float_]:
+        test_nobs1 = np.broadcast_to(np.expand_dims(nobs1, -1), effect_size.shape)
+        powers = np.empty(effect_size.shape)
+        powers[z_test] = _normal_power(effect_size[z_test], test_nobs1[z_test], crit, z_tails)
+        powers[t_test] = _ttest_power(effect_size[t_test], test_nobs1[t_test], one_tail_alpha, t_tails)
+        mean_power: npt.NDArray[np.float_] = powers.mean(axis=-1)
+        return mean_power
+
+    return _solve_bracketed_nobs(average_power, sample_sizes.min(axis=-1), sample_sizes.max(axis=-1), power)
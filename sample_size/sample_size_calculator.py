@@ -1,27 +1,108 @@
 import json
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import TypeVar
+from typing import Union
 
 import numpy as np
-from jsonschema import validate
 
+from sample_size.cache import ResultCache
+from sample_size.cache import canonical_key
+from sample_size.engine import SimulationEngine
 from sample_size.metrics import BaseMetric
 from sample_size.metrics import BooleanMetric
 from sample_size.metrics import NumericMetric
 from sample_size.metrics import RatioMetric
+from sample_size.metrics import canonical_order
+from sample_size.multiple_testing import ANALYTIC_CORRECTIONS
+from sample_size.multiple_testing import CORRECTIONS
+from sample_size.multiple_testing import DEFAULT_EPSILON
+from sample_size.multiple_testing import DEFAULT_MAX_BATCH_BYTES
+from sample_size.multiple_testing import DEFAULT_MAX_RECURSION
+from sample_size.multiple_testing import DEFAULT_REPLICATION
 from sample_size.multiple_testing import MultipleTestingMixin
+from sample_size.multiple_testing import SampleSizeSearchResult
+from sample_size.power import check_effect_size
+from sample_size.workspace import release_workspaces
 
 DEFAULT_ALPHA = 0.05
 DEFAULT_POWER = 0.8
 DEFAULT_VARIANTS = 2
-RANDOM_STATE = np.random.RandomState(1)
-STATE = RANDOM_STATE.get_state()
+DEFAULT_SEED = 1
+DEFAULT_BIT_GENERATOR = np.random.PCG64
+
+if TYPE_CHECKING:
+    from jsonschema.protocols import Validator
+
+SearchResult = TypeVar("SearchResult", int, SampleSizeSearchResult)
+
+RandomStateType = Union[None, int, np.integer[Any], np.random.SeedSequence, np.random.Generator]
+
+
+def get_random_state(
+    random_state: RandomStateType, bit_generator: Type[np.random.BitGenerator] = DEFAULT_BIT_GENERATOR
+) -> np.random.Generator:
+    """
+    Build a numpy Generator from a seed, or return random_state untouched if it is a Generator already
+
+    Parameters:
+        random_state: a seed, a SeedSequence or a Generator
+        bit_generator: bit generator class used to seed a new Generator, e.g. np.random.PCG64 or np.random.Philox
+
+    Returns:
+        a numpy Generator
+    """
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    return np.random.Generator(bit_generator(random_state))
+
 
 schema_file_path = Path(Path(__file__).parent, "metrics_schema.json")
-with open(str(schema_file_path), "r") as schema_file:
-    METRICS_SCHEMA = json.load(schema_file)
+
+
+@lru_cache(maxsize=None)
+def get_metrics_schema() -> Dict[str, Any]:
+    """
+    Read the JSON schema of registered metrics on first use, so that importing the calculator does not touch the disk
+
+    Returns:
+        the metrics schema
+    """
+    with open(str(schema_file_path), "r") as schema_file:
+        schema: Dict[str, Any] = json.load(schema_file)
+    return schema
+
+
+@lru_cache(maxsize=None)
+def get_metrics_validator() -> "Validator":
+    """
+    Build the validator of registered metrics once. jsonschema.validate checks the schema against its metaschema and
+    creates a new validator on every call, which costs far more than validating a small list of metrics
+
+    Returns:
+        a jsonschema validator of the metrics schema
+    """
+    from jsonschema.validators import validator_for
+
+    schema = get_metrics_schema()
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def __getattr__(name: str) -> Any:
+    # METRICS_SCHEMA used to be loaded at import time and is still available under its old name
+    if name == "METRICS_SCHEMA":
+        return get_metrics_schema()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class SampleSizeCalculator(MultipleTestingMixin):
@@ -31,48 +112,221 @@ class SampleSizeCalculator(MultipleTestingMixin):
     Attributes:
     alpha: statistical significance
     power: statistical power
+    variants: number of variants, including control
+    batch_scenarios: simulate all numbers of true alternative hypotheses in one vectorized pass
+    max_batch_bytes: memory budget of the batched simulation
+    random_state: seed or numpy Generator used by the simulations. A seed starts a new random stream owned by
+        each get_sample_size call, so concurrent calls are reproducible and thread-safe; a Generator is used as is
+        and must not be shared between threads
+    bit_generator: bit generator class used to seed random_state
+    n_jobs: number of processes running the multi-metric simulations, None for one per CPU. The result for a given
+        random_state is the same for any number of processes. The processes are started for every get_sample_size
+        call; pass a running SimulationEngine to get_sample_size to reuse processes instead
+    common_random_numbers: simulate every candidate sample size of the multi-metric search from the same base
+        random variates, so the estimated power changes smoothly with the sample size and the search does not
+        bounce on Monte Carlo noise. Numeric metrics draw their chi-square variates by inverse transform
+        in this mode, which is slower per draw
+    adaptive_replication: simulate the replications of each candidate sample size in blocks and stop as soon as
+        its estimated power is clearly above or below the target, spending the full replication budget only on
+        candidates close to it
+    shared_draws: simulate every number of true alternative hypotheses of a replication from the same alternative
+        and null p-value of each hypothesis, drawn once per replication rather than once per scenario. This cuts the
+        p-value draws by a factor of about m / 2 for m tests; the uniform draws that place the true alternatives of
+        every scenario, about m x m per replication, are still made. The estimated average power stays unbiased,
+        but the scenarios of a replication become positively correlated, which costs more precision than the mode
+        saves time for many tests: with 20 Boolean metrics at a sample size of 7000, the standard deviation of the
+        estimate grows from 0.0021 to 0.0062 while an estimate only gets faster from 10.6 to 7.2 ms, about 6 times
+        the variance per unit of compute. The two modes break even at about 5 tests, so the mode only saves time
+        for small m; beyond that the search, with its fixed replications and epsilon, is noticeably less accurate
+    single_precision: simulate and adjust the p-values of the multi-metric search in float32 rather than float64,
+        which halves the memory traffic of the BH procedure for large numbers of tests. The random draws stay the
+        same, so the average power only differs where a p-value rounds across a rejection threshold
+    correction: multiple testing correction of the multi-metric sample size. 'bh' (Benjamini-Hochberg) and 'holm'
+        are simulated. 'bonferroni' and 'sidak' test every hypothesis at the same adjusted significance, so their
+        average power is the mean power of the tests and their sample size is solved analytically in about a
+        millisecond; the simulation settings do not apply to them
+    warm_start: start the multi-metric search from an analytic approximation of the average power of the BH
+        procedure, so that it usually only needs to verify one or two candidates by simulation
+    cache: store of multi-metric sample sizes, e.g. sample_size.cache.LRUCache or SQLiteCache, keyed on every
+        setting that determines the result. Calculators with a Generator or SeedSequence random_state do not use
+        the cache
 
     """
 
-    def __init__(self, alpha: float = DEFAULT_ALPHA, variants: int = DEFAULT_VARIANTS, power: float = DEFAULT_POWER):
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        variants: int = DEFAULT_VARIANTS,
+        power: float = DEFAULT_POWER,
+        batch_scenarios: bool = False,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        random_state: RandomStateType = DEFAULT_SEED,
+        bit_generator: Type[np.random.BitGenerator] = DEFAULT_BIT_GENERATOR,
+        n_jobs: Optional[int] = 1,
+        common_random_numbers: bool = False,
+        adaptive_replication: bool = False,
+        shared_draws: bool = False,
+        single_precision: bool = False,
+        correction: str = "bh",
+        warm_start: bool = True,
+        cache: Optional[ResultCache] = None,
+    ):
         self.alpha = alpha
         self.power = power
         self.metrics: List[BaseMetric] = []
         self.variants: int = variants
+        self.batch_scenarios = batch_scenarios
+        self.max_batch_bytes = max_batch_bytes
+        self.random_state = random_state
+        self.bit_generator = bit_generator
+        self.n_jobs = n_jobs
+        self.common_random_numbers = common_random_numbers
+        self.adaptive_replication = adaptive_replication
+        self.shared_draws = shared_draws
+        self.single_precision = single_precision
+        if correction not in CORRECTIONS:
+            raise ValueError("Error: correction has to be 'bh', 'holm', 'bonferroni' or 'sidak'.")
+        self.correction = correction
+        self.warm_start = warm_start
+        self.cache = cache
+        self._single_sample_sizes: Dict[Tuple[BaseMetric, float, float], int] = {}
 
     def _get_single_sample_size(self, metric: BaseMetric, alpha: float) -> float:
-        effect_size = metric.mde / float(np.sqrt(metric.variance))
-        power_analysis = metric.power_analysis_instance
-        sample_size = int(
-            power_analysis.solve_power(
-                effect_size=effect_size,
-                alpha=alpha,
-                power=self.power,
-                ratio=1,
-                alternative=metric.alternative,
+        # metrics are immutable values, so equal metrics, e.g. of the variants of a test, share their sample size
+        key = (metric, alpha, self.power)
+        if key not in self._single_sample_sizes:
+            check_effect_size(metric.effect_size)
+            self._single_sample_sizes[key] = int(
+                metric.sample_size_solver(metric.effect_size, alpha, self.power, metric.alternative)
             )
-        )
-        return sample_size
+        return self._single_sample_sizes[key]
+
+    def get_sample_size(self, engine: Optional[SimulationEngine] = None) -> float:
+        """
+        This method calculates the sample size per group
 
-    def get_sample_size(self) -> float:
+        Parameters:
+            engine: running SimulationEngine to simulate multi-metric sample sizes on, instead of the processes
+                given by n_jobs
+
+        Returns:
+            sample size per group
+        """
         if len(self.metrics) * (self.variants - 1) < 2:
             return self._get_single_sample_size(self.metrics[0], self.alpha)
+        if self.correction in ANALYTIC_CORRECTIONS:
+            return int(self._analytic_sample_size(self.correction))
+
+        cache = self.cache
+        cache_key = self._cache_key()
+        if cache is None or cache_key is None:
+            return self._simulate_sample_size(engine)
+
+        sample_size = cache.get(cache_key)
+        if sample_size is None:
+            sample_size = self._simulate_sample_size(engine)
+            cache.set(cache_key, sample_size)
+        return sample_size
+
+    def get_sample_size_result(self, engine: Optional[SimulationEngine] = None) -> SampleSizeSearchResult:
+        """
+        This method calculates the sample size per group like get_sample_size, with the confidence band, simulated
+        average power and standard error of a multi-metric sample size. A sample size solved without simulation,
+        i.e. of a single test or an analytic correction, is exact: its band is the sample size itself at the target
+        power. The result is not cached
 
+        Parameters:
+            engine: running SimulationEngine to simulate multi-metric sample sizes on, instead of the processes
+                given by n_jobs
+
+        Returns:
+            sample size per group with its confidence band, see SampleSizeSearchResult
+        """
+        if len(self.metrics) * (self.variants - 1) < 2 or self.correction in ANALYTIC_CORRECTIONS:
+            sample_size = int(self.get_sample_size())
+            return SampleSizeSearchResult(sample_size, sample_size, sample_size, self.power, 0.0, 0)
+        return self._simulate(self.find_multiple_sample_size, engine)
+
+    def _simulate_sample_size(self, engine: Optional[SimulationEngine] = None) -> int:
+        return self._simulate(self.get_multiple_sample_size, engine)
+
+    def _simulate(self, search: Callable[..., SearchResult], engine: Optional[SimulationEngine] = None) -> SearchResult:
+        """
+        This method runs search, get_multiple_sample_size or find_multiple_sample_size, over the bracket of the
+        required sample size with the random state of the calculator and, with warm_start, the surrogate power curve
+        """
         num_tests = len(self.metrics) * (self.variants - 1)
         lower = min([self._get_single_sample_size(metric, self.alpha) for metric in self.metrics])
-        upper = max([self._get_single_sample_size(metric, self.alpha / num_tests) for metric in self.metrics])
+        if self.correction == "holm":
+            # Holm rejects everything Bonferroni does, so it needs at most Bonferroni's sample size
+            upper = np.ceil(self._analytic_sample_size("bonferroni"))
+        else:
+            upper = max([self._get_single_sample_size(metric, self.alpha / num_tests) for metric in self.metrics])
+
+        power_curve = self._surrogate_power_curve(lower, upper) if self.warm_start else None
+
+        random_state = get_random_state(self.random_state, self.bit_generator)
+        try:
+            if engine is not None:
+                return search(lower, upper, random_state, executor=engine.executor, power_curve=power_curve)
+            if self.n_jobs == 1:
+                return search(lower, upper, random_state, power_curve=power_curve)
 
-        RANDOM_STATE.set_state(STATE)
-        return self.get_multiple_sample_size(lower, upper, RANDOM_STATE)
+            with SimulationEngine(workers=self.n_jobs) as engine:
+                return search(lower, upper, random_state, executor=engine.executor, power_curve=power_curve)
+        finally:
+            # the buffers of the simulations in this thread can grow to max_batch_bytes; free them rather than keep
+            # them for as long as the thread lives, e.g. in the thread pool of a server. The worker processes of an
+            # engine keep theirs until it shuts down
+            release_workspaces()
 
-    def register_metrics(self, metrics: List[Dict[str, Any]]) -> None:
+    def _cache_key(self) -> Optional[str]:
+        if not isinstance(self.random_state, (int, np.integer)):
+            return None
+
+        configuration = {
+            "alpha": float(self.alpha),
+            "power": float(self.power),
+            "variants": int(self.variants),
+            "random_state": int(self.random_state),
+            "bit_generator": self.bit_generator.__name__,
+            "replication": DEFAULT_REPLICATION,
+            "epsilon": DEFAULT_EPSILON,
+            "max_recursion_depth": DEFAULT_MAX_RECURSION,
+            "batch_scenarios": self.batch_scenarios,
+            "max_batch_bytes": self.max_batch_bytes if self.batch_scenarios else None,
+            "common_random_numbers": self.common_random_numbers,
+            "adaptive_replication": self.adaptive_replication,
+            "shared_draws": self.shared_draws,
+            "single_precision": self.single_precision,
+            "correction": self.correction,
+            "warm_start": self.warm_start,
+            "metrics": [metric.canonical_parameters for metric in canonical_order(self.metrics)],
+        }
+        return canonical_key(configuration)
+
+    def register_metrics(self, metrics: List[Dict[str, Any]], validate: bool = True) -> None:
+        """
+        This method registers metrics described in the format of metrics_schema.json
+
+        Parameters:
+            metrics: list of {"metric_type": ..., "metric_metadata": {...}} dictionaries
+            validate: check metrics against the schema. Input that has been validated before, e.g. by the service
+                that stored it, can skip the check; the metric constructors still check the values of the parameters
+        """
         METRIC_REGISTER_MAP = {
             "boolean": BooleanMetric,
             "numeric": NumericMetric,
             "ratio": RatioMetric,
         }
 
-        validate(instance=metrics, schema=METRICS_SCHEMA)
+        if validate:
+            from jsonschema.exceptions import best_match
+
+            # raise the same error as jsonschema.validate
+            error = best_match(get_metrics_validator().iter_errors(metrics))
+            if error is not None:
+                raise error
 
         for metric in metrics:
             metric_class = METRIC_REGISTER_MAP[metric["metric_type"]]
@@ -0,0 +1,192 @@
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import Union
+
+from sample_size.batch import get_calculator
+from sample_size.batch import parse_spec
+
+STANDARD_STREAM = "-"
+FORMATS = ("json", "jsonl", "csv")
+DEFAULT_STREAM_FORMAT = "jsonl"
+CSV_COLUMNS = ("alpha", "power", "variants", "metrics")
+RESULT_COLUMNS = CSV_COLUMNS + ("sample_size", "error")
+
+
+def get_format(path: str, file_format: Optional[str] = None) -> str:
+    """
+    This function returns file_format if it is given, or infers it from the extension of path. Standard input and
+    output default to JSON lines
+
+    Parameters:
+        path: file path, or '-' for the standard streams
+        file_format: 'json', 'jsonl' or 'csv'
+
+    Returns:
+        the format of the file
+    """
+    if file_format is None:
+        file_format = DEFAULT_STREAM_FORMAT if path == STANDARD_STREAM else Path(path).suffix.lower().lstrip(".")
+    if file_format not in FORMATS:
+        raise ValueError(f"Error: Please provide a .json, .jsonl or .csv file, or the format of {path}.")
+    return file_format
+
+
+@contextmanager
+def open_file(path: str, mode: str) -> Iterator[IO[str]]:
+    if path == STANDARD_STREAM:
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    # csv handles the line endings itself and needs files opened without newline translation
+    with open(path, mode, newline="") as file:
+        yield file
+
+
+class UnreadableSpec(NamedTuple):
+    """
+    A record of an input file that could not be read as an experiment spec. It takes the place of the spec, so that
+    a malformed record only fails its own result
+
+    Attributes:
+    error: why the record could not be read, with its position in the file
+    """
+
+    error: str
+
+
+def _check_spec(spec: Any, position: str) -> Union[Dict[str, Any], UnreadableSpec]:
+    if isinstance(spec, dict):
+        return spec
+    return UnreadableSpec(f"Error: {position} does not hold an experiment spec, but {json.dumps(spec)}.")
+
+
+def read_specs(file: IO[str], file_format: str) -> Iterator[Union[Dict[str, Any], UnreadableSpec]]:
+    """
+    This function reads experiment specs one at a time. JSON lines and CSV files are streamed, a JSON file holds a
+    single spec or an array of them and is read at once. Every line of a JSON lines or CSV file is read on its own,
+    so that a malformed line only yields an UnreadableSpec in its place. A malformed JSON file is a single
+    UnreadableSpec
+
+    Parameters:
+        file: open text file
+        file_format: 'json', 'jsonl' or 'csv'
+
+    Returns:
+        experiment specs, dictionaries with optional alpha, power and variants and the metrics to register in
+        the format of metrics_schema.json, or UnreadableSpec. In CSV files, the metrics column holds the
+        JSON-encoded list of metrics
+    """
+    if file_format == "jsonl":
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield _check_spec(json.loads(line), f"line {line_number}")
+                except json.JSONDecodeError as e:
+                    yield UnreadableSpec(f"Error: line {line_number} is not valid JSON: {e}.")
+    elif file_format == "csv":
+        reader = csv.DictReader(file)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # the line that failed is not counted by the reader yet
+                yield UnreadableSpec(f"Error: line {reader.line_num + 1} is not a valid CSV row: {e}.")
+                continue
+            if None in row:
+                # the values beyond the columns of the header are collected under the key None
+                yield UnreadableSpec(f"Error: line {reader.line_num} has more values than the header has columns.")
+            else:
+                yield {column: value for column, value in row.items() if value}
+    else:
+        try:
+            specs = json.load(file)
+        except json.JSONDecodeError as e:
+            yield UnreadableSpec(f"Error: the file is not valid JSON: {e}.")
+            return
+        if isinstance(specs, list):
+            for index, spec in enumerate(specs):
+                yield _check_spec(spec, f"item {index}")
+        else:
+            yield _check_spec(specs, "the file")
+
+
+def get_sample_size(spec: Union[Dict[str, Any], UnreadableSpec]) -> Dict[str, Any]:
+    """
+    This function calculates the sample size of an experiment spec
+
+    Parameters:
+        spec: experiment spec as read by read_specs
+
+    Returns:
+        the parsed spec with its sample_size, or the spec as given with the error that prevented the calculation
+    """
+    if isinstance(spec, UnreadableSpec):
+        return {"error": spec.error}
+    try:
+        parsed_spec = parse_spec(spec)
+        return {**parsed_spec, "sample_size": get_calculator(parsed_spec).get_sample_size()}
+    except Exception as e:
+        return {**spec, "error": str(e)}
+
+
+def write_results(results: Iterable[Dict[str, Any]], file: IO[str], file_format: str) -> None:
+    """
+    This function writes every result as soon as it is available, so that a long batch can be followed and its
+    output consumed while it runs
+
+    Parameters:
+        results: results as returned by get_sample_size
+        file: open text file
+        file_format: 'json', 'jsonl' or 'csv'
+    """
+    if file_format == "csv":
+        writer = csv.DictWriter(file, RESULT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+    elif file_format == "json":
+        file.write("[")
+
+    try:
+        for index, result in enumerate(results):
+            if file_format == "csv":
+                metrics = result.get("metrics")
+                if metrics is not None and not isinstance(metrics, str):
+                    metrics = json.dumps(metrics)
+                writer.writerow({**result, "metrics": metrics})
+            elif file_format == "json":
+                file.write(("," if index else "") + "\n" + json.dumps(result))
+            else:
+                file.write(json.dumps(result) + "\n")
+            file.flush()
+    finally:
+        # the results written so far stay a valid JSON array if the batch is interrupted
+        if file_format == "json":
+            file.write("\n]\n")
+
+
+def run_batch(
+    input_path: str, output_path: str, input_format: Optional[str] = None, output_format: Optional[str] = None
+) -> None:
+    """
+    This function calculates the sample sizes of the experiment specs of a file, one spec at a time
+
+    Parameters:
+        input_path: file of experiment specs, or '-' for the standard input
+        output_path: file to write the results to, or '-' for the standard output
+        input_format: format of the input, inferred from its extension by default
+        output_format: format of the output, inferred from its extension by default
+    """
+    input_format = get_format(input_path, input_format)
+    output_format = get_format(output_path, output_format)
+    with open_file(input_path, "r") as input_file, open_file(output_path, "w") as output_file:
+        write_results(map(get_sample_size, read_specs(input_file, input_format)), output_file, output_format)
@@ -1,4 +1,28 @@
-def main() -> None:
+import argparse
+from typing import List
+from typing import Optional
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="run-sample-size",
+        description="Calculate the sample size per group of experiments. Without --input, the calculator prompts for "
+        "a single experiment.",
+    )
+    parser.add_argument(
+        "--input",
+        help="file of experiment specs, '-' for the standard input. A spec holds the alpha, power and variants of an "
+        "experiment, all optional, and its metrics in the format of metrics_schema.json. JSON files hold a spec or a "
+        "list of specs, JSON lines files a spec per line, and CSV files the columns alpha, power, variants and "
+        "metrics, the latter JSON-encoded",
+    )
+    parser.add_argument("--output", default="-", help="file to write the results to, the standard output by default")
+    parser.add_argument("--input-format", choices=("json", "jsonl", "csv"), help="defaults to the input extension")
+    parser.add_argument("--output-format", choices=("json", "jsonl", "csv"), help="defaults to the output extension")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Calculate sample size based on user inputs for
         1. metric type: Boolean, Numeric, or Ratio (case insensitive)
@@ -11,7 +35,19 @@ def main() -> None:
     NOTES:
         1. default statistical power is used in this script all the time
         2. the calculator supports single metric per calculator for now
+        3. with --input, the sample sizes of every experiment spec of the input are written to --output instead,
+           see run-sample-size --help
     """
+    args = get_parser().parse_args(argv)
+    if args.input is not None:
+        from sample_size.scripts.batch_utils import run_batch
+
+        try:
+            run_batch(args.input, args.output, args.input_format, args.output_format)
+        except Exception as e:
+            raise SystemExit(f"Error! The calculator isn't able to process {args.input} due to \n{e}")
+        return
+
     from sample_size.sample_size_calculator import SampleSizeCalculator
     from sample_size.scripts.input_utils import get_alpha
     from sample_size.scripts.input_utils import get_metrics
@@ -0,0 +1,103 @@
+import threading
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+_local = threading.local()
+
+
+class SimulationWorkspace:
+    """
+    This class owns the buffers that the multi-metric simulations write their p-values, true alternative masks and
+    rejections into, so that simulating a block of replications does not allocate and free arrays of
+    (scenarios x m hypotheses x replications) for every scenario of every candidate sample size. A buffer grows to
+    the largest shape asked for and is then reused, so a workspace holds at most one batch of scenarios per buffer,
+    which max_batch_bytes bounds
+
+    A buffer stays valid until the next request for the same name, so workspaces must not be shared between threads;
+    get_workspace gives every thread its own
+
+    Attributes:
+    dtype: floating point type of the p-value buffers, float64 or float32
+    """
+
+    def __init__(self, dtype: npt.DTypeLike = np.float_):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.float64), np.dtype(np.float32)):
+            raise ValueError("Error: Please provide a float64 or float32 precision for the simulations.")
+        self._buffers: Dict[str, npt.NDArray[Any]] = {}
+
+    def buffer(self, name: str, shape: Tuple[int, ...], dtype: npt.DTypeLike) -> npt.NDArray[Any]:
+        """
+        This method returns an uninitialized array of shape and dtype backed by the buffer called name, which
+        replaces the buffer only when it is too small
+
+        Parameters:
+            name: name of the buffer, e.g. p_values
+            shape: shape of the array
+            dtype: data type of the array
+
+        Returns:
+            an uninitialized C-contiguous array
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.nbytes < nbytes:
+            buffer = self._buffers[name] = np.empty(nbytes, dtype=np.uint8)
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def p_values(self, shape: Tuple[int, ...]) -> npt.NDArray[np.floating[Any]]:
+        return self.buffer("p_values", shape, self.dtype)
+
+    def true_alt(self, shape: Tuple[int, ...]) -> npt.NDArray[np.bool_]:
+        return self.buffer("true_alt", shape, np.bool_)
+
+    def mask(self, shape: Tuple[int, ...]) -> npt.NDArray[np.bool_]:
+        return self.buffer("mask", shape, np.bool_)
+
+    def rejected(self, shape: Tuple[int, ...]) -> npt.NDArray[np.bool_]:
+        return self.buffer("rejected", shape, np.bool_)
+
+    def uniforms(self, shape: Tuple[int, ...]) -> npt.NDArray[np.float_]:
+        # the random draws stay in double precision, so both precisions simulate the same random numbers
+        return self.buffer("uniforms", shape, np.float_)
+
+    def sorted_p_values(self, shape: Tuple[int, ...], dtype: npt.DTypeLike) -> npt.NDArray[Any]:
+        # random_true_alt selects the true alternatives of a scenario in this buffer before the corrections sort the
+        # p-values of the batch into it, so both share the memory
+        return self.buffer("sorted_p_values", shape, dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def release(self) -> None:
+        """
+        This method frees the buffers. They are allocated again by the next simulation
+        """
+        self._buffers.clear()
+
+
+def get_workspace(dtype: npt.DTypeLike = np.float_) -> SimulationWorkspace:
+    """
+    This function returns the workspace of the calling thread for p-values of dtype, which lives as long as the
+    thread, e.g. a worker process of a SimulationEngine, and is reused by all its simulations. Its buffers stay
+    allocated until release_workspaces, which SampleSizeCalculator calls after every simulated sample size
+    """
+    workspaces: Dict[np.dtype[Any], SimulationWorkspace] = _local.__dict__.setdefault("workspaces", {})
+    dtype = np.dtype(dtype)
+    if dtype not in workspaces:
+        workspaces[dtype] = SimulationWorkspace(dtype)
+    return workspaces[dtype]
+
+
+def release_workspaces() -> None:
+    """
+    This function frees the buffers of the workspaces of the calling thread
+    """
+    for workspace in _local.__dict__.get("workspaces", {}).values():
+        workspace.release()
@@ -0,0 +1,310 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from sample_size.batch import parse_spec
+from sample_size.sample_size_calculator import DEFAULT_ALPHA
+from sample_size.sample_size_calculator import DEFAULT_POWER
+from sample_size.sample_size_calculator import DEFAULT_VARIANTS
+from sample_size.sample_size_calculator import SampleSizeCalculator
+from sample_size.scripts import batch_utils
+
+TEST_METRICS: List[Dict[str, Any]] = [
+    {"metric_type": "boolean", "metric_metadata": {"probability": 0.05, "mde": 0.01, "alternative": "two-sided"}}
+]
+TEST_SPECS: List[Dict[str, Any]] = [
+    {"alpha": 0.01, "power": 0.9, "variants": 2, "metrics": TEST_METRICS},
+    {"metrics": TEST_METRICS},
+]
+
+
+def csv_content(rows):
+    content = StringIO()
+    csv.writer(content).writerows(rows)
+    return content.getvalue()
+
+
+def read_specs(file: IO[str], file_format: str) -> List[Dict[str, Any]]:
+    specs = []
+    for spec in batch_utils.read_specs(file, file_format):
+        assert isinstance(spec, dict), spec
+        specs.append(spec)
+    return specs
+
+
+def expected_sample_size(alpha, power, variants, metrics):
+    calculator = SampleSizeCalculator(alpha, variants, power)
+    calculator.register_metrics(metrics)
+    return calculator.get_sample_size()
+
+
+class BatchUtilsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.EXPECTED_RESULTS = [
+            {
+                "alpha": 0.01,
+                "power": 0.9,
+                "variants": 2,
+                "metrics": TEST_METRICS,
+                "sample_size": expected_sample_size(0.01, 0.9, 2, TEST_METRICS),
+            },
+            {
+                "alpha": DEFAULT_ALPHA,
+                "power": DEFAULT_POWER,
+                "variants": DEFAULT_VARIANTS,
+                "metrics": TEST_METRICS,
+                "sample_size": expected_sample_size(DEFAULT_ALPHA, DEFAULT_POWER, DEFAULT_VARIANTS, TEST_METRICS),
+            },
+        ]
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    @parameterized.expand(
+        [
+            ("specs.json", None, "json"),
+            ("specs.JSONL", None, "jsonl"),
+            ("specs.csv", None, "csv"),
+            ("specs.txt", "csv", "csv"),
+            ("-", None, "jsonl"),
+            ("-", "json", "json"),
+        ]
+    )
+    def test_get_format(self, path, file_format, expected_format):
+        self.assertEqual(batch_utils.get_format(path, file_format), expected_format)
+
+    @parameterized.expand([("specs.txt", None), ("specs", None), ("specs.json", "yaml")])
+    def test_get_format_error(self, path, file_format):
+        with self.assertRaises(ValueError) as context:
+            batch_utils.get_format(path, file_format)
+
+        self.assertEqual(
+            str(context.exception), f"Error: Please provide a .json, .jsonl or .csv file, or the format of {path}."
+        )
+
+    @parameterized.expand(
+        [
+            ("jsonl", "\n".join(json.dumps(spec) for spec in TEST_SPECS) + "\n\n"),
+            ("json", json.dumps(TEST_SPECS)),
+            (
+                "csv",
+                csv_content(
+                    [
+                        ["alpha", "power", "variants", "metrics"],
+                        [0.01, 0.9, 2, json.dumps(TEST_METRICS)],
+                        ["", "", "", json.dumps(TEST_METRICS)],
+                    ]
+                ),
+            ),
+        ]
+    )
+    def test_read_specs(self, file_format, content):
+        specs = [parse_spec(spec) for spec in read_specs(StringIO(content), file_format)]
+
+        self.assertEqual(
+            specs, [{k: v for k, v in result.items() if k != "sample_size"} for result in self.EXPECTED_RESULTS]
+        )
+
+    def test_read_specs_single_json_spec(self):
+        specs = read_specs(StringIO(json.dumps(TEST_SPECS[0])), "json")
+
+        self.assertEqual(specs, [TEST_SPECS[0]])
+
+    def test_read_specs_is_lazy(self):
+        file = StringIO(json.dumps(TEST_SPECS[0]) + "\n" + json.dumps(TEST_SPECS[1]) + "\n")
+        specs = batch_utils.read_specs(file, "jsonl")
+
+        self.assertEqual(next(specs), TEST_SPECS[0])
+        self.assertEqual(file.readline(), json.dumps(TEST_SPECS[1]) + "\n")
+
+    @parameterized.expand(
+        [
+            (
+                "jsonl",
+                json.dumps(TEST_SPECS[0]) + "\nnot json\n[1]\n" + json.dumps(TEST_SPECS[1]) + "\n",
+                [
+                    "Error: line 2 is not valid JSON: Expecting value: line 1 column 1 (char 0).",
+                    "Error: line 3 does not hold an experiment spec, but [1].",
+                ],
+            ),
+            (
+                "json",
+                json.dumps([TEST_SPECS[0], "spec", TEST_SPECS[1]]),
+                ['Error: item 1 does not hold an experiment spec, but "spec".'],
+            ),
+            (
+                "csv",
+                csv_content(
+                    [
+                        ["alpha", "metrics"],
+                        [0.01, json.dumps(TEST_METRICS)],
+                        [0.05, json.dumps(TEST_METRICS), 2],
+                        ["", json.dumps(TEST_METRICS)],
+                    ]
+                ),
+                ["Error: line 3 has more values than the header has columns."],
+            ),
+        ]
+    )
+    def test_read_specs_unreadable(self, file_format, content, errors):
+        specs = list(batch_utils.read_specs(StringIO(content), file_format))
+
+        self.assertEqual(specs[1:-1], [batch_utils.UnreadableSpec(error) for error in errors])
+        self.assertEqual([type(spec) for spec in (specs[0], specs[-1])], [dict, dict])
+
+    @parameterized.expand(
+        [
+            (
+                "[{",
+                "Error: the file is not valid JSON: "
+                "Expecting property name enclosed in double quotes: line 1 column 3 (char 2).",
+            ),
+            ("1", "Error: the file does not hold an experiment spec, but 1."),
+        ]
+    )
+    def test_read_specs_unreadable_json_file(self, content, error):
+        specs = list(batch_utils.read_specs(StringIO(content), "json"))
+
+        self.assertEqual(specs, [batch_utils.UnreadableSpec(error)])
+
+    def test_read_specs_unreadable_csv_row(self):
+        limit = csv.field_size_limit(10)
+        self.addCleanup(csv.field_size_limit, limit)
+        content = csv_content([["alpha"], ["0.01"], ["0.0000000000001"], ["0.05"]])
+
+        specs = list(batch_utils.read_specs(StringIO(content), "csv"))
+
+        self.assertEqual(
+            specs,
+            [
+                {"alpha": "0.01"},
+                batch_utils.UnreadableSpec("Error: line 3 is not a valid CSV row: field larger than field limit (10)."),
+                {"alpha": "0.05"},
+            ],
+        )
+
+    def test_get_sample_size(self):
+        self.assertEqual([batch_utils.get_sample_size(spec) for spec in TEST_SPECS], self.EXPECTED_RESULTS)
+
+    @parameterized.expand(
+        [
+            ({"alpha": 0.05}, "Error: Please provide the metrics of the experiment."),
+            ({"variants": "two", "metrics": TEST_METRICS}, "invalid literal for int() with base 10: 'two'"),
+            (
+                {
+                    "metrics": [
+                        {
+                            "metric_type": "boolean",
+                            "metric_metadata": {"probability": 2, "mde": 0.1, "alternative": "larger"},
+                        }
+                    ]
+                },
+                "Error: Please provide a float between 0 and 1 for probability.",
+            ),
+        ]
+    )
+    def test_get_sample_size_error(self, spec, error):
+        self.assertEqual(batch_utils.get_sample_size(spec), {**spec, "error": error})
+
+    def test_get_sample_size_unreadable_spec(self):
+        error = "Error: line 2 is not valid JSON: Expecting value: line 1 column 1 (char 0)."
+
+        self.assertEqual(batch_utils.get_sample_size(batch_utils.UnreadableSpec(error)), {"error": error})
+
+    def test_write_results_streams(self):
+        output = StringIO()
+
+        def results():
+            for index, result in enumerate(self.EXPECTED_RESULTS):
+                yield result
+                # every result is written before the next one is calculated
+                written = self.EXPECTED_RESULTS[: index + 1]
+                self.assertEqual(output.getvalue(), "".join(json.dumps(r) + "\n" for r in written))
+
+        batch_utils.write_results(results(), output, "jsonl")
+
+    @parameterized.expand([("json",), ("jsonl",), ("csv",)])
+    def test_run_batch(self, file_format):
+        input_path = self.path(f"specs.{file_format}")
+        output_path = self.path(f"results.{file_format}")
+        with open(input_path, "w") as file:
+            batch_utils.write_results(TEST_SPECS, file, file_format)
+
+        batch_utils.run_batch(input_path, output_path)
+
+        with open(output_path) as file:
+            results = [parse_spec(result) for result in read_specs(file, file_format)]
+        with open(output_path) as file:
+            sample_sizes = [int(result["sample_size"]) for result in read_specs(file, file_format)]
+        self.assertEqual(results, [parse_spec(result) for result in self.EXPECTED_RESULTS])
+        self.assertEqual(sample_sizes, [result["sample_size"] for result in self.EXPECTED_RESULTS])
+
+    @parameterized.expand([("json",), ("jsonl",)])
+    def test_run_batch_continues_after_unreadable_spec(self, output_format):
+        input_path = self.path("specs.jsonl")
+        output_path = self.path(f"results.{output_format}")
+        with open(input_path, "w") as file:
+            file.write(json.dumps(TEST_SPECS[0]) + "\nnot json\n" + json.dumps(TEST_SPECS[1]) + "\n")
+
+        batch_utils.run_batch(input_path, output_path)
+
+        with open(output_path) as file:
+            results = list(batch_utils.read_specs(file, output_format))
+        self.assertEqual(
+            results,
+            [
+                self.EXPECTED_RESULTS[0],
+                {"error": "Error: line 2 is not valid JSON: Expecting value: line 1 column 1 (char 0)."},
+                self.EXPECTED_RESULTS[1],
+            ],
+        )
+
+    def test_write_results_closes_json_array(self):
+        output = StringIO()
+
+        def results():
+            yield self.EXPECTED_RESULTS[0]
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            batch_utils.write_results(results(), output, "json")
+
+        self.assertEqual(json.loads(output.getvalue()), [self.EXPECTED_RESULTS[0]])
+
+    def test_run_batch_errors_in_csv(self):
+        output_path = self.path("results.csv")
+        with patch("sys.stdin", new=StringIO('{"alpha": 0.05}\n')):
+            batch_utils.run_batch("-", output_path)
+
+        with open(output_path, newline="") as file:
+            self.assertEqual(
+                list(csv.DictReader(file)),
+                [
+                    {
+                        "alpha": "0.05",
+                        "power": "",
+                        "variants": "",
+                        "metrics": "",
+                        "sample_size": "",
+                        "error": "Error: Please provide the metrics of the experiment.",
+                    }
+                ],
+            )
+
+    def test_run_batch_standard_streams(self):
+        with patch("sys.stdin", new=StringIO(json.dumps(TEST_SPECS))), patch("sys.stdout", new=StringIO()) as output:
+            batch_utils.run_batch("-", "-", input_format="json")
+
+        self.assertEqual(output.getvalue(), "".join(json.dumps(result) + "\n" for result in self.EXPECTED_RESULTS))
@@ -0,0 +1,147 @@
+import time
+import unittest
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from sample_size.batch import SpecResult
+from sample_size.batch import _run_spec
+from sample_size.batch import get_calculator
+from sample_size.batch import parse_spec
+from sample_size.batch import run_many
+
+BOOLEAN_METRIC: Dict[str, Any] = {
+    "metric_type": "boolean",
+    "metric_metadata": {"probability": 0.05, "mde": 0.02, "alternative": "larger"},
+}
+NUMERIC_METRIC: Dict[str, Any] = {
+    "metric_type": "numeric",
+    "metric_metadata": {"variance": 5000, "mde": 5, "alternative": "two-sided"},
+}
+RATIO_METRIC: Dict[str, Any] = {
+    "metric_type": "ratio",
+    "metric_metadata": {
+        "numerator_mean": 2000,
+        "numerator_variance": 100000,
+        "denominator_mean": 200,
+        "denominator_variance": 2000,
+        "covariance": 5000,
+        "mde": 1,
+        "alternative": "smaller",
+    },
+}
+SINGLE_METRIC_SPECS: List[Dict[str, Any]] = [
+    {"metrics": [BOOLEAN_METRIC]},
+    {"alpha": 0.01, "power": 0.9, "metrics": [NUMERIC_METRIC]},
+    {"alpha": 0.1, "metrics": [RATIO_METRIC]},
+    {"alpha": 0.01, "metrics": [BOOLEAN_METRIC]},
+]
+MULTIPLE_METRIC_SPECS: List[Dict[str, Any]] = [
+    {"metrics": [BOOLEAN_METRIC, BOOLEAN_METRIC]},
+    {"variants": 3, "metrics": [BOOLEAN_METRIC, BOOLEAN_METRIC]},
+    {"variants": 3, "metrics": [BOOLEAN_METRIC]},
+]
+
+
+def calculator_sample_size(spec):
+    return get_calculator(parse_spec(spec)).get_sample_size()
+
+
+class RunManyTestCase(unittest.TestCase):
+    def assertResults(self, results, specs):
+        self.assertEqual(sorted(result.position for result in results), list(range(len(specs))))
+        for result in results:
+            self.assertEqual(result.spec, parse_spec(specs[result.position]))
+            self.assertEqual(result.sample_size, calculator_sample_size(specs[result.position]))
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.seconds, 0)
+
+    @parameterized.expand([("thread", 2), ("process", 2)])
+    def test_run_many(self, executor, max_workers):
+        specs = SINGLE_METRIC_SPECS + MULTIPLE_METRIC_SPECS
+
+        results = list(run_many(iter(specs), max_workers=max_workers, executor=executor))
+
+        self.assertResults(results, specs)
+
+    @patch("sample_size.batch._run_spec", side_effect=_run_spec)
+    @patch("sample_size.batch.ProcessPoolExecutor")
+    def test_run_many_single_metric_fast_path(self, mock_process_pool_executor, mock_run_spec):
+        results = list(run_many(SINGLE_METRIC_SPECS))
+
+        self.assertResults(results, SINGLE_METRIC_SPECS)
+        mock_process_pool_executor.assert_not_called()
+        mock_run_spec.assert_not_called()
+        # specs solved together share their time
+        self.assertEqual(len({result.seconds for result in results}), 1)
+
+    @patch("sample_size.batch._run_spec")
+    def test_run_many_longest_processing_time_first(self, mock_run_spec):
+        mock_run_spec.side_effect = lambda index, spec: SpecResult(index, spec, 1000, None, 0.0)
+        specs = [
+            {"variants": 2, "metrics": [BOOLEAN_METRIC] * 2},
+            {"variants": 4, "metrics": [BOOLEAN_METRIC] * 3},
+            {"variants": 3, "metrics": [BOOLEAN_METRIC]},
+            {"variants": 2, "metrics": [BOOLEAN_METRIC] * 5},
+        ]
+
+        results = list(run_many(specs, max_workers=1, executor="thread"))
+
+        self.assertEqual([call.args[0] for call in mock_run_spec.call_args_list], [1, 3, 0, 2])
+        self.assertEqual(sorted(result.position for result in results), [0, 1, 2, 3])
+
+    def test_run_many_errors(self):
+        specs: List[Dict[str, Any]] = [
+            {"alpha": 0.05},
+            {"variants": "two", "metrics": [BOOLEAN_METRIC]},
+            {"metrics": [{"metric_type": "boolean", "metric_metadata": {"probability": 2, "mde": 0.1}}]},
+            {"metrics": [{**BOOLEAN_METRIC, "metric_metadata": {**BOOLEAN_METRIC["metric_metadata"], "mde": 0}}]},
+            {
+                "metrics": [
+                    {**NUMERIC_METRIC, "metric_metadata": {**NUMERIC_METRIC["metric_metadata"], "alternative": "?"}}
+                ]
+            },
+            {"metrics": [NUMERIC_METRIC]},
+            {"metrics": [BOOLEAN_METRIC, {"metric_type": "count"}]},
+        ]
+
+        results = sorted(run_many(specs, executor="thread"), key=lambda result: result.position)
+
+        self.assertEqual(
+            [result.error and result.error.splitlines()[0] for result in results],
+            [
+                "Error: Please provide the metrics of the experiment.",
+                "invalid literal for int() with base 10: 'two'",
+                "BooleanMetric.__init__() missing 1 required positional argument: 'alternative'",
+                "Error: Please provide a non-zero mde and variance for every experiment.",
+                "Error: alternative has to be 'two-sided', 'larger' or 'smaller'.",
+                None,
+                "'metric_metadata' is a required property",
+            ],
+        )
+        self.assertEqual(results[0].spec, specs[0])
+        self.assertEqual(results[5].sample_size, calculator_sample_size(specs[5]))
+        self.assertEqual([result.sample_size is None for result in results], [True] * 5 + [False, True])
+
+    def test_run_many_executor_error(self):
+        with self.assertRaises(ValueError) as context:
+            list(run_many(SINGLE_METRIC_SPECS, executor="fiber"))
+
+        self.assertEqual(str(context.exception), "Error: Please choose a 'process' or 'thread' executor.")
+
+    @patch("sample_size.batch._run_spec")
+    def test_run_many_cancels_pending_specs_when_closed(self, mock_run_spec):
+        def run_spec(index, spec):
+            time.sleep(0.01)
+            return SpecResult(index, spec, 1000, None, 0.01)
+
+        mock_run_spec.side_effect = run_spec
+        results = run_many(MULTIPLE_METRIC_SPECS * 20 + SINGLE_METRIC_SPECS, max_workers=1, executor="thread")
+
+        next(results)
+        results.close()
+
+        self.assertLess(mock_run_spec.call_count, len(MULTIPLE_METRIC_SPECS) * 20)
@@ -0,0 +1,122 @@
+import unittest
+from itertools import product
+
+import numpy as np
+from numpy.testing import assert_array_equal
+from parameterized import parameterized
+
+from sample_size.bulk import boolean_sample_sizes
+from sample_size.bulk import numeric_sample_sizes
+from sample_size.bulk import ratio_sample_sizes
+from sample_size.sample_size_calculator import SampleSizeCalculator
+
+TEST_ALPHAS = (0.01, 0.05)
+TEST_POWERS = (0.8, 0.9)
+TEST_ALTERNATIVES = ("two-sided", "larger")
+
+
+def calculator_sample_size(alpha, power, metric_type, **metric_metadata):
+    calculator = SampleSizeCalculator(alpha=alpha, power=power)
+    calculator.register_metrics([{"metric_type": metric_type, "metric_metadata": metric_metadata}])
+    return calculator.get_sample_size()
+
+
+class BulkTestCase(unittest.TestCase):
+    @parameterized.expand(TEST_ALTERNATIVES)
+    def test_boolean_sample_sizes(self, alternative):
+        probability = np.array([[0.05], [0.3], [0.5]])
+        mde = np.array([0.005, 0.01, 0.02])
+
+        sample_sizes = boolean_sample_sizes(probability, mde, 0.05, 0.8, alternative)
+
+        self.assertEqual(sample_sizes.shape, (3, 3))
+        for (i, p), (j, d) in product(enumerate(probability[:, 0]), enumerate(mde)):
+            expected = calculator_sample_size(0.05, 0.8, "boolean", probability=p, mde=d, alternative=alternative)
+            self.assertEqual(sample_sizes[i, j], expected)
+
+    @parameterized.expand(product(TEST_ALPHAS, TEST_POWERS, TEST_ALTERNATIVES))
+    def test_numeric_sample_sizes(self, alpha, power, alternative):
+        variance = np.array([10.0, 500.0, 5000.0])
+
+        sample_sizes = numeric_sample_sizes(variance, 5.0, alpha, power, alternative)
+
+        expected = [
+            calculator_sample_size(alpha, power, "numeric", variance=v, mde=5.0, alternative=alternative)
+            for v in variance
+        ]
+        assert_array_equal(sample_sizes, expected)
+
+    @parameterized.expand(product(TEST_ALPHAS, TEST_POWERS, TEST_ALTERNATIVES))
+    def test_ratio_sample_sizes(self, alpha, power, alternative):
+        numerator_mean = np.array([2.0, 5.0])
+        mde = np.array([[0.05], [0.1]])
+
+        sample_sizes = ratio_sample_sizes(numerator_mean, 1.0, 4.0, 2.0, 0.5, mde, alpha, power, alternative)
+
+        self.assertEqual(sample_sizes.shape, (2, 2))
+        for (i, d), (j, mu) in product(enumerate(mde[:, 0]), enumerate(numerator_mean)):
+            expected = calculator_sample_size(
+                alpha,
+                power,
+                "ratio",
+                numerator_mean=mu,
+                numerator_variance=1.0,
+                denominator_mean=4.0,
+                denominator_variance=2.0,
+                covariance=0.5,
+                mde=d,
+                alternative=alternative,
+            )
+            self.assertEqual(sample_sizes[i, j], expected)
+
+    def test_sample_sizes_broadcast_alpha_and_power(self):
+        alpha = np.array([[0.01], [0.05]])
+        power = np.array([0.8, 0.9, 0.95])
+
+        sample_sizes = boolean_sample_sizes(0.2, 0.01, alpha, power)
+
+        self.assertEqual(sample_sizes.shape, (2, 3))
+        self.assertTrue(np.issubdtype(sample_sizes.dtype, np.integer))
+        for (i, a), (j, p) in product(enumerate(alpha[:, 0]), enumerate(power)):
+            expected = calculator_sample_size(a, p, "boolean", probability=0.2, mde=0.01, alternative="two-sided")
+            self.assertEqual(sample_sizes[i, j], expected)
+
+    def test_boolean_sample_sizes_invalid_probability(self):
+        with self.assertRaises(ValueError) as context:
+            boolean_sample_sizes([0.2, 1.5], 0.01)
+
+        self.assertEqual(str(context.exception), "Error: Please provide a float between 0 and 1 for probability.")
+
+    def test_numeric_sample_sizes_negative_variance(self):
+        with self.assertRaises(ValueError) as context:
+            numeric_sample_sizes([10, -1], 0.5)
+
+        self.assertEqual(str(context.exception), "Error: Please provide a positive number for variance.")
+
+    def test_ratio_sample_sizes_negative_variance(self):
+        with self.assertRaises(ValueError) as context:
+            ratio_sample_sizes(2.0, [1.0, -1.0], 4.0, 2.0, 0.5, 0.1)
+
+        self.assertEqual(str(context.exception), "Error: Please provide a positive number for numerator variance.")
+
+    @parameterized.expand(
+        [
+            (boolean_sample_sizes, ([0.05, 0.0], [0.0, 0.01])),
+            (boolean_sample_sizes, (1.0, 0.01)),
+            (numeric_sample_sizes, (0, 0.5)),
+            (numeric_sample_sizes, ([10, 10], [0.5, 0.0])),
+            (ratio_sample_sizes, (2.0, 0.0, 4.0, 0.0, 0.0, 0.1)),
+            (numeric_sample_sizes, (10, np.nan)),
+        ]
+    )
+    def test_sample_sizes_without_finite_sample_size(self, solver, arguments):
+        with self.assertRaises(ValueError) as context:
+            solver(*arguments)
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
+        )
+
+    def test_sample_sizes_invalid_alternative(self):
+        with self.assertRaises(ValueError):
+            numeric_sample_sizes(10, 0.5, alternative="both")
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from parameterized import parameterized
+
+from sample_size.cache import LRUCache
+from sample_size.cache import SQLiteCache
+from sample_size.cache import canonical_key
+
+
+class CanonicalKeyTestCase(unittest.TestCase):
+    def test_canonical_key_does_not_depend_on_key_order(self):
+        self.assertEqual(canonical_key({"alpha": 0.05, "power": 0.8}), canonical_key({"power": 0.8, "alpha": 0.05}))
+
+    def test_canonical_key_depends_on_values(self):
+        self.assertNotEqual(canonical_key({"alpha": 0.05}), canonical_key({"alpha": 0.01}))
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "sample_sizes.sqlite")
+
+    def make_cache(self, backend, maxsize=2):
+        if backend == "lru":
+            return LRUCache(maxsize)
+        cache = SQLiteCache(self.path, maxsize)
+        self.addCleanup(cache.close)
+        return cache
+
+    @parameterized.expand([("lru",), ("sqlite",)])
+    def test_get_counts_hits_and_misses(self, backend):
+        cache = self.make_cache(backend)
+
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 100)
+        self.assertEqual(cache.get("a"), 100)
+        self.assertEqual(cache.get("a"), 100)
+
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    @parameterized.expand([("lru",), ("sqlite",)])
+    def test_set_evicts_least_recently_used(self, backend):
+        cache = self.make_cache(backend)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual([cache.get(key) for key in ("a", "b", "c")], [1, None, 3])
+
+    @parameterized.expand([("lru",), ("sqlite",)])
+    def test_set_replaces_value(self, backend):
+        cache = self.make_cache(backend)
+        cache.set("a", 1)
+        cache.set("a", 2)
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("a"), 2)
+
+    @parameterized.expand([("lru",), ("sqlite",)])
+    def test_clear(self, backend):
+        cache = self.make_cache(backend)
+        cache.set("a", 1)
+        cache.get("a")
+
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    @parameterized.expand([("lru",), ("sqlite",)])
+    def test_concurrent_access(self, backend):
+        cache = self.make_cache(backend, maxsize=100)
+
+        def set_and_get(i):
+            cache.set(str(i), i)
+            return cache.get(str(i))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(list(executor.map(set_and_get, range(50))), list(range(50)))
+
+    def test_sqlite_cache_persists(self):
+        cache = self.make_cache("sqlite")
+        cache.set("a", 100)
+        cache.close()
+
+        self.assertEqual(self.make_cache("sqlite").get("a"), 100)
+
+    @parameterized.expand([(0,), (-1,)])
+    def test_invalid_size(self, maxsize):
+        with self.assertRaises(ValueError) as context:
+            LRUCache(maxsize)
+
+        self.assertEqual(str(context.exception), "Error: Please provide a positive cache size.")
@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from sample_size.engine import SimulationEngine
+from sample_size.engine import _initialize_worker
+from sample_size.engine import _ready
+from sample_size.sample_size_calculator import SampleSizeCalculator
+from tests.sample_size.test_multiple_testing import TEST_BOOLEAN
+from tests.sample_size.test_multiple_testing import TEST_NUMERIC
+
+
+def worker_state(_):
+    return os.getpid(), "scipy.special" in sys.modules
+
+
+class SimulationEngineTestCase(unittest.TestCase):
+    def test_engine_lifecycle(self):
+        engine = SimulationEngine(workers=2)
+        self.assertFalse(engine.running)
+
+        with engine as started_engine:
+            self.assertIs(started_engine, engine)
+            self.assertTrue(engine.running)
+            executor = engine.executor
+            self.assertIs(engine.start().executor, executor)
+            states = list(executor.map(worker_state, range(8)))
+
+        self.assertFalse(engine.running)
+        self.assertTrue(all(imported for _, imported in states))
+        self.assertNotIn(os.getpid(), {pid for pid, _ in states})
+        with self.assertRaises(RuntimeError) as context:
+            engine.executor
+        self.assertEqual(str(context.exception), "Error: Please start the simulation engine, e.g. in a with statement.")
+
+        # a stopped engine can be started again
+        with engine:
+            self.assertIsNot(engine.executor, executor)
+        engine.shutdown()
+
+    def test_worker_functions(self):
+        _initialize_worker()
+
+        self.assertIn("scipy.special", sys.modules)
+        self.assertTrue(_ready())
+
+    def test_engine_workers_error(self):
+        with self.assertRaises(ValueError) as context:
+            SimulationEngine(workers=0)
+
+        self.assertEqual(str(context.exception), "Error: Please provide a positive number of workers.")
+
+    def test_get_sample_size_with_engine(self):
+        calculators = [SampleSizeCalculator(), SampleSizeCalculator(adaptive_replication=True)]
+        calculators[0].register_metrics([TEST_BOOLEAN] * 2)
+        calculators[1].register_metrics([TEST_NUMERIC, TEST_BOOLEAN])
+        expected_sample_sizes = [calculator.get_sample_size() for calculator in calculators]
+
+        with SimulationEngine(workers=2) as engine:
+            with patch("sample_size.sample_size_calculator.SimulationEngine") as mock_simulation_engine:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    sample_sizes = list(executor.map(lambda c: c.get_sample_size(engine=engine), calculators * 2))
+
+        self.assertEqual(sample_sizes, expected_sample_sizes * 2)
+        mock_simulation_engine.assert_not_called()
+
+    @patch("sample_size.sample_size_calculator.SimulationEngine")
+    def test_get_sample_size_with_n_jobs_starts_an_engine(self, mock_simulation_engine):
+        mock_simulation_engine.return_value.__enter__.return_value.executor = None
+        calculator = SampleSizeCalculator(n_jobs=3)
+        calculator.register_metrics([TEST_BOOLEAN] * 2)
+
+        calculator.get_sample_size()
+
+        mock_simulation_engine.assert_called_once_with(workers=3)
+        mock_simulation_engine.return_value.__exit__.assert_called_once()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from numpy.testing import assert_array_equal
+from parameterized import parameterized
+from scipy import special
+from scipy import stats
+
+from sample_size.kernels import NORMAL_APPROXIMATION_DF
+from sample_size.kernels import chisquare_scale
+from sample_size.kernels import normal_sf
+from sample_size.kernels import t_sf
+
+TEST_STATISTICS = np.array([0, 0.5, 1.96, 3, 6, 10, 40])
+
+
+class KernelsTestCase(unittest.TestCase):
+    def test_normal_sf(self):
+        np.testing.assert_allclose(normal_sf(TEST_STATISTICS), stats.norm.sf(TEST_STATISTICS), rtol=1e-12)
+
+    @parameterized.expand([(1,), (10,), (1000,), (NORMAL_APPROXIMATION_DF,)])
+    def test_t_sf(self, df):
+        np.testing.assert_allclose(t_sf(TEST_STATISTICS, df), stats.t.sf(TEST_STATISTICS, df), rtol=1e-12)
+
+    @parameterized.expand([(NORMAL_APPROXIMATION_DF + 1,), (10 * NORMAL_APPROXIMATION_DF,)])
+    def test_t_sf_normal_approximation_error_bound(self, df):
+        statistics = np.linspace(0, 6, 1001)
+
+        p_values = t_sf(statistics, df)
+
+        assert_array_equal(p_values, normal_sf(statistics))
+        exact_p_values = special.stdtr(df, -statistics)
+        self.assertLess(np.abs(p_values - exact_p_values).max(), 0.16 / df)
+        relative_error = np.abs(p_values / exact_p_values - 1)
+        self.assertTrue(np.all(relative_error <= (statistics**2 + 1) ** 2 / (4 * df)))
+        self.assertLess(relative_error.max(), 0.004)
+
+    @parameterized.expand([(normal_sf,), (lambda statistics, out: t_sf(statistics, 10, out=out),)])
+    def test_sf_writes_into_out(self, sf):
+        expected = sf(TEST_STATISTICS, out=None)
+        statistics = TEST_STATISTICS.copy()
+
+        p_values = sf(statistics, out=statistics)
+
+        self.assertIs(p_values, statistics)
+        assert_array_equal(p_values, expected)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_chisquare_scale(self, common_random_numbers):
+        df = 20
+
+        scale = chisquare_scale(df, 20000, np.random.default_rng(1), common_random_numbers)
+
+        self.assertEqual(scale.shape, (20000,))
+        self.assertGreater(stats.kstest(scale**2 * df, stats.chi2(df).cdf).pvalue, 1e-3)
+
+    def test_chisquare_scale_common_random_numbers(self):
+        mock_random_state = MagicMock()
+        mock_random_state.random.return_value = np.array([0.1, 0.5, 0.9])
+
+        scale = chisquare_scale(10, 3, mock_random_state, common_random_numbers=True)
+
+        mock_random_state.chisquare.assert_not_called()
+        mock_random_state.random.assert_called_once_with(3)
+        np.testing.assert_allclose(scale, np.sqrt(stats.chi2(10).ppf([0.1, 0.5, 0.9]) / 10))
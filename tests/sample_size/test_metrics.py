@@ -1,20 +1,29 @@
 import unittest
 from itertools import combinations_with_replacement as combos
 from itertools import product
+from typing import Any
+from typing import Dict
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
 import numpy as np
 from numpy.testing import assert_array_equal
 from parameterized import parameterized
+from scipy import stats
 from statsmodels.stats.power import NormalIndPower
 from statsmodels.stats.power import TTestIndPower
 
+from sample_size.kernels import NORMAL_APPROXIMATION_DF
+from sample_size.kernels import normal_sf
+from sample_size.kernels import t_sf
 from sample_size.metrics import BaseMetric
 from sample_size.metrics import BooleanMetric
+from sample_size.metrics import MetricSet
 from sample_size.metrics import NumericMetric
 from sample_size.metrics import RatioMetric
-from sample_size.sample_size_calculator import RANDOM_STATE
+from sample_size.power import SampleSizeSolver
+from sample_size.power import normal_sample_size
+from sample_size.power import ttest_sample_size
 
 ALTERNATIVE = "two-sided"
 TEST_ALTERNATIVES = ("two-sided", "smaller", "larger")
@@ -24,10 +33,19 @@ class DummyMetric(BaseMetric):
     def power_analysis_instance(self):
         return MagicMock()
 
-    def variance(self):
+    @property
+    def sample_size_solver(self) -> SampleSizeSolver:
         return MagicMock()
 
-    def _generate_alt_p_values(self, size, sample_size, RANDOM_STATE):
+    @property
+    def variance(self) -> float:
+        return MagicMock()
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {"mde": self.mde, "alternative": self.alternative}
+
+    def _generate_alt_p_values(self, size, sample_size, random_state, common_random_numbers=False):
         return MagicMock()
 
 
@@ -44,25 +62,113 @@ class BaseMetricTestCase(unittest.TestCase):
             f"Error: Please provide a positive number for {test_name}.",
         )
 
+    @parameterized.expand(
+        [
+            (BooleanMetric, {"probability": 0.05, "mde": 0.01, "alternative": "larger"}),
+            (NumericMetric, {"variance": 5000, "mde": 5, "alternative": "smaller"}),
+            (
+                RatioMetric,
+                {
+                    "numerator_mean": 2000,
+                    "numerator_variance": 100000,
+                    "denominator_mean": 200,
+                    "denominator_variance": 2000,
+                    "covariance": 5000,
+                    "mde": 5,
+                    "alternative": "two-sided",
+                },
+            ),
+        ]
+    )
+    def test_parameters(self, metric_class, parameters):
+        metric = metric_class(**parameters)
+
+        self.assertEqual(metric.parameters, parameters)
+
+    @parameterized.expand(
+        [
+            (BooleanMetric(0.05, 0.01, "larger"), "probability"),
+            (NumericMetric(5000, 5, "smaller"), "mde"),
+            (RatioMetric(2000, 100000, 200, 2000, 5000, 5, "two-sided"), "alternative"),
+            (NumericMetric(5000, 5, "larger"), "effect_size"),
+        ]
+    )
+    def test_metrics_are_immutable(self, metric, attribute):
+        with self.assertRaises(AttributeError) as context:
+            setattr(metric, attribute, 0.5)
+
+        self.assertEqual(
+            str(context.exception), f"Error: {type(metric).__name__} is immutable, please create a new metric."
+        )
+
+    def test_metrics_are_values(self):
+        metric = NumericMetric(5000, 5, "larger")
+
+        self.assertEqual(metric, NumericMetric(5000.0, 5.0, "larger"))
+        self.assertEqual(hash(metric), hash(NumericMetric(5000.0, 5.0, "larger")))
+        self.assertEqual(len({metric, NumericMetric(5000, 5, "larger"), NumericMetric(5000, 5, "smaller")}), 2)
+        self.assertNotEqual(metric, NumericMetric(5000, 6, "larger"))
+        self.assertNotEqual(BooleanMetric(0.5, 0.1, "larger"), NumericMetric(0.25, 0.1, "larger"))
+        self.assertNotEqual(metric, "metric")
+
+    @parameterized.expand(
+        [
+            (BooleanMetric(0.05, 0.01, "larger"), 0.01 / np.sqrt(0.0475)),
+            (NumericMetric(5000, 5, "smaller"), 5 / np.sqrt(5000)),
+            (RatioMetric(2000, 100000, 200, 2000, 5000, 5, "two-sided"), 5 / np.sqrt(5)),
+        ]
+    )
+    def test_effect_size(self, metric, effect_size):
+        self.assertAlmostEqual(metric.effect_size, effect_size)
+        self.assertIs(metric.power_analysis_instance, metric.power_analysis_instance)
+
+    @parameterized.expand(
+        [
+            (BooleanMetric, (0.0, 0.01, "two-sided")),
+            (BooleanMetric, (1.0, 0.01, "larger")),
+            (NumericMetric, (0, 5, "smaller")),
+        ]
+    )
+    def test_metrics_without_variance(self, metric_class, arguments):
+        metric = metric_class(*arguments)
+
+        self.assertEqual(metric.variance, 0)
+        self.assertEqual(metric, metric_class(*arguments))
+        # only the effect size is undefined, which the calculators reject
+        self.assertFalse(np.isfinite(metric.effect_size))
+
+    @patch.dict("sys.modules", {"statsmodels.stats": None})
+    def test_power_analysis_instance_needs_statsmodels(self):
+        metric = NumericMetric(5000, 5, "larger")
+
+        with self.assertRaises(ImportError) as context:
+            metric.power_analysis_instance
+
+        self.assertEqual(
+            str(context.exception),
+            "Error: power_analysis_instance needs statsmodels, please install sample-size[statsmodels].",
+        )
+        self.assertEqual(metric.sample_size_solver(metric.effect_size, 0.05, 0.8, metric.alternative).shape, ())
+
     @parameterized.expand([(np.array(c),) for r in range(2, 5) for c in combos([True, False], r)])
-    @patch("sample_size.metrics.stats")
     @patch("tests.sample_size.test_metrics.DummyMetric._generate_alt_p_values")
-    def test_generate_p_values(self, true_alt, mock_alt_p_values, mock_stats):
+    def test_generate_p_values(self, true_alt, mock_alt_p_values):
         mde = 0.5
         sample_size = 10
 
         null_p_value = 1
         alt_p_value = 0
 
-        mock_alt_p_values.side_effect = lambda size, __, random_state: np.array([alt_p_value] * size)
-        mock_stats.uniform.rvs.side_effect = lambda _, __, size, random_state: np.array([null_p_value] * size)
+        mock_random_state = MagicMock()
+        mock_alt_p_values.side_effect = lambda size, *_: np.array([alt_p_value] * size)
+        mock_random_state.random.side_effect = lambda size: np.array([null_p_value] * size)
 
         metric = DummyMetric(mde, ALTERNATIVE)
 
-        p_values = metric.generate_p_values(true_alt, sample_size, RANDOM_STATE)
+        p_values = metric.generate_p_values(true_alt, sample_size, mock_random_state)
 
         mock_alt_p_values.assert_called_once()
-        mock_stats.uniform.rvs.assert_called_once()
+        mock_random_state.random.assert_called_once_with((~true_alt).sum())
 
         assert_array_equal(p_values, np.where(true_alt, alt_p_value, null_p_value))
 
@@ -86,6 +192,7 @@ class BooleanMetricTestCase(unittest.TestCase):
         self.assertEqual(boolean.variance, self.DEFAULT_MOCK_VARIANCE)
         self.assertEqual(boolean.mde, self.DEFAULT_MDE)
         self.assertIsInstance(boolean.power_analysis_instance, NormalIndPower)
+        self.assertIs(boolean.sample_size_solver, normal_sample_size)
 
     def test_boolean_metric_variance(self):
         boolean = BooleanMetric(self.DEFAULT_PROBABILITY, self.DEFAULT_MDE, self.DEFAULT_ALTERNATIVE)
@@ -121,22 +228,22 @@ class BooleanMetricTestCase(unittest.TestCase):
 
     @parameterized.expand(product((1, 2, 10), (2, 10), TEST_ALTERNATIVES))
     @patch("sample_size.metrics.BooleanMetric.variance")
-    @patch("scipy.stats.norm")
-    def test_boolean__generate_alt_p_values(self, size, sample_size, alternative, mock_norm, mock_variance):
-        p_value_generator = mock_norm.sf
-        p_values = ["🏝️", "🏜️", "🌋"]
-        mock_norm.rvs.return_value = -ord("🌮")
-        p_value_generator.return_value = p_values
+    @patch("sample_size.metrics.normal_sf", side_effect=normal_sf)
+    def test_boolean__generate_alt_p_values(self, size, sample_size, alternative, mock_normal_sf, mock_variance):
+        mock_random_state = MagicMock()
+        mock_random_state.normal.return_value = np.linspace(-3, 3, size)
         mock_variance.__get__ = MagicMock(return_value=self.DEFAULT_MOCK_VARIANCE)
 
         metric = BooleanMetric(self.DEFAULT_PROBABILITY, self.DEFAULT_MDE, alternative)
-        p = metric._generate_alt_p_values(size, sample_size, RANDOM_STATE)
+        p = metric._generate_alt_p_values(size, sample_size, mock_random_state)
 
         effect_sample_size = self.DEFAULT_MDE / np.sqrt(2 * self.DEFAULT_MOCK_VARIANCE / sample_size)
-        mock_norm.rvs.assert_called_once_with(loc=effect_sample_size, size=size, random_state=RANDOM_STATE)
-        mock_norm.sf.assert_called_once_with(np.abs(mock_norm.rvs.return_value))
-        expected_p_values = p_values if alternative != "two-sided" else 2 * p_values
-        assert_array_equal(p, expected_p_values)
+        mock_random_state.normal.assert_called_once_with(loc=effect_sample_size, size=size)
+        mock_normal_sf.assert_called_once()
+        expected_p_values = stats.norm.sf(np.abs(np.linspace(-3, 3, size)))
+        if alternative == "two-sided":
+            expected_p_values *= 2
+        np.testing.assert_allclose(p, expected_p_values)
 
 
 class NumericMetricTestCase(unittest.TestCase):
@@ -152,27 +259,67 @@ class NumericMetricTestCase(unittest.TestCase):
         self.assertEqual(numeric.mde, self.DEFAULT_MDE)
         self.assertEqual(numeric.alternative, self.DEFAULT_ALTERNATIVE)
         self.assertIsInstance(numeric.power_analysis_instance, TTestIndPower)
+        self.assertIs(numeric.sample_size_solver, ttest_sample_size)
 
     @parameterized.expand(product((1, 2, 10), (2, 10), TEST_ALTERNATIVES))
     @patch("sample_size.metrics.NumericMetric.variance")
-    @patch("scipy.stats.nct")
-    @patch("scipy.stats.t")
-    def test_numeric__generate_alt_p_values(self, size, sample_size, alternative, mock_t, mock_nct, mock_variance):
-        p_value_generator = mock_t.sf
-        p_values = ["🏝️", "🏜️", "🌋"]
-        mock_nct.rvs.return_value = -ord("🌮")
-        p_value_generator.return_value = p_values
+    @patch("sample_size.metrics.t_sf", side_effect=t_sf)
+    def test_numeric__generate_alt_p_values(self, size, sample_size, alternative, mock_t_sf, mock_variance):
+        df = 2 * (sample_size - 1)
+        mock_random_state = MagicMock()
+        mock_random_state.standard_normal.return_value = np.linspace(-3, 3, size)
+        mock_random_state.chisquare.return_value = np.full(size, 4.0 * df)
         mock_variance.__get__ = MagicMock(return_value=self.DEFAULT_VARIANCE)
 
         metric = NumericMetric(self.DEFAULT_VARIANCE, self.DEFAULT_MDE, alternative)
-        p = metric._generate_alt_p_values(size, sample_size, RANDOM_STATE)
+        p = metric._generate_alt_p_values(size, sample_size, mock_random_state)
 
         effect_sample_size = np.sqrt(sample_size / 2 / self.DEFAULT_VARIANCE) * self.DEFAULT_MDE
+        mock_random_state.standard_normal.assert_called_once_with(size)
+        mock_random_state.chisquare.assert_called_once_with(df, size)
+        mock_t_sf.assert_called_once()
+        self.assertEqual(mock_t_sf.call_args[0][1], df)
+        expected_p_values = stats.t.sf(np.abs((np.linspace(-3, 3, size) + effect_sample_size) / 2), df)
+        if alternative == "two-sided":
+            expected_p_values *= 2
+        np.testing.assert_allclose(p, expected_p_values)
+
+    @parameterized.expand(product((2, 10, 100), (False, True)))
+    def test_numeric__generate_alt_p_values_follow_noncentral_t(self, sample_size, common_random_numbers):
+        metric = NumericMetric(self.DEFAULT_VARIANCE, self.DEFAULT_MDE, "larger")
+        nc = np.sqrt(sample_size / 2 / self.DEFAULT_VARIANCE) * self.DEFAULT_MDE
         df = 2 * (sample_size - 1)
-        mock_nct.rvs.assert_called_once_with(nc=effect_sample_size, df=df, size=size, random_state=RANDOM_STATE)
-        mock_t.sf.assert_called_once_with(np.abs(mock_nct.rvs.return_value), df)
-        expected_p_values = p_values if alternative != "two-sided" else 2 * p_values
-        assert_array_equal(p, expected_p_values)
+
+        p_values = metric._generate_alt_p_values(10000, sample_size, np.random.default_rng(1), common_random_numbers)
+
+        # transforming the p-values back gives the absolute values of noncentral t draws
+        abs_t_alt = stats.t.isf(p_values, df)
+        nct = stats.nct(df, nc)
+        self.assertGreater(stats.kstest(abs_t_alt, lambda x: nct.cdf(x) - nct.cdf(-x)).pvalue, 0.01)
+
+    @parameterized.expand([(2,), (10,), (100,)])
+    def test_numeric__generate_alt_p_values_common_random_numbers(self, sample_size):
+        metric = NumericMetric(self.DEFAULT_VARIANCE, self.DEFAULT_MDE, "larger")
+        mock_random_state = MagicMock()
+        mock_random_state.standard_normal.return_value = np.zeros(3)
+        mock_random_state.random.return_value = np.array([0.1, 0.5, 0.9])
+
+        p_values = metric._generate_alt_p_values(3, sample_size, mock_random_state, common_random_numbers=True)
+
+        mock_random_state.chisquare.assert_not_called()
+        mock_random_state.random.assert_called_once_with(3)
+        # with a zero normal draw, a larger chi-square quantile gives a smaller t statistic
+        self.assertTrue(np.all(np.diff(p_values) > 0))
+
+    def test_numeric__generate_alt_p_values_common_random_numbers_share_draws(self):
+        metric = NumericMetric(1, 1, "larger")
+
+        streams = [np.random.default_rng(1) for _ in range(2)]
+        p_values = [metric._generate_alt_p_values(1000, n, s, True) for n, s in zip((100, 101), streams)]
+
+        # the same base variates at a slightly larger sample size give slightly smaller p-values
+        self.assertEqual(streams[0].random(), streams[1].random())
+        self.assertTrue(np.all(p_values[1] < p_values[0]))
 
 
 class RatioMetricTestCase(unittest.TestCase):
@@ -207,6 +354,7 @@ class RatioMetricTestCase(unittest.TestCase):
         self.assertEqual(ratio.variance, self.DEFAULT_VARIANCE)
         self.assertEqual(ratio.mde, self.DEFAULT_MDE)
         self.assertIsInstance(ratio.power_analysis_instance, NormalIndPower)
+        self.assertIs(ratio.sample_size_solver, normal_sample_size)
 
     def test_ratio_metric_variance(self):
         ratio = RatioMetric(
@@ -223,12 +371,10 @@ class RatioMetricTestCase(unittest.TestCase):
 
     @parameterized.expand(product((1, 2, 10), (2, 10), TEST_ALTERNATIVES))
     @patch("sample_size.metrics.RatioMetric.variance")
-    @patch("scipy.stats.norm")
-    def test_ratio__generate_alt_p_values(self, size, sample_size, alternative, mock_norm, mock_variance):
-        p_value_generator = mock_norm.sf
-        p_values = ["🏝️", "🏜️", "🌋"]
-        mock_norm.rvs.return_value = -ord("🌮")
-        p_value_generator.return_value = p_values
+    @patch("sample_size.metrics.normal_sf", side_effect=normal_sf)
+    def test_ratio__generate_alt_p_values(self, size, sample_size, alternative, mock_normal_sf, mock_variance):
+        mock_random_state = MagicMock()
+        mock_random_state.normal.return_value = np.linspace(-3, 3, size)
         mock_variance.__get__ = MagicMock(return_value=self.DEFAULT_VARIANCE)
 
         metric = RatioMetric(
@@ -241,10 +387,88 @@ class RatioMetricTestCase(unittest.TestCase):
             alternative,
         )
 
-        p = metric._generate_alt_p_values(size, sample_size, RANDOM_STATE)
+        p = metric._generate_alt_p_values(size, sample_size, mock_random_state)
 
         effect_sample_size = self.DEFAULT_MDE / np.sqrt(2 * self.DEFAULT_VARIANCE / sample_size)
-        mock_norm.rvs.assert_called_once_with(loc=effect_sample_size, size=size, random_state=RANDOM_STATE)
-        mock_norm.sf.assert_called_once_with(np.abs(mock_norm.rvs.return_value))
-        expected_p_values = p_values if alternative != "two-sided" else 2 * p_values
-        assert_array_equal(p, expected_p_values)
+        mock_random_state.normal.assert_called_once_with(loc=effect_sample_size, size=size)
+        mock_normal_sf.assert_called_once()
+        expected_p_values = stats.norm.sf(np.abs(np.linspace(-3, 3, size)))
+        if alternative == "two-sided":
+            expected_p_values *= 2
+        np.testing.assert_allclose(p, expected_p_values)
+
+
+TEST_METRIC_SET = [
+    BooleanMetric(0.05, 0.01, "two-sided"),
+    NumericMetric(5000, 5, "larger"),
+    RatioMetric(2000, 100000, 200, 2000, 5000, 1, "smaller"),
+    NumericMetric(100, -1, "two-sided"),
+]
+
+
+class MetricSetTestCase(unittest.TestCase):
+    def test_metric_set_arrays(self):
+        metric_set = MetricSet(TEST_METRIC_SET)
+
+        self.assertEqual(len(metric_set), 4)
+        assert_array_equal(metric_set.effect_sizes, [metric.effect_size for metric in TEST_METRIC_SET])
+        assert_array_equal(metric_set.t_tests, [False, True, False, True])
+        assert_array_equal(metric_set.two_sided, [True, False, False, True])
+
+    @patch.object(DummyMetric, "statistic", "f")
+    def test_metric_set_statistic_error(self):
+        with self.assertRaises(ValueError) as context:
+            MetricSet([DummyMetric(0.1, ALTERNATIVE)])
+
+        self.assertEqual(str(context.exception), "Error: Please provide metrics with a z or t test statistic.")
+
+    @parameterized.expand(product(range(len(TEST_METRIC_SET)), (10, 1000), (False, True)))
+    def test_metric_set_p_values_follow_metric_p_values(self, metric_index, sample_size, common_random_numbers):
+        metric = TEST_METRIC_SET[metric_index]
+        true_alt = np.ones((1, 1, 20000), dtype=bool)
+
+        set_p_values = MetricSet([metric]).generate_p_values(
+            true_alt, sample_size, np.random.default_rng(1), common_random_numbers
+        )
+        metric_p_values = metric.generate_p_values(
+            true_alt[0, 0], sample_size, np.random.default_rng(2), common_random_numbers
+        )
+
+        self.assertEqual(set_p_values.shape, true_alt.shape)
+        self.assertGreater(stats.ks_2samp(set_p_values.ravel(), metric_p_values).pvalue, 1e-3)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_metric_set_draws_once_per_distribution(self, common_random_numbers):
+        random_state = MagicMock(wraps=np.random.default_rng(1))
+        true_alt = np.random.default_rng(2).random((3, len(TEST_METRIC_SET), 50)) < 0.5
+        num_numeric_alts = true_alt[:, [1, 3]].sum()
+
+        p_values = MetricSet(TEST_METRIC_SET).generate_p_values(true_alt, 100, random_state, common_random_numbers)
+
+        random_state.standard_normal.assert_called_once_with(true_alt.sum())
+        if common_random_numbers:
+            random_state.chisquare.assert_not_called()
+            self.assertEqual(
+                [c.args for c in random_state.random.call_args_list], [(num_numeric_alts,), ((~true_alt).sum(),)]
+            )
+        else:
+            random_state.chisquare.assert_called_once_with(198, num_numeric_alts)
+            random_state.random.assert_called_once_with((~true_alt).sum())
+        self.assertEqual(p_values.shape, true_alt.shape)
+        self.assertTrue(np.all((p_values >= 0) & (p_values <= 1)))
+        # the null p-values are uniform
+        self.assertGreater(stats.kstest(p_values[~true_alt], "uniform").pvalue, 1e-3)
+
+    @parameterized.expand([(1000, 1, 1), (NORMAL_APPROXIMATION_DF, 0, 1)])
+    def test_metric_set_p_value_kernels(self, sample_size, t_sf_calls, normal_sf_calls):
+        true_alt = np.ones((1, len(TEST_METRIC_SET), 100), dtype=bool)
+
+        with patch("sample_size.metrics.t_sf", side_effect=t_sf) as mock_t_sf, patch(
+            "sample_size.metrics.normal_sf", side_effect=normal_sf
+        ) as mock_normal_sf:
+            p_values = MetricSet(TEST_METRIC_SET).generate_p_values(true_alt, sample_size, np.random.default_rng(1))
+
+        # above the threshold the z- and t-tests share a single normal kernel call
+        self.assertEqual(mock_t_sf.call_count, t_sf_calls)
+        self.assertEqual(mock_normal_sf.call_count, normal_sf_calls)
+        self.assertTrue(np.all((p_values >= 0) & (p_values <= 1)))
@@ -1,17 +1,41 @@
+import tracemalloc
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
+from unittest.mock import ANY
 from unittest.mock import patch
 
 import numpy as np
 from numpy.testing import assert_array_equal
 from parameterized import parameterized
+from scipy import special
+from statsmodels.stats.multitest import multipletests
 
+from sample_size.metrics import MetricSet
+from sample_size.multiple_testing import BATCH_BYTES_PER_P_VALUE
+from sample_size.multiple_testing import CONFIDENCE_BAND_Z
 from sample_size.multiple_testing import DEFAULT_EPSILON
+from sample_size.multiple_testing import DEFAULT_MAX_BATCH_BYTES
 from sample_size.multiple_testing import DEFAULT_REPLICATION
+from sample_size.multiple_testing import DEFAULT_REPLICATION_BLOCK
+from sample_size.multiple_testing import SampleSizeSearchResult
+from sample_size.multiple_testing import _simulate_shared_scenarios
+from sample_size.multiple_testing import average_power_standard_error
+from sample_size.multiple_testing import benjamini_hochberg
+from sample_size.multiple_testing import bonferroni_alpha
+from sample_size.multiple_testing import holm
+from sample_size.multiple_testing import mean_field_average_power
+from sample_size.multiple_testing import mean_field_holm_average_power
+from sample_size.multiple_testing import random_true_alt
+from sample_size.multiple_testing import sidak_alpha
+from sample_size.power import normal_power
 from sample_size.sample_size_calculator import DEFAULT_ALPHA
 from sample_size.sample_size_calculator import DEFAULT_POWER
-from sample_size.sample_size_calculator import RANDOM_STATE
+from sample_size.sample_size_calculator import DEFAULT_SEED
 from sample_size.sample_size_calculator import SampleSizeCalculator
+from sample_size.workspace import SimulationWorkspace
+from sample_size.workspace import get_workspace
+from sample_size.workspace import release_workspaces
 from tests.sample_size.test_metrics import ALTERNATIVE
 
 TEST_BOOLEAN = {
@@ -52,13 +76,13 @@ class MultipleTestingTestCase(unittest.TestCase):
     @patch(
         "sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size",
     )
-    @patch("sample_size.multiple_testing.MultipleTestingMixin._expected_average_power")
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
     def test_get_multiple_sample_size_quickly_converge(
         self, power_guess, mock_expected_average_power, mock_get_single_sample_size
     ):
         mock_get_single_sample_size.side_effect = lambda _, alpha: 100 if alpha >= DEFAULT_ALPHA else 1000
 
-        mock_expected_average_power.side_effect = [power_guess, DEFAULT_POWER]
+        mock_expected_average_power.side_effect = [(power_guess, 0.01), (DEFAULT_POWER, 0.01)]
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric] * 3)
         expected_call_count = len(calculator.metrics) * 2
@@ -77,9 +101,9 @@ class MultipleTestingTestCase(unittest.TestCase):
         "sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size",
         side_effect=[100, 100, 100, 1000, 1000, 1000],
     )
-    @patch("sample_size.multiple_testing.MultipleTestingMixin._expected_average_power")
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
     def test_get_multiple_sample_size_no_recursion(self, mock_expected_average_power, mock_get_single_sample_size):
-        mock_expected_average_power.return_value = DEFAULT_POWER
+        mock_expected_average_power.return_value = (DEFAULT_POWER, 0.01)
 
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric] * 3)
@@ -88,16 +112,144 @@ class MultipleTestingTestCase(unittest.TestCase):
 
         sample_size = calculator.get_sample_size()
         self.assertEqual(mock_get_single_sample_size.call_count, expected_call_count)
-        mock_expected_average_power.assert_called_once_with(geom_mean, RANDOM_STATE, DEFAULT_REPLICATION)
+        mock_expected_average_power.assert_called_once_with(geom_mean, ANY, DEFAULT_REPLICATION, None, None)
+        self.assertIsInstance(mock_expected_average_power.call_args[0][1], np.random.Generator)
         self.assertEqual(sample_size, geom_mean)
 
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_get_multiple_sample_size_adaptive_replication(self, mock_expected_average_power):
+        mock_expected_average_power.return_value = (DEFAULT_POWER, 0.01)
+        calculator = SampleSizeCalculator(adaptive_replication=True)
+        calculator.register_metrics([self.test_metric] * 3)
+
+        calculator.get_multiple_sample_size(100, 1000, np.random.default_rng(DEFAULT_SEED))
+
+        mock_expected_average_power.assert_called_once_with(316, ANY, DEFAULT_REPLICATION, None, DEFAULT_EPSILON)
+
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_find_multiple_sample_size_interpolates_power_curve(self, mock_expected_average_power):
+        # power curve of a z-test with effect size 0.1 at alpha 0.05: Phi(0.1 * sqrt(n / 2) - 1.96)
+        mock_expected_average_power.side_effect = lambda n, *args: (special.ndtr(0.1 * np.sqrt(n / 2) - 1.96), 0.005)
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+
+        result = calculator.find_multiple_sample_size(100, 10000, np.random.default_rng(DEFAULT_SEED))
+
+        # two geometric midpoints are fitted exactly, so the next candidate lands on the curve's solution
+        self.assertIsInstance(result, SampleSizeSearchResult)
+        self.assertEqual([c[0][0] for c in mock_expected_average_power.call_args_list], [1000, 3162, 1569])
+        self.assertEqual(result.evaluations, 3)
+        self.assertEqual(result.sample_size, 1569)
+        self.assertAlmostEqual(result.power, DEFAULT_POWER, delta=0.001)
+        self.assertEqual(result.standard_error, 0.005)
+        self.assertLess(result.confidence_lower, result.sample_size)
+        self.assertGreater(result.confidence_upper, result.sample_size)
+        # the band holds the sample sizes where the power curve is within the Monte Carlo error of the target
+        for bound, power in (
+            (result.confidence_lower, DEFAULT_POWER - CONFIDENCE_BAND_Z * 0.005),
+            (result.confidence_upper, DEFAULT_POWER + CONFIDENCE_BAND_Z * 0.005),
+        ):
+            self.assertAlmostEqual(special.ndtr(0.1 * np.sqrt(bound / 2) - 1.96), power, delta=0.001)
+
+    @parameterized.expand([(0.0, 1569, 1570), (0.002, 1554, 1586), (np.inf, 100, 10000)])
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_find_multiple_sample_size_confidence_band(
+        self, standard_error, confidence_lower, confidence_upper, mock_expected_average_power
+    ):
+        mock_expected_average_power.side_effect = lambda n, *args: (
+            special.ndtr(0.1 * np.sqrt(n / 2) - 1.96),
+            standard_error,
+        )
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+
+        result = calculator.find_multiple_sample_size(100, 10000, np.random.default_rng(DEFAULT_SEED))
+
+        # the band widens with the Monte Carlo error of the simulated power, up to the initial bracket
+        self.assertEqual(result.sample_size, 1569)
+        self.assertEqual((result.confidence_lower, result.confidence_upper), (confidence_lower, confidence_upper))
+
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_find_multiple_sample_size_without_power_curve(self, mock_expected_average_power):
+        mock_expected_average_power.return_value = (DEFAULT_POWER, 0.01)
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+
+        result = calculator.find_multiple_sample_size(100, 10000, np.random.default_rng(DEFAULT_SEED))
+
+        self.assertEqual(result, SampleSizeSearchResult(1000, 100, 10000, DEFAULT_POWER, 0.01, 1))
+
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_find_multiple_sample_size_falls_back_to_midpoint(self, mock_expected_average_power):
+        # decreasing simulated powers cannot be fitted, so the search bisects the bracket geometrically
+        mock_expected_average_power.side_effect = [(0.7, 0.01), (0.6, 0.01), (DEFAULT_POWER - 0.005, 0.01)]
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+
+        result = calculator.find_multiple_sample_size(100, 10000, np.random.default_rng(DEFAULT_SEED))
+
+        self.assertEqual([c[0][0] for c in mock_expected_average_power.call_args_list], [1000, 3162, 5623])
+        self.assertEqual((result.sample_size, result.evaluations), (5623, 3))
+        self.assertLessEqual(result.confidence_lower, result.sample_size)
+        self.assertEqual(result.confidence_upper, 10000)
+
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
+    def test_find_multiple_sample_size_starts_from_power_curve(self, mock_expected_average_power):
+        mock_expected_average_power.side_effect = [(0.7, 0.01), (DEFAULT_POWER, 0.01)]
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+        # probit(power) = -2 + 0.05 * sqrt(n)
+        power_curve = (-2.0, 0.05)
+
+        result = calculator.find_multiple_sample_size(
+            100, 10000, np.random.default_rng(DEFAULT_SEED), power_curve=power_curve
+        )
+
+        first_candidate = int(((special.ndtri(DEFAULT_POWER) + 2) / 0.05) ** 2)
+        # the second candidate moves the prior curve through the first simulated power
+        first_intercept = special.ndtri(0.7) - 0.05 * np.sqrt(first_candidate)
+        second_candidate = int(((special.ndtri(DEFAULT_POWER) - first_intercept) / 0.05) ** 2)
+        candidates = [c[0][0] for c in mock_expected_average_power.call_args_list]
+        self.assertEqual(candidates, [first_candidate, second_candidate])
+        self.assertEqual(result.sample_size, second_candidate)
+
+    @parameterized.expand([(TEST_BOOLEAN,), (TEST_NUMERIC,), (TEST_RATIO,)])
+    def test_surrogate_average_power_approximates_simulation(self, test_metric):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([test_metric] * 5)
+        lower = calculator._get_single_sample_size(calculator.metrics[0], DEFAULT_ALPHA)
+
+        for sample_size in (lower, 1.5 * lower):
+            simulated_power = calculator._expected_average_power(int(sample_size), np.random.default_rng(0), 2000)
+            self.assertAlmostEqual(calculator._surrogate_average_power(sample_size), simulated_power, delta=0.03)
+
+    def test_surrogate_power_curve(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN, TEST_NUMERIC])
+        lower, upper = 1000, 100000
+
+        power_curve = calculator._surrogate_power_curve(lower, upper)
+
+        assert power_curve is not None
+        intercept, slope = power_curve
+
+        sample_size = ((special.ndtri(DEFAULT_POWER) - intercept) / slope) ** 2
+        self.assertAlmostEqual(calculator._surrogate_average_power(sample_size), DEFAULT_POWER, delta=0.001)
+
+    @parameterized.expand([(1000, 1000), (100, 200), (100000, 200000)])
+    def test_surrogate_power_curve_without_crossing(self, lower, upper):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN] * 2)
+
+        self.assertIsNone(calculator._surrogate_power_curve(lower, upper))
+
     @parameterized.expand([(1.0, "small"), (0.0, "large")])
     @patch("sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size")
-    @patch("sample_size.multiple_testing.MultipleTestingMixin._expected_average_power")
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
     def test_get_multiple_sample_size_converges_without_solution(
         self, power, error, mock_expected_power, mock__expected_average_power
     ):
-        mock_expected_power.return_value = power
+        mock_expected_power.return_value = (power, 0.01)
         mock__expected_average_power.return_value = 1000.0
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric, self.test_metric])
@@ -109,9 +261,9 @@ class MultipleTestingTestCase(unittest.TestCase):
             f"Unusually {error} sample size. Please verify input parameters",
         )
 
-    @patch("sample_size.multiple_testing.MultipleTestingMixin._expected_average_power")
+    @patch("sample_size.multiple_testing.MultipleTestingMixin._average_power_estimate")
     def test_get_multiple_sample_size_does_not_converge(self, mock_expected_power):
-        mock_expected_power.return_value = 0.0
+        mock_expected_power.return_value = (0.0, 0.01)
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric, self.test_metric])
 
@@ -124,43 +276,612 @@ class MultipleTestingTestCase(unittest.TestCase):
 
     @parameterized.expand(
         [
-            (TEST_BOOLEAN, 2051, 1),
-            (TEST_NUMERIC, 2744, 2),
-            (TEST_RATIO, 17414, 4),
-            (TEST_BOOLEAN, 2002, 11),
-            (TEST_NUMERIC, 2786, 8),
-            (TEST_RATIO, 17740, 6),
+            (TEST_BOOLEAN, 1965, 1),
+            (TEST_NUMERIC, 2921, 2),
+            (TEST_RATIO, 17496, 4),
+            (TEST_BOOLEAN, 2017, 11),
+            (TEST_NUMERIC, 2809, 8),
+            (TEST_RATIO, 16947, 6),
         ]
     )
     def test_get_multiple_sample_size_fixed_output(self, test_metric, test_sample_size, seed):
         N = 3
-        with patch("sample_size.sample_size_calculator.STATE", np.random.RandomState(seed).get_state()):
-            calcs = [SampleSizeCalculator() for _ in range(N)]
-            for calc in calcs:
-                calc.register_metrics([test_metric] * 2)
-            sample_sizes = [calc.get_sample_size() for calc in calcs]
-            assert_array_equal(sample_sizes, [test_sample_size] * N)
+        calcs = [SampleSizeCalculator(random_state=seed) for _ in range(N)]
+        for calc in calcs:
+            calc.register_metrics([test_metric] * 2)
+        sample_sizes = [calc.get_sample_size() for calc in calcs]
+        assert_array_equal(sample_sizes, [test_sample_size] * N)
 
     @parameterized.expand([(10,), (100,), (1000,)])
     def test_expected_average_power_satisfies_inequality(self, test_size):
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric, self.test_metric, self.test_metric])
-        expected_power = calculator._expected_average_power(test_size, RANDOM_STATE)
-        inflated_power = calculator._expected_average_power(test_size * 10, RANDOM_STATE)
+        random_state = np.random.default_rng(DEFAULT_SEED)
+        expected_power = calculator._expected_average_power(test_size, random_state)
+        inflated_power = calculator._expected_average_power(test_size * 10, random_state)
         self.assertGreater(inflated_power, expected_power)
 
+    def test_average_power_estimate_standard_error(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 3)
+
+        estimates = [
+            calculator._average_power_estimate(300, np.random.default_rng(DEFAULT_SEED), replication)
+            for replication in (400, 6400)
+        ]
+
+        self.assertEqual(estimates[0][0], calculator._expected_average_power(300, np.random.default_rng(DEFAULT_SEED)))
+        self.assertAlmostEqual(estimates[0][1] / estimates[1][1], 4, delta=0.5)
+        self.assertAlmostEqual(estimates[0][0], estimates[1][0], delta=3 * estimates[0][1])
+
     @parameterized.expand(product((10, 100, 500, 1000), (0.1, 0.2, 0.5, 0.8, 0.9)))
-    @patch("sample_size.multiple_testing.multipletests")
+    @patch("sample_size.multiple_testing.benjamini_hochberg")
     def test_expected_average_power_is_a_reasonable_approximation(self, replications, true_power, mock_fdr):
         # We are setting the rejection rate to true_power
         # Because we are randomly permuting the indices of the true alternative hypotheses
         # we can conceptualize that aspect as random sampling
         rng = np.random.RandomState(1024)
-        mock_fdr.side_effect = lambda a, **kw: [rng.random(len(a)) < true_power]
+        mock_fdr.side_effect = lambda a, alpha, **kw: rng.random(a.shape) < true_power
 
         sample_size = 10  # arbitrary
         calculator = SampleSizeCalculator()
         calculator.register_metrics([self.test_metric] * 2)
-        empirical_power = calculator._expected_average_power(sample_size, RANDOM_STATE, replications)
+        empirical_power = calculator._expected_average_power(
+            sample_size, np.random.default_rng(DEFAULT_SEED), replications
+        )
         margin_of_error = 1 / np.sqrt(replications)  # proportional to 1 σ
         self.assertAlmostEqual(true_power, empirical_power, delta=margin_of_error)
+
+    @parameterized.expand([(0, 1), (1, 1), (2, 2), (3.5, 3)])
+    def test_scenario_chunk_size(self, budget_in_scenarios, chunk_size):
+        num_tests = 4
+        scenario_bytes = BATCH_BYTES_PER_P_VALUE * num_tests * DEFAULT_REPLICATION
+        calculator = SampleSizeCalculator(max_batch_bytes=int(budget_in_scenarios * scenario_bytes))
+
+        self.assertEqual(calculator._scenario_chunk_size(num_tests, DEFAULT_REPLICATION), chunk_size)
+
+    @parameterized.expand([(1,), (DEFAULT_MAX_BATCH_BYTES,)])
+    @patch("sample_size.multiple_testing.benjamini_hochberg", side_effect=benjamini_hochberg)
+    def test_batched_expected_average_power(self, max_batch_bytes, mock_fdr):
+        num_metrics = 4
+        sample_size = 1000
+        loop_calculator = SampleSizeCalculator()
+        batch_calculator = SampleSizeCalculator(batch_scenarios=True, max_batch_bytes=max_batch_bytes)
+        loop_calculator.register_metrics([self.test_metric] * num_metrics)
+        batch_calculator.register_metrics([self.test_metric] * num_metrics)
+
+        loop_power = loop_calculator._expected_average_power(sample_size, np.random.default_rng(0))
+        mock_fdr.reset_mock()
+        batch_power = batch_calculator._expected_average_power(sample_size, np.random.default_rng(0))
+
+        num_blocks = DEFAULT_REPLICATION // DEFAULT_REPLICATION_BLOCK
+        expected_calls = num_metrics * num_blocks if max_batch_bytes == 1 else num_blocks
+        self.assertEqual(mock_fdr.call_count, expected_calls)
+        self.assertEqual(mock_fdr.call_args[0][0].shape[1:], (num_metrics, DEFAULT_REPLICATION_BLOCK))
+        self.assertAlmostEqual(loop_power, batch_power, delta=0.02)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_batched_expected_average_power_stays_within_max_batch_bytes(self, shared_draws):
+        max_batch_bytes = 20 * 2**20
+        calculator = SampleSizeCalculator(
+            batch_scenarios=True, max_batch_bytes=max_batch_bytes, shared_draws=shared_draws
+        )
+        calculator.register_metrics([TEST_BOOLEAN, TEST_NUMERIC] * 50)
+        release_workspaces()
+
+        tracemalloc.start()
+        try:
+            # the second block of replications simulates on top of the workspace buffers of the first
+            calculator._expected_average_power(3000, np.random.default_rng(DEFAULT_SEED), 2 * DEFAULT_REPLICATION_BLOCK)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            release_workspaces()
+
+        self.assertGreater(calculator._scenario_chunk_size(100, DEFAULT_REPLICATION_BLOCK), 1)
+        self.assertLess(peak, max_batch_bytes)
+
+    def test_batched_get_multiple_sample_size_fixed_output(self):
+        calculator = SampleSizeCalculator(batch_scenarios=True)
+        calculator.register_metrics([TEST_BOOLEAN] * 2)
+
+        self.assertEqual(calculator.get_sample_size(), 2060)
+
+    @parameterized.expand([(DEFAULT_REPLICATION,), (DEFAULT_REPLICATION_BLOCK * 2 + 1,)])
+    @patch("sample_size.multiple_testing._simulate_scenarios", side_effect=lambda *args: (np.ones(1), np.full(1, 2)))
+    def test_expected_average_power_splits_replications_into_blocks(self, replication, mock_simulate):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([self.test_metric] * 2)
+
+        calculator._expected_average_power(100, np.random.default_rng(DEFAULT_SEED), replication)
+
+        task_replications = sorted(c[0][4] for c in mock_simulate.call_args_list)
+        self.assertEqual(sum(task_replications), replication * 2)
+        self.assertLessEqual(max(task_replications), DEFAULT_REPLICATION_BLOCK)
+        # each task draws from its own random stream
+        random_states = [c[0][5] for c in mock_simulate.call_args_list]
+        self.assertEqual(len({r.random() for r in random_states}), len(random_states))
+
+    @parameterized.expand([(TEST_BOOLEAN, False), (TEST_NUMERIC, True)])
+    def test_expected_average_power_does_not_depend_on_number_of_workers(self, test_metric, batch_scenarios):
+        calculator = SampleSizeCalculator(batch_scenarios=batch_scenarios)
+        calculator.register_metrics([test_metric] * 3)
+
+        serial_power = calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parallel_power = calculator._expected_average_power(
+                1000, np.random.default_rng(DEFAULT_SEED), executor=executor
+            )
+
+        self.assertEqual(serial_power, parallel_power)
+
+    def test_expected_average_power_does_not_depend_on_metric_order(self):
+        powers = []
+        for metrics in ([TEST_BOOLEAN, TEST_NUMERIC, TEST_RATIO], [TEST_RATIO, TEST_NUMERIC, TEST_BOOLEAN]):
+            calculator = SampleSizeCalculator(variants=3)
+            calculator.register_metrics(metrics)
+            powers.append(calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED)))
+
+        self.assertEqual(powers[0], powers[1])
+
+    def test_get_sample_size_does_not_depend_on_number_of_workers(self):
+        sample_sizes = []
+        for n_jobs in (1, 2):
+            calculator = SampleSizeCalculator(n_jobs=n_jobs)
+            calculator.register_metrics([TEST_BOOLEAN] * 2)
+            sample_sizes.append(calculator.get_sample_size())
+
+        self.assertEqual(sample_sizes, [1965] * 2)
+
+    @parameterized.expand([(1, 1), (4, DEFAULT_REPLICATION // DEFAULT_REPLICATION_BLOCK)])
+    @patch("sample_size.multiple_testing._simulate_scenarios")
+    def test_expected_average_power_adaptive_replication(self, true_discoveries, num_blocks, mock_simulate):
+        # every replication has 5 true alternatives, so the power is either far below 0.8 or exactly at it
+        mock_simulate.side_effect = lambda *args: (np.full(args[4], true_discoveries), np.full(args[4], 5))
+        calculator = SampleSizeCalculator(batch_scenarios=True)
+        calculator.register_metrics([self.test_metric] * 2)
+
+        power = calculator._expected_average_power(100, np.random.default_rng(DEFAULT_SEED), epsilon=DEFAULT_EPSILON)
+
+        self.assertEqual(power, true_discoveries / 5)
+        self.assertEqual(mock_simulate.call_count, num_blocks)
+
+    def test_expected_average_power_adaptive_replication_is_deterministic(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN] * 3)
+
+        full_power = calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED))
+        powers = [
+            calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED), epsilon=DEFAULT_EPSILON)
+        ]
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            powers.append(
+                calculator._expected_average_power(
+                    1000, np.random.default_rng(DEFAULT_SEED), executor=executor, epsilon=DEFAULT_EPSILON
+                )
+            )
+
+        # the first blocks are the same simulations as without early stopping
+        self.assertEqual(powers[0], powers[1])
+        self.assertNotEqual(powers[0], full_power)
+        self.assertAlmostEqual(powers[0], full_power, delta=0.05)
+
+    @parameterized.expand([(TEST_BOOLEAN, 2111), (TEST_NUMERIC, 2887), (TEST_RATIO, 18801)])
+    def test_get_sample_size_with_adaptive_replication_fixed_output(self, test_metric, test_sample_size):
+        calculator = SampleSizeCalculator(adaptive_replication=True)
+        calculator.register_metrics([test_metric] * 3)
+
+        self.assertEqual(calculator.get_sample_size(), test_sample_size)
+
+    @parameterized.expand([(TEST_BOOLEAN,), (TEST_NUMERIC,), (TEST_RATIO,)])
+    def test_expected_average_power_with_common_random_numbers_is_monotone(self, test_metric):
+        calculator = SampleSizeCalculator(common_random_numbers=True)
+        calculator.register_metrics([test_metric] * 3)
+        random_state = np.random.default_rng(DEFAULT_SEED)
+        lower = calculator._get_single_sample_size(calculator.metrics[0], DEFAULT_ALPHA)
+
+        powers = [calculator._expected_average_power(n, random_state) for n in np.linspace(lower, 2 * lower, 20)]
+
+        self.assertTrue(np.all(np.diff(powers) > 0))
+
+    def test_expected_average_power_with_common_random_numbers_replays_random_state(self):
+        calculator = SampleSizeCalculator(common_random_numbers=True)
+        calculator.register_metrics([TEST_NUMERIC] * 3)
+        random_state = np.random.default_rng(DEFAULT_SEED)
+
+        powers = [calculator._expected_average_power(1000, random_state) for _ in range(2)]
+
+        self.assertEqual(powers[0], powers[1])
+        self.assertEqual(random_state.random(), np.random.default_rng(DEFAULT_SEED).random())
+
+    @parameterized.expand([(TEST_BOOLEAN, 2073), (TEST_NUMERIC, 2847), (TEST_RATIO, 18801)])
+    def test_get_sample_size_with_common_random_numbers_fixed_output(self, test_metric, test_sample_size):
+        calculator = SampleSizeCalculator(common_random_numbers=True)
+        calculator.register_metrics([test_metric] * 3)
+
+        self.assertEqual(calculator.get_sample_size(), test_sample_size)
+
+    @parameterized.expand([(TEST_BOOLEAN, False), (TEST_NUMERIC, True), (TEST_RATIO, False)])
+    def test_expected_average_power_with_shared_draws_is_unbiased(self, test_metric, batch_scenarios):
+        independent_calculator = SampleSizeCalculator(batch_scenarios=batch_scenarios)
+        shared_calculator = SampleSizeCalculator(batch_scenarios=batch_scenarios, shared_draws=True)
+        for calculator in (independent_calculator, shared_calculator):
+            calculator.register_metrics([test_metric] * 4)
+        sample_size = calculator._get_single_sample_size(calculator.metrics[0], DEFAULT_ALPHA)
+
+        powers = [
+            [c._expected_average_power(int(sample_size), np.random.default_rng(seed)) for seed in range(10)]
+            for c in (independent_calculator, shared_calculator)
+        ]
+
+        self.assertAlmostEqual(np.mean(powers[0]), np.mean(powers[1]), delta=0.01)
+
+    @patch("sample_size.multiple_testing._simulate_scenarios")
+    @patch("sample_size.multiple_testing._simulate_shared_scenarios", side_effect=_simulate_shared_scenarios)
+    def test_expected_average_power_with_shared_draws_draws_once_per_block(self, mock_shared, mock_simulate):
+        num_metrics = 4
+        calculator = SampleSizeCalculator(shared_draws=True, max_batch_bytes=1)
+        calculator.register_metrics([self.test_metric] * num_metrics)
+
+        calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED))
+
+        mock_simulate.assert_not_called()
+        self.assertEqual(mock_shared.call_count, DEFAULT_REPLICATION // DEFAULT_REPLICATION_BLOCK)
+        # one scenario per chunk, covering 1 to num_metrics true alternatives
+        self.assertEqual([list(chunk) for chunk in mock_shared.call_args[0][3]], [[n] for n in range(1, 5)])
+
+    @parameterized.expand([(False,), (True,)])
+    def test_simulate_shared_scenarios(self, common_random_numbers):
+        num_metrics = 3
+        replication = 200
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_NUMERIC] * num_metrics)
+        metrics = MetricSet(calculator.metrics)
+        random_state = np.random.default_rng(DEFAULT_SEED)
+
+        with patch.object(metrics, "generate_alt_p_values", wraps=metrics.generate_alt_p_values) as mock_generate:
+            true_discoveries, true_alts = _simulate_shared_scenarios(
+                metrics, DEFAULT_ALPHA, 3000, [[1, 2], [3]], replication, random_state, common_random_numbers
+            )
+
+        mock_generate.assert_called_once_with(replication, 3000, random_state, common_random_numbers)
+        self.assertEqual(true_discoveries.shape, (replication,))
+        assert_array_equal(true_alts, 1 + 2 + 3)
+        self.assertTrue(np.all(true_discoveries <= true_alts))
+        self.assertGreater(true_discoveries.mean(), 0)
+
+    def test_expected_average_power_with_shared_draws_is_deterministic(self):
+        calculator = SampleSizeCalculator(shared_draws=True)
+        calculator.register_metrics([TEST_BOOLEAN] * 3)
+
+        serial_power = calculator._expected_average_power(1000, np.random.default_rng(DEFAULT_SEED))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parallel_power = calculator._expected_average_power(
+                1000, np.random.default_rng(DEFAULT_SEED), executor=executor
+            )
+
+        self.assertEqual(serial_power, parallel_power)
+
+    @parameterized.expand([(TEST_BOOLEAN, 2143), (TEST_NUMERIC, 2872), (TEST_RATIO, 18801)])
+    def test_get_sample_size_with_shared_draws_fixed_output(self, test_metric, test_sample_size):
+        calculator = SampleSizeCalculator(shared_draws=True)
+        calculator.register_metrics([test_metric] * 3)
+
+        self.assertEqual(calculator.get_sample_size(), test_sample_size)
+
+    @parameterized.expand([(False, False), (True, False), (False, True)])
+    def test_expected_average_power_with_single_precision(self, batch_scenarios, shared_draws):
+        calculators = [
+            SampleSizeCalculator(
+                batch_scenarios=batch_scenarios, shared_draws=shared_draws, single_precision=single_precision
+            )
+            for single_precision in (False, True)
+        ]
+        for calculator in calculators:
+            calculator.register_metrics([TEST_NUMERIC, TEST_BOOLEAN, TEST_RATIO] * 2)
+
+        powers = [c._expected_average_power(3000, np.random.default_rng(DEFAULT_SEED)) for c in calculators]
+
+        # the same random numbers only differ by rounding in single precision
+        self.assertAlmostEqual(powers[0], powers[1], delta=1e-3)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_expected_average_power_reuses_workspace(self, single_precision):
+        dtype = np.float32 if single_precision else np.float64
+        calculator = SampleSizeCalculator(batch_scenarios=True, single_precision=single_precision)
+        calculator.register_metrics([TEST_BOOLEAN] * 4)
+        workspace = get_workspace(dtype)
+        workspace.release()
+
+        with patch.object(
+            SimulationWorkspace, "p_values", autospec=True, side_effect=SimulationWorkspace.p_values
+        ) as mock_p_values:
+            for sample_size in (1000, 2000):
+                calculator._expected_average_power(sample_size, np.random.default_rng(DEFAULT_SEED))
+
+        p_values = [c.args[0].p_values(c.args[1]) for c in mock_p_values.call_args_list]
+        self.assertEqual(len(mock_p_values.call_args_list), 2 * DEFAULT_REPLICATION // DEFAULT_REPLICATION_BLOCK)
+        self.assertTrue(all(c.args[0] is workspace for c in mock_p_values.call_args_list))
+        self.assertEqual({p.dtype for p in p_values}, {np.dtype(dtype)})
+        # every block of every candidate simulates into the same memory
+        self.assertEqual(len({p.__array_interface__["data"][0] for p in p_values}), 1)
+
+    @parameterized.expand([(TEST_BOOLEAN, 2111), (TEST_NUMERIC, 2887), (TEST_RATIO, 18801)])
+    def test_get_sample_size_with_single_precision_fixed_output(self, test_metric, test_sample_size):
+        calculator = SampleSizeCalculator(single_precision=True)
+        calculator.register_metrics([test_metric] * 3)
+
+        self.assertEqual(calculator.get_sample_size(), test_sample_size)
+
+    @parameterized.expand(product((1, 3, 10), ((1,), (1, 2, 3), (0, 5))))
+    def test_random_true_alt(self, num_tests, num_true_alts):
+        num_true_alts = [min(n, num_tests) for n in num_true_alts]
+        replication = 1000
+
+        true_alt = random_true_alt(num_tests, num_true_alts, replication, np.random.default_rng(1))
+
+        self.assertEqual(true_alt.shape, (len(num_true_alts), num_tests, replication))
+        for scenario, num_true_alt in zip(true_alt, num_true_alts):
+            # every replication has exactly num_true_alt true alternatives...
+            assert_array_equal(scenario.sum(axis=0), num_true_alt)
+            # ...placed uniformly at random among the hypotheses
+            np.testing.assert_allclose(scenario.mean(axis=1), num_true_alt / num_tests, atol=4 / np.sqrt(replication))
+
+    def test_random_true_alt_with_workspace(self):
+        workspace = SimulationWorkspace()
+
+        true_alt = random_true_alt(5, [1, 2, 3], 100, np.random.default_rng(7), workspace)
+
+        assert_array_equal(true_alt, random_true_alt(5, [1, 2, 3], 100, np.random.default_rng(7)))
+        self.assertTrue(np.shares_memory(true_alt, workspace.true_alt(true_alt.shape)))
+
+    def test_random_true_alt_is_deterministic(self):
+        true_alts = [random_true_alt(5, [1, 2, 3], 100, np.random.default_rng(7)) for _ in range(2)]
+
+        assert_array_equal(true_alts[0], true_alts[1])
+
+
+class MeanFieldAveragePowerTestCase(unittest.TestCase):
+    @parameterized.expand([(1,), (5,), (50,)])
+    def test_mean_field_average_power_bounds(self, num_tests):
+        self.assertAlmostEqual(mean_field_average_power(np.ones_like, num_tests, DEFAULT_ALPHA), 1)
+        # without any effect, the false discovery rate condition only holds at a threshold of zero
+        self.assertAlmostEqual(mean_field_average_power(lambda t: t, num_tests, DEFAULT_ALPHA), 0)
+
+    def test_mean_field_average_power_increases_with_test_power(self):
+        powers = [mean_field_average_power(lambda t: t**exponent, 10, DEFAULT_ALPHA) for exponent in (0.5, 0.3, 0.1)]
+
+        self.assertTrue(np.all(np.diff(powers) > 0))
+
+
+class AveragePowerStandardErrorTestCase(unittest.TestCase):
+    def test_average_power_standard_error_of_single_alternatives(self):
+        true_discoveries = np.random.default_rng(DEFAULT_SEED).random(100) < 0.8
+
+        standard_error = average_power_standard_error(true_discoveries.astype(int), np.ones(100, dtype=int))
+
+        self.assertAlmostEqual(standard_error, float(np.std(true_discoveries, ddof=1)) / 10)
+
+    def test_average_power_standard_error_shrinks_with_replications(self):
+        random_state = np.random.default_rng(DEFAULT_SEED)
+        standard_errors = []
+        for num_replications in (100, 10000):
+            true_alts = random_state.integers(1, 10, num_replications)
+            true_discoveries = random_state.binomial(true_alts, 0.8)
+            standard_errors.append(average_power_standard_error(true_discoveries, true_alts))
+
+        self.assertAlmostEqual(standard_errors[0] / standard_errors[1], 10, delta=2)
+
+    def test_average_power_standard_error_of_single_replication(self):
+        self.assertEqual(average_power_standard_error(np.array([1]), np.array([2])), np.inf)
+
+
+class BenjaminiHochbergTestCase(unittest.TestCase):
+    @parameterized.expand(product((1, 2, 5, 20), (0.01, 0.05, 0.2)))
+    def test_benjamini_hochberg_matches_multipletests(self, num_hypotheses, alpha):
+        rng = np.random.RandomState(num_hypotheses)
+        replications = 500
+        # mix near-zero p-values with uniform ones and round them to create ties around the thresholds
+        p_values = np.round(rng.beta(0.3, 1, size=(num_hypotheses, replications)), 3)
+
+        rejected = benjamini_hochberg(p_values, alpha)
+
+        expected = np.array(
+            [multipletests(p_values[:, j], alpha=alpha, method="fdr_bh")[0] for j in range(replications)]
+        ).T
+        assert_array_equal(rejected, expected)
+
+    @parameterized.expand([(0,), (1,), (2,)])
+    def test_benjamini_hochberg_along_axis(self, axis):
+        rng = np.random.RandomState(axis)
+        p_values = rng.beta(0.3, 1, size=(3, 4, 50))
+
+        rejected = benjamini_hochberg(p_values, DEFAULT_ALPHA, axis=axis)
+
+        expected = np.apply_along_axis(
+            lambda a: multipletests(a, alpha=DEFAULT_ALPHA, method="fdr_bh")[0], axis, p_values
+        )
+        assert_array_equal(rejected, expected)
+
+    def test_benjamini_hochberg_rejects_nothing(self):
+        p_values = np.array([[0.5, 0.04], [0.9, 0.06]])
+
+        assert_array_equal(benjamini_hochberg(p_values, DEFAULT_ALPHA), np.zeros_like(p_values, dtype=bool))
+
+    def test_benjamini_hochberg_of_list(self):
+        p_values = [[0.01, 0.5], [0.04, 0.9]]
+
+        assert_array_equal(
+            benjamini_hochberg(p_values, DEFAULT_ALPHA), benjamini_hochberg(np.array(p_values), DEFAULT_ALPHA)
+        )
+
+    @parameterized.expand([(np.float16,), (np.int_,), (np.bool_,)])
+    def test_benjamini_hochberg_of_other_dtypes(self, dtype):
+        p_values = np.array([[0.01, 1.0], [0.02, 0.0], [1.0, 0.03]])
+
+        rejected = benjamini_hochberg(p_values.astype(dtype), DEFAULT_ALPHA)
+
+        assert_array_equal(rejected, benjamini_hochberg(p_values.astype(dtype).astype(np.float_), DEFAULT_ALPHA))
+
+    @parameterized.expand([(np.float64,), (np.float32,)])
+    def test_benjamini_hochberg_with_workspace(self, dtype):
+        p_values = np.random.RandomState(0).beta(0.3, 1, size=(3, 20, 50)).astype(dtype)
+        workspace = SimulationWorkspace(dtype)
+
+        rejected = [benjamini_hochberg(p_values, DEFAULT_ALPHA, axis=1, workspace=workspace) for _ in range(2)]
+
+        assert_array_equal(rejected[0], benjamini_hochberg(p_values, DEFAULT_ALPHA, axis=1))
+        # the rejections are written into the same buffer every time
+        self.assertIs(rejected[0].base, rejected[1].base)
+        self.assertTrue(np.shares_memory(rejected[0], workspace.rejected(p_values.shape)))
+
+
+class HolmTestCase(unittest.TestCase):
+    @parameterized.expand(product((1, 2, 5, 20), (0.01, 0.05, 0.2)))
+    def test_holm_matches_multipletests(self, num_hypotheses, alpha):
+        rng = np.random.RandomState(num_hypotheses)
+        replications = 100
+        # mix near-zero p-values with uniform ones and round them to create ties around the thresholds
+        p_values = np.round(rng.beta(0.3, 1, size=(num_hypotheses, replications)), 3)
+
+        rejected = holm(p_values, alpha)
+
+        expected = np.array(
+            [multipletests(p_values[:, j], alpha=alpha, method="holm")[0] for j in range(replications)]
+        ).T
+        assert_array_equal(rejected, expected)
+
+    @parameterized.expand([(0, np.float64), (1, np.float32), (2, np.float64)])
+    def test_holm_along_axis(self, axis, dtype):
+        rng = np.random.RandomState(axis)
+        p_values = rng.beta(0.3, 1, size=(3, 4, 50)).astype(dtype)
+
+        rejected = holm(p_values, DEFAULT_ALPHA, axis=axis, workspace=SimulationWorkspace(dtype))
+
+        expected = np.apply_along_axis(
+            lambda a: multipletests(a, alpha=DEFAULT_ALPHA, method="holm")[0], axis, p_values
+        )
+        assert_array_equal(rejected, expected)
+
+    def test_holm_of_list(self):
+        p_values = [[0.01, 0.5], [0.04, 0.9]]
+
+        assert_array_equal(holm(p_values, DEFAULT_ALPHA), holm(np.array(p_values), DEFAULT_ALPHA))
+
+    @parameterized.expand([(np.float16,), (np.int_,), (np.bool_,)])
+    def test_holm_of_other_dtypes(self, dtype):
+        p_values = np.array([[0.01, 1.0], [0.02, 0.0], [1.0, 0.03]])
+
+        rejected = holm(p_values.astype(dtype), DEFAULT_ALPHA)
+
+        assert_array_equal(rejected, holm(p_values.astype(dtype).astype(np.float_), DEFAULT_ALPHA))
+
+    @parameterized.expand([(np.float64,), (np.float32,)])
+    def test_holm_with_workspace(self, dtype):
+        p_values = np.random.RandomState(0).beta(0.3, 1, size=(3, 20, 50)).astype(dtype)
+        workspace = SimulationWorkspace(dtype)
+
+        rejected = [holm(p_values, DEFAULT_ALPHA, axis=1, workspace=workspace) for _ in range(2)]
+
+        assert_array_equal(rejected[0], holm(p_values, DEFAULT_ALPHA, axis=1))
+        # the rejections are written into the same buffer every time
+        self.assertIs(rejected[0].base, rejected[1].base)
+        self.assertTrue(np.shares_memory(rejected[0], workspace.rejected(p_values.shape)))
+
+    def test_holm_rejects_a_subset_of_benjamini_hochberg(self):
+        p_values = np.random.RandomState(0).beta(0.3, 1, size=(10, 1000))
+
+        holm_rejected = holm(p_values, DEFAULT_ALPHA)
+        bh_rejected = benjamini_hochberg(p_values, DEFAULT_ALPHA)
+
+        self.assertFalse(np.any(holm_rejected & ~bh_rejected))
+        self.assertLess(holm_rejected.sum(), bh_rejected.sum())
+
+
+class CorrectionTestCase(unittest.TestCase):
+    @parameterized.expand([(1,), (5,), (20,)])
+    def test_analytic_correction_alphas(self, num_tests):
+        self.assertEqual(bonferroni_alpha(DEFAULT_ALPHA, num_tests), DEFAULT_ALPHA / num_tests)
+        self.assertAlmostEqual(sidak_alpha(DEFAULT_ALPHA, num_tests), 1 - (1 - DEFAULT_ALPHA) ** (1 / num_tests))
+        # Sidak is slightly less conservative than Bonferroni
+        self.assertGreaterEqual(sidak_alpha(DEFAULT_ALPHA, num_tests), bonferroni_alpha(DEFAULT_ALPHA, num_tests))
+
+    @parameterized.expand([(False,), (True,)])
+    def test_expected_average_power_is_ordered_by_correction(self, shared_draws):
+        powers = []
+        for correction in ("holm", "bh"):
+            calculator = SampleSizeCalculator(correction=correction, shared_draws=shared_draws)
+            calculator.register_metrics([TEST_BOOLEAN, TEST_NUMERIC, TEST_RATIO])
+            powers.append(calculator._expected_average_power(3000, np.random.default_rng(DEFAULT_SEED)))
+        bonferroni_power = float(
+            np.mean(
+                [
+                    normal_power(metric.effect_size, 3000, DEFAULT_ALPHA / 3, metric.alternative)
+                    for metric in calculator.metrics
+                ]
+            )
+        )
+
+        # the same p-values give Holm a subset of the BH rejections, and Holm rejects everything Bonferroni does
+        self.assertLess(powers[0], powers[1])
+        self.assertAlmostEqual(powers[0], bonferroni_power, delta=0.1)
+        self.assertGreater(powers[0], bonferroni_power - 0.02)
+
+    @parameterized.expand([(2,), (5,), (20,)])
+    def test_mean_field_holm_average_power(self, num_tests):
+        calculator = SampleSizeCalculator(correction="holm")
+        calculator.register_metrics([TEST_BOOLEAN] * num_tests)
+        sample_size = calculator._get_single_sample_size(calculator.metrics[0], DEFAULT_ALPHA)
+
+        simulated_power = calculator._expected_average_power(int(sample_size), np.random.default_rng(DEFAULT_SEED))
+        surrogate_power = calculator._surrogate_average_power(sample_size)
+
+        # the mean field ignores that a single large p-value stops the step-down, which matters less in large families
+        self.assertGreater(surrogate_power, simulated_power - 0.02)
+        self.assertAlmostEqual(surrogate_power, simulated_power, delta=0.06)
+
+    def test_mean_field_holm_average_power_bounds(self):
+        power = mean_field_holm_average_power(lambda t: np.sqrt(t), 5, DEFAULT_ALPHA)
+
+        # between Bonferroni's power and the power of unadjusted tests
+        self.assertTrue(np.sqrt(DEFAULT_ALPHA / 5) < power < np.sqrt(DEFAULT_ALPHA))
+
+    @patch("sample_size.multiple_testing.MEAN_FIELD_MAX_ITERATIONS", 1)
+    def test_mean_field_holm_average_power_stops_after_max_iterations(self):
+        power = mean_field_holm_average_power(lambda t: np.sqrt(t), 5, DEFAULT_ALPHA)
+
+        # a single step already moves the thresholds up from Bonferroni's
+        self.assertTrue(np.sqrt(DEFAULT_ALPHA / 5) < power < 0.1043)
+
+    @parameterized.expand([("holm", 2236), ("bonferroni", 2486), ("sidak", 2476)])
+    def test_get_sample_size_with_correction_fixed_output(self, correction, test_sample_size):
+        calculator = SampleSizeCalculator(correction=correction)
+        calculator.register_metrics([TEST_BOOLEAN] * 3)
+
+        self.assertEqual(calculator.get_sample_size(), test_sample_size)
+
+    @parameterized.expand([("bonferroni",), ("sidak",)])
+    def test_analytic_correction_ignores_the_sign_of_the_effect(self, correction):
+        # the simulations test the magnitude of an effect in the direction of the alternative, whatever its sign
+        wrong_sign_numeric = {
+            "metric_type": "numeric",
+            "metric_metadata": {"variance": 5000, "mde": -5, "alternative": "larger"},
+        }
+        calculators = [SampleSizeCalculator(correction=correction) for _ in range(2)]
+        calculators[0].register_metrics([TEST_BOOLEAN, TEST_NUMERIC])
+        calculators[1].register_metrics([TEST_BOOLEAN, wrong_sign_numeric])
+
+        sample_sizes = [calculator.get_sample_size() for calculator in calculators]
+
+        self.assertEqual(sample_sizes[0], sample_sizes[1])
+        self.assertEqual(
+            calculators[0]._surrogate_average_power(sample_sizes[0]),
+            calculators[1]._surrogate_average_power(sample_sizes[0]),
+        )
+        # Holm rejects everything Bonferroni does, so its simulated power reaches the target at the analytic sample size
+        holm_calculator = SampleSizeCalculator(correction="holm")
+        holm_calculator.register_metrics([TEST_BOOLEAN, wrong_sign_numeric])
+        simulated_power = holm_calculator._expected_average_power(
+            int(sample_sizes[1]), np.random.default_rng(DEFAULT_SEED)
+        )
+        self.assertGreater(simulated_power, DEFAULT_POWER - 0.02)
@@ -0,0 +1,166 @@
+import unittest
+from itertools import product
+from unittest.mock import patch
+
+import numpy as np
+from numpy.testing import assert_allclose
+from parameterized import parameterized
+from statsmodels.stats.power import NormalIndPower
+from statsmodels.stats.power import TTestIndPower
+
+from sample_size.power import average_power_sample_size
+from sample_size.power import check_effect_size
+from sample_size.power import normal_power
+from sample_size.power import normal_sample_size
+from sample_size.power import ttest_power
+from sample_size.power import ttest_sample_size
+
+TEST_ALTERNATIVES = ("two-sided", "larger", "smaller")
+TEST_EFFECT_SIZES = (0.01, 0.1, 0.5, 2.0)
+TEST_ALPHAS = (0.001, 0.05, 0.2)
+
+
+def signed(effect_size, alternative):
+    # a one-sided test for a decrease only has power for a negative effect
+    return -effect_size if alternative == "smaller" else effect_size
+
+
+class PowerTestCase(unittest.TestCase):
+    @parameterized.expand(product(TEST_EFFECT_SIZES, (5, 100, 10000), TEST_ALPHAS, TEST_ALTERNATIVES))
+    def test_power_matches_statsmodels(self, effect_size, nobs1, alpha, alternative):
+        effect_size = signed(effect_size, alternative)
+
+        assert_allclose(
+            normal_power(effect_size, nobs1, alpha, alternative),
+            NormalIndPower().power(effect_size, nobs1, alpha, ratio=1, alternative=alternative),
+        )
+        assert_allclose(
+            ttest_power(effect_size, nobs1, alpha, alternative),
+            TTestIndPower().power(effect_size, nobs1, alpha, ratio=1, alternative=alternative),
+        )
+
+    @parameterized.expand(product(TEST_EFFECT_SIZES[:-1], TEST_ALPHAS, (0.5, 0.8, 0.95), TEST_ALTERNATIVES))
+    def test_sample_size_matches_statsmodels(self, effect_size, alpha, power, alternative):
+        for solver, power_analysis in ((normal_sample_size, NormalIndPower()), (ttest_sample_size, TTestIndPower())):
+            expected = power_analysis.solve_power(
+                effect_size=signed(effect_size, alternative), alpha=alpha, power=power, ratio=1, alternative=alternative
+            )
+            assert_allclose(solver(effect_size, alpha, power, alternative), expected, rtol=1e-6)
+
+    @parameterized.expand(product((0.001, 0.05), TEST_ALTERNATIVES))
+    def test_sample_size_ignores_the_sign_of_the_effect(self, alpha, alternative):
+        for solver, power_function in ((normal_sample_size, normal_power), (ttest_sample_size, ttest_power)):
+            sample_sizes = solver(np.array([0.1, -0.1]), alpha, 0.8, alternative)
+
+            # the minimum detectable effect is taken in the direction of the alternative, as in the simulations
+            self.assertEqual(sample_sizes[0], sample_sizes[1])
+            assert_allclose(power_function(signed(0.1, alternative), sample_sizes, alpha, alternative), 0.8, rtol=1e-12)
+
+    def test_sample_size_broadcasts(self):
+        effect_size = np.array([[0.1], [-0.2]])
+        alpha = np.array([0.01, 0.05, 0.1])
+        alternative = np.array([["two-sided"], ["smaller"]])
+
+        for solver, power_function in ((normal_sample_size, normal_power), (ttest_sample_size, ttest_power)):
+            sample_size = solver(effect_size, alpha, 0.8, alternative)
+
+            self.assertEqual(sample_size.shape, (2, 3))
+            assert_allclose(power_function(effect_size, sample_size, alpha, alternative), 0.8)
+
+    @parameterized.expand(product((1.87, 2.5, 10.0), TEST_ALTERNATIVES))
+    def test_ttest_sample_size_of_large_effects(self, effect_size, alternative):
+        sample_size = ttest_sample_size(effect_size, 0.2, 0.8, alternative)
+
+        # the solve stops at the two observations per group the pooled variance needs instead of returning NaN
+        self.assertGreaterEqual(float(sample_size), 2)
+        self.assertGreaterEqual(
+            float(ttest_power(signed(effect_size, alternative), sample_size, 0.2, alternative)), 0.8 - 1e-9
+        )
+
+    @patch("sample_size.power.SOLVER_MAX_ITERATIONS", 1)
+    def test_sample_size_stops_after_max_iterations(self):
+        sample_size = ttest_sample_size(0.1, 0.05, 0.8, "two-sided")
+
+        expected = TTestIndPower().solve_power(effect_size=0.1, alpha=0.05, power=0.8, ratio=1)
+        assert_allclose(sample_size, expected, rtol=1e-3)
+
+    def test_invalid_alternative(self):
+        for alternative in ("greater", ["two-sided", "unequal"]):
+            with self.assertRaises(Exception) as context:
+                normal_sample_size(0.1, 0.05, 0.8, alternative)
+
+            self.assertEqual(str(context.exception), "Error: alternative has to be 'two-sided', 'larger' or 'smaller'.")
+
+    @parameterized.expand([(0.0,), (np.inf,), (np.nan,), ([0.1, 0.0],)])
+    def test_check_effect_size(self, effect_size):
+        check_effect_size([0.1, -0.2])
+        with self.assertRaises(ValueError) as context:
+            check_effect_size(effect_size)
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
+        )
+
+
+class AveragePowerSampleSizeTestCase(unittest.TestCase):
+    @parameterized.expand(product((False, True), TEST_ALTERNATIVES))
+    def test_average_power_sample_size_of_single_test(self, t_test, alternative):
+        solver = ttest_sample_size if t_test else normal_sample_size
+        effect_size = signed(0.1, alternative)
+
+        sample_size = average_power_sample_size([effect_size] * 3, 0.01, 0.8, alternative, t_test)
+
+        # identical tests all reach the average power at the sample size of one of them
+        assert_allclose(sample_size, solver(effect_size, 0.01, 0.8, alternative))
+
+    @parameterized.expand([(0.8,), (0.95,)])
+    def test_average_power_sample_size_of_mixed_tests(self, power):
+        effect_sizes = np.array([0.02, 0.05, -0.1, 0.5])
+        alternatives = np.array(["two-sided", "larger", "smaller", "two-sided"])
+        t_tests = np.array([False, True, False, True])
+
+        sample_size = average_power_sample_size(effect_sizes, 0.05 / 4, power, alternatives, t_tests)
+
+        powers = np.where(
+            t_tests,
+            ttest_power(effect_sizes, sample_size, 0.05 / 4, alternatives),
+            normal_power(effect_sizes, sample_size, 0.05 / 4, alternatives),
+        )
+        assert_allclose(powers.mean(), power)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_average_power_sample_size_ignores_the_sign_of_the_effect(self, t_test):
+        alternatives = np.array(["two-sided", "larger", "smaller"])
+
+        sample_sizes = [
+            average_power_sample_size(effect_sizes, 0.05 / 3, 0.8, alternatives, t_test)
+            for effect_sizes in ([0.05, 0.1, -0.2], [-0.05, -0.1, 0.2])
+        ]
+
+        # the minimum detectable effects are taken in the direction of the alternatives, as in the simulations
+        self.assertEqual(sample_sizes[0], sample_sizes[1])
+
+    @patch("sample_size.power.SOLVER_MAX_ITERATIONS", 7)
+    def test_average_power_sample_size_stops_after_max_iterations(self):
+        effect_sizes = np.array([0.02, 0.05, -0.1, 0.5])
+        alternatives = np.array(["two-sided", "larger", "smaller", "two-sided"])
+
+        sample_size = average_power_sample_size(effect_sizes, 0.05 / 4, 0.8, alternatives)
+
+        powers = normal_power(effect_sizes, sample_size, 0.05 / 4, alternatives)
+        assert_allclose(powers.mean(), 0.8, rtol=1e-3)
+
+    def test_average_power_sample_size_broadcasts_over_families(self):
+        effect_sizes = np.array([[0.02, 0.05], [0.1, 0.1], [0.1, 1.0]])
+        alpha = np.array([0.025, 0.01, 0.05])
+        power = np.array([0.8, 0.9, 0.8])
+
+        sample_size = average_power_sample_size(effect_sizes, alpha, power, "two-sided")
+
+        self.assertEqual(sample_size.shape, (3,))
+        for family_sample_size, family_effect_sizes, family_alpha, family_power in zip(
+            sample_size, effect_sizes, alpha, power
+        ):
+            assert_allclose(
+                normal_power(family_effect_sizes, family_sample_size, family_alpha, "two-sided").mean(), family_power
+            )
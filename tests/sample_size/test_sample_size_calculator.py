@@ -1,19 +1,94 @@
+import os
+import subprocess
+import sys
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import List
+from unittest.mock import ANY
 from unittest.mock import call
 from unittest.mock import patch
 
+import numpy as np
 from parameterized import parameterized
+from scipy.stats import norm
+from statsmodels.stats.power import NormalIndPower
+from statsmodels.stats.power import TTestIndPower
 
+from sample_size.cache import LRUCache
 from sample_size.metrics import BooleanMetric
 from sample_size.metrics import NumericMetric
 from sample_size.metrics import RatioMetric
+from sample_size.multiple_testing import DEFAULT_EPSILON
+from sample_size.multiple_testing import DEFAULT_MAX_BATCH_BYTES
+from sample_size.multiple_testing import SampleSizeSearchResult
 from sample_size.sample_size_calculator import DEFAULT_ALPHA
+from sample_size.sample_size_calculator import DEFAULT_BIT_GENERATOR
 from sample_size.sample_size_calculator import DEFAULT_POWER
+from sample_size.sample_size_calculator import DEFAULT_SEED
 from sample_size.sample_size_calculator import DEFAULT_VARIANTS
-from sample_size.sample_size_calculator import RANDOM_STATE
 from sample_size.sample_size_calculator import SampleSizeCalculator
+from sample_size.sample_size_calculator import get_metrics_schema
+from sample_size.sample_size_calculator import get_metrics_validator
+from sample_size.sample_size_calculator import get_random_state
+from sample_size.workspace import get_workspace
 from tests.sample_size.test_metrics import ALTERNATIVE
 
+TEST_BOOLEAN_METRIC = {
+    "metric_type": "boolean",
+    "metric_metadata": {"probability": 0.05, "mde": 0.02, "alternative": ALTERNATIVE},
+}
+TEST_NUMERIC_METRIC = {
+    "metric_type": "numeric",
+    "metric_metadata": {"variance": 5000, "mde": 5, "alternative": "larger"},
+}
+DEFERRED_MODULES = ("statsmodels", "pandas", "patsy", "scipy", "jsonschema")
+
+
+def imported_modules(code: str) -> List[str]:
+    """
+    Run code in a fresh interpreter with -X importtime and return the names of the modules it imported
+    """
+    environment = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[2]))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=environment, capture_output=True, text=True, check=True
+    )
+    # lines look like "import time:       123 |        456 |   package.module"
+    return [line.split("|")[-1].strip() for line in process.stderr.splitlines() if line.startswith("import time:")]
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def assertDeferred(self, modules, deferred_modules):
+        for module in modules:
+            self.assertNotIn(module.split(".")[0], deferred_modules, f"{module} is imported eagerly")
+
+    def test_import_defers_heavy_dependencies(self):
+        modules = imported_modules("import sample_size.sample_size_calculator, sample_size.scripts.sample_size_run")
+
+        self.assertIn("sample_size.sample_size_calculator", modules)
+        self.assertDeferred(modules, DEFERRED_MODULES)
+
+    def test_single_metric_sample_size_does_not_import_statsmodels(self):
+        modules = imported_modules(
+            "from sample_size.sample_size_calculator import SampleSizeCalculator\n"
+            "calculator = SampleSizeCalculator()\n"
+            f"calculator.register_metrics([{TEST_BOOLEAN_METRIC!r}])\n"
+            "calculator.get_sample_size()"
+        )
+
+        self.assertTrue(any(module.startswith("scipy.special.") for module in modules))
+        self.assertDeferred(modules, ("statsmodels", "pandas", "patsy"))
+
+    def test_metrics_schema(self):
+        import sample_size.sample_size_calculator as sample_size_calculator
+
+        self.assertIs(get_metrics_schema(), get_metrics_schema())
+        self.assertIs(sample_size_calculator.METRICS_SCHEMA, get_metrics_schema())
+        self.assertEqual(get_metrics_schema()["type"], "array")
+        with self.assertRaises(AttributeError):
+            sample_size_calculator.NO_SUCH_SCHEMA
+
 
 class SampleSizeCalculatorTestCase(unittest.TestCase):
     def test_sample_size_calculator_constructor_sets_params(self):
@@ -37,8 +112,26 @@ class SampleSizeCalculatorTestCase(unittest.TestCase):
         self.assertEqual(calculator.variants, DEFAULT_VARIANTS)
         self.assertEqual(calculator.power, DEFAULT_POWER)
         self.assertEqual(calculator.metrics, [])
+        self.assertFalse(calculator.batch_scenarios)
+        self.assertEqual(calculator.max_batch_bytes, DEFAULT_MAX_BATCH_BYTES)
+        self.assertEqual(calculator.random_state, DEFAULT_SEED)
+        self.assertEqual(calculator.bit_generator, DEFAULT_BIT_GENERATOR)
+        self.assertEqual(calculator.n_jobs, 1)
+
+    @parameterized.expand([(0,), (np.random.SeedSequence(0),)])
+    def test_get_random_state_from_seed(self, seed):
+        random_state = get_random_state(seed, np.random.Philox)
+
+        self.assertIsInstance(random_state, np.random.Generator)
+        self.assertIsInstance(random_state.bit_generator, np.random.Philox)
+        self.assertEqual(random_state.random(), np.random.Generator(np.random.Philox(0)).random())
 
-    @patch("statsmodels.stats.power.NormalIndPower.solve_power")
+    def test_get_random_state_from_generator(self):
+        random_state = np.random.default_rng(0)
+
+        self.assertIs(get_random_state(random_state), random_state)
+
+    @patch("sample_size.metrics.normal_sample_size")
     def test_get_single_sample_size_normal(self, mock_solve_power):
         test_probability = 0.05
         test_mde = 0.02
@@ -54,15 +147,9 @@ class SampleSizeCalculatorTestCase(unittest.TestCase):
         sample_size = calculator._get_single_sample_size(test_metric, calculator.alpha)
 
         self.assertEqual(sample_size, test_sample_size)
-        mock_solve_power.assert_called_once_with(
-            effect_size=0.09176629354822471,
-            alpha=DEFAULT_ALPHA,
-            power=DEFAULT_POWER,
-            ratio=1,
-            alternative="two-sided",
-        )
+        mock_solve_power.assert_called_once_with(0.09176629354822471, DEFAULT_ALPHA, DEFAULT_POWER, "two-sided")
 
-    @patch("statsmodels.stats.power.TTestIndPower.solve_power")
+    @patch("sample_size.metrics.ttest_sample_size")
     def test_get_single_sample_size_ttest(self, mock_solve_power):
         test_variance = 1000
         test_mde = 5
@@ -78,12 +165,67 @@ class SampleSizeCalculatorTestCase(unittest.TestCase):
         sample_size = calculator._get_single_sample_size(test_metric, calculator.alpha)
 
         self.assertEqual(sample_size, test_sample_size)
-        mock_solve_power.assert_called_once_with(
-            effect_size=0.15811388300841897,
-            alpha=DEFAULT_ALPHA,
-            power=DEFAULT_POWER,
+        mock_solve_power.assert_called_once_with(0.15811388300841897, DEFAULT_ALPHA, DEFAULT_POWER, "two-sided")
+
+    @parameterized.expand(
+        [
+            (BooleanMetric(0.05, 0.02, "two-sided"), NormalIndPower(), 0.05),
+            (BooleanMetric(0.3, -0.05, "smaller"), NormalIndPower(), 0.01),
+            (NumericMetric(1000, 5, "larger"), TTestIndPower(), 0.05),
+            (NumericMetric(5, 2, "two-sided"), TTestIndPower(), 0.001),
+            (RatioMetric(2000, 100000, 200, 2000, 5000, 0.5, "two-sided"), NormalIndPower(), 0.05 / 3),
+        ]
+    )
+    def test_get_single_sample_size_matches_statsmodels(self, metric, power_analysis, alpha):
+        calculator = SampleSizeCalculator()
+
+        sample_size = calculator._get_single_sample_size(metric, alpha)
+
+        expected_sample_size = power_analysis.solve_power(
+            effect_size=metric.mde / np.sqrt(metric.variance),
+            alpha=alpha,
+            power=calculator.power,
             ratio=1,
-            alternative="two-sided",
+            alternative=metric.alternative,
+        )
+        self.assertEqual(sample_size, int(expected_sample_size))
+
+    @parameterized.expand(
+        [
+            (BooleanMetric(0.05, -0.02, "larger"), BooleanMetric(0.05, 0.02, "larger")),
+            (NumericMetric(5000, -5, "larger"), NumericMetric(5000, 5, "larger")),
+            (NumericMetric(5000, 5, "smaller"), NumericMetric(5000, -5, "smaller")),
+        ]
+    )
+    def test_get_single_sample_size_ignores_the_sign_of_mde(self, metric, oriented_metric):
+        calculator = SampleSizeCalculator()
+
+        self.assertEqual(
+            calculator._get_single_sample_size(metric, DEFAULT_ALPHA),
+            calculator._get_single_sample_size(oriented_metric, DEFAULT_ALPHA),
+        )
+
+    def test_get_single_sample_size_of_zero_mde(self):
+        calculator = SampleSizeCalculator()
+
+        with self.assertRaises(ValueError) as context:
+            calculator._get_single_sample_size(BooleanMetric(0.05, 0, "two-sided"), DEFAULT_ALPHA)
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
+        )
+
+    def test_get_sample_size_of_zero_variance(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics(
+            [{"metric_type": "boolean", "metric_metadata": {"probability": 0.0, "mde": 0.1, "alternative": "larger"}}]
+        )
+
+        with self.assertRaises(ValueError) as context:
+            calculator.get_sample_size()
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
         )
 
     @parameterized.expand(
@@ -154,7 +296,297 @@ class SampleSizeCalculatorTestCase(unittest.TestCase):
                 call(calculator.metrics[1], calculator.alpha / 2),
             ]
         )
-        mock_get_multiple_sample_size.assert_called_once_with(test_sample_size, test_sample_size, RANDOM_STATE)
+        mock_get_multiple_sample_size.assert_called_once_with(test_sample_size, test_sample_size, ANY, power_curve=None)
+        self.assertIsInstance(mock_get_multiple_sample_size.call_args[0][2], np.random.Generator)
+
+    @parameterized.expand([(True,), (False,)])
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    def test_get_sample_size_multiple_warm_start(self, warm_start, mock_get_multiple_sample_size):
+        calculator = SampleSizeCalculator(warm_start=warm_start)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 3)
+
+        calculator.get_sample_size()
+
+        lower, upper = mock_get_multiple_sample_size.call_args[0][:2]
+        power_curve = mock_get_multiple_sample_size.call_args[1]["power_curve"]
+        if warm_start:
+            intercept, slope = power_curve
+            self.assertGreater(slope, 0)
+            self.assertTrue(lower < ((norm.ppf(DEFAULT_POWER) - intercept) / slope) ** 2 < upper)
+        else:
+            self.assertIsNone(power_curve)
+
+    @parameterized.expand([("bonferroni", 0.05 / 4), ("sidak", 1 - 0.95**0.25)])
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._simulate_sample_size")
+    def test_get_sample_size_analytic_correction(self, correction, test_alpha, mock_simulate_sample_size):
+        calculator = SampleSizeCalculator(correction=correction, variants=3, cache=LRUCache())
+        calculator.register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC])
+        metrics = calculator.metrics
+
+        sample_size = calculator.get_sample_size()
+
+        mock_simulate_sample_size.assert_not_called()
+        self.assertIsInstance(sample_size, int)
+        powers = [
+            NormalIndPower().power(metrics[0].effect_size, sample_size + n, test_alpha, alternative=ALTERNATIVE)
+            + TTestIndPower().power(metrics[1].effect_size, sample_size + n, test_alpha, alternative="larger")
+            for n in (0, 1)
+        ]
+        # the sample size is the largest one whose average power does not exceed the target
+        self.assertLessEqual(powers[0] / 2, DEFAULT_POWER)
+        self.assertGreater(powers[1] / 2, DEFAULT_POWER)
+
+    def test_get_sample_size_sidak_is_smaller_than_bonferroni(self):
+        sample_sizes = []
+        for correction in ("sidak", "bonferroni"):
+            calculator = SampleSizeCalculator(correction=correction)
+            calculator.register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC] * 3)
+            sample_sizes.append(calculator.get_sample_size())
+
+        self.assertLess(sample_sizes[0], sample_sizes[1])
+
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    def test_get_sample_size_holm_is_bounded_by_bonferroni(self, mock_get_multiple_sample_size):
+        calculators = [SampleSizeCalculator(correction=correction) for correction in ("holm", "bonferroni")]
+        for calculator in calculators:
+            calculator.register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC])
+
+        calculators[0].get_sample_size()
+
+        lower, upper = mock_get_multiple_sample_size.call_args[0][:2]
+        self.assertEqual(
+            lower, min(calculators[0]._get_single_sample_size(m, DEFAULT_ALPHA) for m in calculators[0].metrics)
+        )
+        self.assertEqual(upper, calculators[1].get_sample_size() + 1)
+
+    @parameterized.expand(
+        product(
+            ("bh", "holm", "bonferroni", "sidak"),
+            (
+                {"probability": 0.05, "mde": 0.0, "alternative": "two-sided"},
+                {"probability": 0.0, "mde": 0.02, "alternative": "larger"},
+            ),
+        )
+    )
+    def test_get_sample_size_multiple_of_zero_effect_size(self, correction, metadata):
+        calculator = SampleSizeCalculator(correction=correction)
+        calculator.register_metrics([{"metric_type": "boolean", "metric_metadata": metadata}, TEST_NUMERIC_METRIC])
+
+        with self.assertRaises(ValueError) as context:
+            calculator.get_sample_size()
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
+        )
+
+    @parameterized.expand([("bh",), ("holm",), ("bonferroni",), ("sidak",)])
+    def test_get_sample_size_single_test_ignores_correction(self, correction):
+        calculator = SampleSizeCalculator(correction=correction)
+        calculator.register_metrics([TEST_NUMERIC_METRIC])
+        zero_mde_calculator = SampleSizeCalculator(correction=correction)
+        zero_mde_calculator.register_metrics(
+            [{"metric_type": "numeric", "metric_metadata": {"variance": 5000, "mde": 0, "alternative": "larger"}}]
+        )
+
+        self.assertEqual(
+            calculator.get_sample_size(), calculator._get_single_sample_size(calculator.metrics[0], DEFAULT_ALPHA)
+        )
+        with self.assertRaises(ValueError) as context:
+            zero_mde_calculator.get_sample_size()
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a non-zero mde and variance for every experiment."
+        )
+
+    def test_correction_error(self):
+        with self.assertRaises(ValueError) as context:
+            SampleSizeCalculator(correction="hochberg")
+
+        self.assertEqual(str(context.exception), "Error: correction has to be 'bh', 'holm', 'bonferroni' or 'sidak'.")
+
+    @parameterized.expand([(1, DEFAULT_BIT_GENERATOR), (2, np.random.Philox)])
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size", return_value=2000)
+    def test_get_sample_size_multiple_with_seed(
+        self, seed, bit_generator, mock_get_single_sample_size, mock_get_multiple_sample_size
+    ):
+        calculator = SampleSizeCalculator(random_state=seed, bit_generator=bit_generator)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        for _ in range(2):
+            calculator.get_sample_size()
+
+        # a seed restarts the same stream on every call
+        draws = [c[0][2].random() for c in mock_get_multiple_sample_size.call_args_list]
+        self.assertEqual(draws, [np.random.Generator(bit_generator(seed)).random()] * 2)
+
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size", return_value=2000)
+    def test_get_sample_size_multiple_with_generator(self, mock_get_single_sample_size, mock_get_multiple_sample_size):
+        random_state = np.random.default_rng(1)
+        calculator = SampleSizeCalculator(random_state=random_state)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        calculator.get_sample_size()
+
+        mock_get_multiple_sample_size.assert_called_once_with(2000, 2000, random_state, power_curve=None)
+
+    def test_get_sample_size_concurrent_calls_are_reproducible(self):
+        def get_sample_size(calculator):
+            return calculator.get_sample_size()
+
+        calculators = []
+        for seed in range(4):
+            calculator = SampleSizeCalculator(random_state=seed)
+            calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+            calculators.append(calculator)
+        sequential_sample_sizes = [get_sample_size(calculator) for calculator in calculators]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            concurrent_sample_sizes = list(executor.map(get_sample_size, calculators * 2))
+
+        self.assertEqual(concurrent_sample_sizes, sequential_sample_sizes * 2)
+
+    def test_get_sample_size_releases_workspaces(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        calculator.get_sample_size()
+
+        self.assertEqual(get_workspace().nbytes, 0)
+
+    @patch("sample_size.sample_size_calculator.release_workspaces")
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    def test_get_sample_size_releases_workspaces_after_errors(
+        self, mock_get_multiple_sample_size, mock_release_workspaces
+    ):
+        mock_get_multiple_sample_size.side_effect = MemoryError
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        with self.assertRaises(MemoryError):
+            calculator.get_sample_size()
+
+        mock_release_workspaces.assert_called_once_with()
+
+    def test_get_sample_size_result(self):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        result = calculator.get_sample_size_result()
+
+        self.assertEqual(result.sample_size, calculator.get_sample_size())
+        self.assertLess(result.confidence_lower, result.sample_size)
+        self.assertGreater(result.confidence_upper, result.sample_size)
+        self.assertAlmostEqual(result.power, DEFAULT_POWER, delta=DEFAULT_EPSILON)
+        self.assertGreater(result.standard_error, 0)
+        self.assertGreater(result.evaluations, 0)
+
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.find_multiple_sample_size")
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._get_single_sample_size", return_value=2000)
+    def test_get_sample_size_result_searches_like_get_sample_size(
+        self, mock_get_single_sample_size, mock_find_multiple_sample_size
+    ):
+        random_state = np.random.default_rng(1)
+        calculator = SampleSizeCalculator(random_state=random_state)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        result = calculator.get_sample_size_result()
+
+        self.assertIs(result, mock_find_multiple_sample_size.return_value)
+        mock_find_multiple_sample_size.assert_called_once_with(2000, 2000, random_state, power_curve=None)
+
+    @parameterized.expand([(1, "bh"), (2, "bonferroni")])
+    def test_get_sample_size_result_without_simulation(self, num_metrics, correction):
+        calculator = SampleSizeCalculator(correction=correction)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * num_metrics)
+        sample_size = int(calculator.get_sample_size())
+
+        self.assertEqual(
+            calculator.get_sample_size_result(),
+            SampleSizeSearchResult(sample_size, sample_size, sample_size, DEFAULT_POWER, 0.0, 0),
+        )
+
+    @patch("sample_size.metrics.normal_sample_size", return_value=2000)
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator.get_multiple_sample_size")
+    def test_get_sample_size_multiple_solves_equal_metrics_once(
+        self, mock_get_multiple_sample_size, mock_normal_sample_size
+    ):
+        calculator = SampleSizeCalculator(warm_start=False)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 3)
+
+        calculator.get_sample_size()
+        calculator.get_sample_size()
+
+        # one solution for the unadjusted and one for the Bonferroni-adjusted alpha
+        self.assertEqual(mock_normal_sample_size.call_count, 2)
+        mock_get_multiple_sample_size.assert_called_with(2000, 2000, ANY, power_curve=None)
+
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._simulate_sample_size", return_value=2000)
+    def test_get_sample_size_cache(self, mock_simulate_sample_size):
+        cache = LRUCache()
+        calculators = [SampleSizeCalculator(cache=cache) for _ in range(2)]
+        calculators[0].register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC])
+        calculators[1].register_metrics([TEST_NUMERIC_METRIC, TEST_BOOLEAN_METRIC])
+
+        sample_sizes = [calculator.get_sample_size() for calculator in calculators * 2]
+
+        # the metric order does not matter
+        self.assertEqual(sample_sizes, [2000] * 4)
+        mock_simulate_sample_size.assert_called_once()
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (3, 1, 1))
+
+    @parameterized.expand(
+        [
+            ({"alpha": 0.01},),
+            ({"power": 0.9},),
+            ({"variants": 3},),
+            ({"random_state": 2},),
+            ({"bit_generator": np.random.Philox},),
+            ({"batch_scenarios": True},),
+            ({"common_random_numbers": True},),
+            ({"adaptive_replication": True},),
+            ({"shared_draws": True},),
+            ({"single_precision": True},),
+            ({"correction": "holm"},),
+            ({"warm_start": False},),
+        ]
+    )
+    def test_cache_key_depends_on_settings(self, settings):
+        calculators = [SampleSizeCalculator(), SampleSizeCalculator(**settings)]
+        for calculator in calculators:
+            calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        self.assertNotEqual(calculators[0]._cache_key(), calculators[1]._cache_key())
+
+    def test_cache_key_depends_on_metrics(self):
+        calculators = [SampleSizeCalculator(), SampleSizeCalculator()]
+        calculators[0].register_metrics([TEST_BOOLEAN_METRIC] * 2)
+        calculators[1].register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC])
+
+        self.assertNotEqual(calculators[0]._cache_key(), calculators[1]._cache_key())
+
+    def test_cache_key_does_not_depend_on_number_types(self):
+        calculators = [SampleSizeCalculator(alpha=0.05, random_state=1), SampleSizeCalculator(random_state=np.int64(1))]
+        calculators[0].register_metrics([TEST_NUMERIC_METRIC] * 2)
+        calculators[1].register_metrics(
+            [{"metric_type": "numeric", "metric_metadata": {"variance": 5000.0, "mde": 5.0, "alternative": "larger"}}]
+            * 2
+        )
+
+        self.assertEqual(calculators[0]._cache_key(), calculators[1]._cache_key())
+
+    @parameterized.expand([(None,), (np.random.SeedSequence(1),), (np.random.default_rng(1),)])
+    @patch("sample_size.sample_size_calculator.SampleSizeCalculator._simulate_sample_size", return_value=2000)
+    def test_get_sample_size_cache_needs_seed(self, random_state, mock_simulate_sample_size):
+        cache = LRUCache()
+        calculator = SampleSizeCalculator(random_state=random_state, cache=cache)
+        calculator.register_metrics([TEST_BOOLEAN_METRIC] * 2)
+
+        for _ in range(2):
+            calculator.get_sample_size()
+
+        self.assertEqual(mock_simulate_sample_size.call_count, 2)
+        self.assertEqual(len(cache), 0)
 
     # TODO: parameterize register metric functions
     def test_register_metric_boolean(self):
@@ -224,3 +656,34 @@ class SampleSizeCalculatorTestCase(unittest.TestCase):
         calculator = SampleSizeCalculator()
         with self.assertRaises(Exception):
             calculator.register_metrics([{"metric_type": test_metric_type}])
+
+    @parameterized.expand(
+        [
+            ([{"metric_type": "numeric"}],),
+            ([{"metric_type": "count", "metric_metadata": {}}],),
+            ([{"metric_type": "boolean", "metric_metadata": {"probability": "0.1", "mde": 0.01}}],),
+            ([],),
+        ]
+    )
+    def test_register_metric_validation_error_matches_jsonschema(self, metrics):
+        from jsonschema import ValidationError
+        from jsonschema import validate
+
+        with self.assertRaises(ValidationError) as expected:
+            validate(instance=metrics, schema=get_metrics_schema())
+        with self.assertRaises(ValidationError) as context:
+            SampleSizeCalculator().register_metrics(metrics)
+
+        self.assertEqual(context.exception.message, expected.exception.message)
+        self.assertIs(get_metrics_validator(), get_metrics_validator())
+
+    @patch("sample_size.sample_size_calculator.get_metrics_validator")
+    def test_register_metric_trusted_input_skips_validation(self, mock_get_metrics_validator):
+        calculator = SampleSizeCalculator()
+        calculator.register_metrics([TEST_BOOLEAN_METRIC, TEST_NUMERIC_METRIC], validate=False)
+
+        mock_get_metrics_validator.assert_not_called()
+        self.assertEqual(
+            calculator.metrics,
+            [BooleanMetric(0.05, 0.02, ALTERNATIVE), NumericMetric(5000, 5, "larger")],
+        )
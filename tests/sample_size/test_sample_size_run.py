@@ -35,7 +35,7 @@ class TestMain(unittest.TestCase):
         mock_calculator.return_value = calculator_obj
 
         with patch("sys.stdout", new=StringIO()) as fakeOutput:
-            main()
+            main([])
             self.assertEqual(
                 fakeOutput.getvalue().strip(),
                 "Sample size needed in each group: {:.3f}".format(self.DEFAULT_SAMPLE_SIZE),
@@ -63,7 +63,7 @@ class TestMain(unittest.TestCase):
         mock_get_alpha.side_effect = Exception(error_message)
 
         with patch("sys.stdout", new=StringIO()) as fakeOutput:
-            main()
+            main([])
             self.assertEqual(
                 fakeOutput.getvalue().strip(),
                 f"Error! The calculator isn't able to calculate sample size due to \n{error_message}",
@@ -72,3 +72,30 @@ class TestMain(unittest.TestCase):
         mock_get_alpha.assert_called_once()
         mock_calculator.assert_not_called()
         mock_get_metrics.assert_not_called()
+
+    @patch("sample_size.scripts.batch_utils.run_batch")
+    @patch("sample_size.scripts.input_utils.get_alpha")
+    def test_main_batch(self, mock_get_alpha, mock_run_batch):
+        main(["--input", "specs.csv", "--output", "results.jsonl", "--input-format", "csv"])
+
+        mock_run_batch.assert_called_once_with("specs.csv", "results.jsonl", "csv", None)
+        mock_get_alpha.assert_not_called()
+
+    @patch("sample_size.scripts.batch_utils.run_batch")
+    def test_main_batch_defaults_to_standard_output(self, mock_run_batch):
+        main(["--input", "-"])
+
+        mock_run_batch.assert_called_once_with("-", "-", None, None)
+
+    @patch("sample_size.scripts.batch_utils.run_batch")
+    def test_main_batch_exception(self, mock_run_batch):
+        error_message = "no such file"
+        mock_run_batch.side_effect = Exception(error_message)
+
+        with self.assertRaises(SystemExit) as context:
+            main(["--input", "specs.jsonl"])
+
+        self.assertEqual(
+            str(context.exception),
+            f"Error! The calculator isn't able to process specs.jsonl due to \n{error_message}",
+        )
@@ -0,0 +1,75 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sample_size.workspace import SimulationWorkspace
+from sample_size.workspace import get_workspace
+from sample_size.workspace import release_workspaces
+
+
+class SimulationWorkspaceTestCase(unittest.TestCase):
+    def test_buffers_are_reused(self):
+        workspace = SimulationWorkspace()
+
+        p_values = workspace.p_values((2, 3, 4))
+        smaller_p_values = workspace.p_values((3, 4))
+
+        self.assertEqual(p_values.shape, (2, 3, 4))
+        self.assertEqual(p_values.dtype, np.float64)
+        self.assertTrue(p_values.flags.c_contiguous)
+        self.assertTrue(np.shares_memory(p_values, smaller_p_values))
+        self.assertEqual(workspace.nbytes, p_values.nbytes)
+
+    def test_buffers_grow(self):
+        workspace = SimulationWorkspace()
+
+        p_values = workspace.p_values((3, 4))
+        larger_p_values = workspace.p_values((2, 3, 4))
+
+        self.assertFalse(np.shares_memory(p_values, larger_p_values))
+        self.assertEqual(workspace.nbytes, larger_p_values.nbytes)
+
+    def test_buffer_types(self):
+        workspace = SimulationWorkspace(np.float32)
+        shape = (2, 5)
+
+        self.assertEqual(workspace.p_values(shape).dtype, np.float32)
+        self.assertEqual(workspace.uniforms(shape).dtype, np.float64)
+        for mask in (workspace.true_alt(shape), workspace.mask(shape), workspace.rejected(shape)):
+            self.assertEqual(mask.dtype, np.bool_)
+        # buffers of different names never overlap
+        self.assertFalse(np.shares_memory(workspace.true_alt(shape), workspace.rejected(shape)))
+
+    def test_release(self):
+        workspace = SimulationWorkspace()
+        workspace.p_values((10, 10))
+
+        workspace.release()
+
+        self.assertEqual(workspace.nbytes, 0)
+
+    def test_workspace_dtype_error(self):
+        with self.assertRaises(ValueError) as context:
+            SimulationWorkspace(np.int64)
+
+        self.assertEqual(
+            str(context.exception), "Error: Please provide a float64 or float32 precision for the simulations."
+        )
+
+    def test_get_workspace(self):
+        workspace = get_workspace()
+
+        self.assertIs(get_workspace(np.float64), workspace)
+        self.assertIsNot(get_workspace(np.float32), workspace)
+        self.assertEqual(get_workspace(np.float32).dtype, np.float32)
+        # every thread has its own workspace
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertIsNot(executor.submit(get_workspace).result(), workspace)
+
+    def test_release_workspaces(self):
+        get_workspace().p_values((10, 10))
+
+        release_workspaces()
+
+        self.assertEqual(get_workspace().nbytes, 0)